@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# bench_blob_store.py -- raw blob storage: one file per fetch vs the content-addressed BlobStore (disk, put/lookup rate)
+import argparse, os, random, sys, tempfile, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path: sys.path.insert(0, REPO)
+from harborx.blob_store import BlobStore  # noqa: E402
+
+BLOB = 131072
+
+def make_blob(rng, used_words):
+    """A Starknet-like blob: `used_words` 32-byte field elements (top byte 0), then zero padding."""
+    body = b"".join(b"\0" + rng.getrandbits(248).to_bytes(31, "big") for _ in range(used_words))
+    return body + b"\0" * (BLOB - len(body))
+
+def du(root):
+    return sum(os.path.getsize(os.path.join(b, n)) for b, _, ns in os.walk(root) for n in ns)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blobs", type=int, default=400, help="blobs written (as fetched, duplicates included)")
+    ap.add_argument("--dup", type=float, default=0.25, help="fraction of fetches that repeat an earlier blob")
+    ap.add_argument("--fill", type=float, default=0.3, help="mean fraction of the 4096 field elements in use")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    blobs, keys = [], []
+    for i in range(args.blobs):
+        if blobs and rng.random() < args.dup:
+            blobs.append(rng.choice(blobs))
+        else:
+            blobs.append(make_blob(rng, max(1, int(4096 * min(1.0, rng.expovariate(1 / args.fill))))))
+        keys.append((1000 + i // 3, f"0x{i // 3:064x}", i % 3))
+
+    with tempfile.TemporaryDirectory() as td:
+        raw = os.path.join(td, "raw")
+        os.makedirs(raw)
+        t0 = time.perf_counter()
+        for (eb, tx, idx), b in zip(keys, blobs):
+            with open(os.path.join(raw, f"part-{time.time_ns()}-{eb}-{idx}.txt"), "wb") as fp:
+                fp.write(b)
+        dt_raw = time.perf_counter() - t0
+
+        with BlobStore(os.path.join(td, "store")) as st:
+            t0 = time.perf_counter()
+            for (eb, tx, idx), b in zip(keys, blobs):
+                st.add(eb, tx, idx, b)
+            dt_put = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            hits = sum(1 for k in keys if st.lookup(*k))
+            dt_look = time.perf_counter() - t0
+            sample = keys[:50]
+            if [st.get(st.lookup(*k)) for k in sample] != blobs[:50]:
+                raise SystemExit("[bench-blob-store] MISMATCH reading back")
+            stats = st.stats()
+        n = len(blobs)
+        raw_b, store_b = du(raw), du(os.path.join(td, "store"))
+        print(f"[bench-blob-store] blobs={n} distinct={len(set(blobs))} {stats}")
+        print(f"[bench-blob-store] file per fetch : {raw_b / 2**20:8.1f} MiB  {n / dt_raw:8.0f} blobs/s written")
+        print(f"[bench-blob-store] blob store     : {store_b / 2**20:8.1f} MiB  {n / dt_put:8.0f} blobs/s added  "
+              f"(x{raw_b / store_b:.1f} less disk, incl. index)")
+        print(f"[bench-blob-store] re-fetch check : {hits / dt_look:8.0f} lookups/s ({hits}/{n} found)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# bench_fetch.py -- blob downloads from a local HTTP stand-in: serial requests.get vs BlobFetcher at several concurrencies
+import argparse, os, shutil, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path: sys.path.insert(0, REPO)
+import requests  # noqa: E402
+from harborx.fetch import BlobFetcher, FetchJob  # noqa: E402
+
+BLOB = 131072
+
+def serve(latency):
+    body = os.urandom(BLOB)
+    class H(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a): pass
+        def do_GET(self):
+            time.sleep(latency)     # stands in for RTT + storage latency
+            self.send_response(200); self.send_header("Content-Length", str(BLOB)); self.end_headers()
+            self.wfile.write(body)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), H)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def serial_reference(urls, out):
+    """The original path: a fresh requests.get per blob, body buffered, then written."""
+    for i, u in enumerate(urls):
+        r = requests.get(u, timeout=60); r.raise_for_status()
+        with open(os.path.join(out, f"{i}.bin"), "wb") as fp: fp.write(r.content)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blobs", type=int, default=64)
+    ap.add_argument("--latency-ms", type=float, default=30.0, help="server-side delay per request")
+    ap.add_argument("--workers", default="1,2,4,8,16")
+    ap.add_argument("--per-host", type=int, default=16)
+    args = ap.parse_args()
+
+    srv = serve(args.latency_ms / 1e3)
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    urls = [f"{base}/blob/{i}" for i in range(args.blobs)]
+    td = tempfile.mkdtemp()
+    try:
+        t0 = time.perf_counter(); serial_reference(urls, td); dt_ref = time.perf_counter() - t0
+        print(f"[bench-fetch] blobs={args.blobs} size=128KiB latency={args.latency_ms:.0f}ms")
+        print(f"[bench-fetch] serial get   : {dt_ref:.2f}s  {args.blobs/dt_ref:,.1f} blobs/s")
+        for w in (int(x) for x in args.workers.split(",")):
+            out = os.path.join(td, f"w{w}")
+            jobs = [FetchJob(u, os.path.join(out, f"{i}.bin")) for i, u in enumerate(urls)]
+            with BlobFetcher(workers=w, per_host=args.per_host) as f:
+                t0 = time.perf_counter(); res = f.fetch_all(jobs); dt = time.perf_counter() - t0
+            if not all(r.ok and r.nbytes == BLOB for r in res): raise SystemExit("[bench-fetch] download failed")
+            print(f"[bench-fetch] workers={w:<3}  : {dt:.2f}s  {args.blobs/dt:,.1f} blobs/s  (x{dt_ref/dt:.1f})")
+    finally:
+        srv.shutdown(); shutil.rmtree(td, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# bench_idxmap.py -- StatefulIndexMap lookups on a synthetic idxmap: connect-per-lookup vs pooled/cached/bulk
+import argparse, os, random, sqlite3, sys, tempfile, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path: sys.path.insert(0, REPO)
+from harborx.sn_pydecoder import StatefulIndexMap  # noqa: E402
+
+def get_reference(db_file, idx):
+    """The original lookup: a fresh connection per index."""
+    try:
+        with sqlite3.connect(db_file) as cx:
+            row = cx.execute("SELECT val FROM idxmap WHERE idx=?", (idx,)).fetchone()
+        return int(row[0]) if row else None
+    except Exception:
+        return None
+
+def make_idxmap(path, rows, seed):
+    rng = random.Random(seed)
+    cx = sqlite3.connect(path)
+    cx.execute("PRAGMA journal_mode=OFF"); cx.execute("PRAGMA synchronous=OFF")
+    cx.execute("CREATE TABLE idxmap (idx INTEGER PRIMARY KEY, val TEXT)")
+    step = 100_000
+    for lo in range(0, rows, step):
+        cx.executemany("INSERT INTO idxmap VALUES (?,?)",
+                       ((i, str(rng.getrandbits(251))) for i in range(lo, min(rows, lo + step))))
+    cx.commit(); cx.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2_000_000, help="idxmap rows")
+    ap.add_argument("--lookups", type=int, default=50_000, help="index lookups (a large state diff: 2 per storage entry)")
+    ap.add_argument("--reference-lookups", type=int, default=5_000, help="lookups timed on the connect-per-lookup path")
+    ap.add_argument("--db", help="existing idxmap db (default: build one in a temp dir)")
+    ap.add_argument("--seed", type=int, default=13)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        db = args.db
+        if not db:
+            db = os.path.join(td, "idxmap.sqlite")
+            t0 = time.perf_counter(); make_idxmap(db, args.rows, args.seed)
+            print(f"[bench-idxmap] built {args.rows:,}-row idxmap in {time.perf_counter()-t0:.1f}s")
+        rng = random.Random(args.seed)
+        # repeated addresses/keys, as in a real diff: ~half the lookups hit an index seen before
+        pool = [rng.randrange(args.rows) for _ in range(args.lookups // 2)]
+        idxs = [rng.choice(pool) for _ in range(args.lookups)]
+
+        ref_n = min(args.reference_lookups, len(idxs))
+        t0 = time.perf_counter(); ref = [get_reference(db, i) for i in idxs[:ref_n]]; dt_ref = time.perf_counter() - t0
+
+        with StatefulIndexMap(db) as m:
+            t0 = time.perf_counter(); one = [m.get(i) for i in idxs]; dt_one = time.perf_counter() - t0
+        with StatefulIndexMap(db) as m:
+            t0 = time.perf_counter(); bulk = m.get_many(idxs); dt_bulk = time.perf_counter() - t0
+            queries = m.queries
+        if one[:ref_n] != ref or [bulk[i] for i in idxs] != one:
+            raise SystemExit("[bench-idxmap] MISMATCH between resolvers")
+
+        n = len(idxs)
+        print(f"[bench-idxmap] lookups={n:,} distinct={len(set(idxs)):,}")
+        print(f"[bench-idxmap] connect/lookup : {ref_n/dt_ref:,.0f} lookups/s  (timed on {ref_n:,}; ~{n*dt_ref/ref_n:.2f}s for all)")
+        print(f"[bench-idxmap] pooled + LRU   : {n/dt_one:,.0f} lookups/s  {dt_one:.3f}s  (x{(dt_ref/ref_n)/(dt_one/n):.0f})")
+        print(f"[bench-idxmap] bulk IN (...)  : {n/dt_bulk:,.0f} lookups/s  {dt_bulk:.3f}s  (x{(dt_ref/ref_n)/(dt_bulk/n):.0f}, {queries} queries)")
+
+if __name__ == "__main__":
+    main()
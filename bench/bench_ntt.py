@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# bench_ntt.py -- per-stage throughput of the sn decoder's blob -> coefficients path (before/after NTT engine)
+import argparse, os, random, sys, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path: sys.path.insert(0, REPO)
+from harborx.ntt import FR_MOD, GENERATOR, NTTEngine, _mpz  # noqa: E402
+from harborx.sn_pydecoder import _blob_to_evals_32B_words, blobs_to_evals  # noqa: E402
+
+# ---------- reference: the original per-call implementation from sn_pydecoder ----------
+
+def _bit_reverse(x, bits):
+    y = 0
+    for _ in range(bits):
+        y = (y << 1) | (x & 1); x >>= 1
+    return y
+
+def _bit_reverse_list(a):
+    n = len(a); bits = (n - 1).bit_length()
+    for i in range(n):
+        j = _bit_reverse(i, bits)
+        if j > i: a[i], a[j] = a[j], a[i]
+
+def _egcd(a, b):
+    if b == 0: return (a, 1, 0)
+    g, x1, y1 = _egcd(b, a % b)
+    return (g, y1, x1 - (a // b) * y1)
+
+def _modinv(a, mod=FR_MOD):
+    a %= mod; g, x, _ = _egcd(a, mod)
+    return x % mod
+
+def ifft_reference(evals):
+    a = list(evals); _bit_reverse_list(a)
+    n = len(a); mod = FR_MOD
+    _bit_reverse_list(a)
+    m = 2
+    while m <= n:
+        step = _modinv(pow(pow(GENERATOR, (mod - 1) // n, mod), n // m, mod), mod)
+        for k in range(0, n, m):
+            w = 1; half = m // 2
+            for j in range(half):
+                u = a[k + j]; t = (a[k + j + half] * w) % mod
+                a[k + j] = (u + t) % mod; a[k + j + half] = (u - t) % mod
+                w = (w * step) % mod
+        m <<= 1
+    inv_n = _modinv(n, mod)
+    return [(x * inv_n) % mod for x in a]
+
+def evals_from_blob(blob):
+    return [int.from_bytes(blob[i:i+32], "big") % FR_MOD for i in range(0, len(blob), 32)]
+
+# ---------- driver ----------
+
+# blob words are canonical BLS12-381 scalars: most are >= FR_MOD and need the reduction
+BLS_MOD = 0x73eda753299d7d483339d80809a1d80553bda402fffe5bfeffffffff00000001
+
+def timed(fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter(); out = fn(); dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blobs", type=int, default=6, help="blobs per batch (one L1 blob group)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    raw = [b"".join((rng.randrange(BLS_MOD)).to_bytes(32, "big") for _ in range(4096)) for _ in range(args.blobs)]
+    n = args.blobs
+
+    t_setup, eng = timed(lambda: NTTEngine(), 1)
+    dt_evals, evals = timed(lambda: [_blob_to_evals_32B_words(b) for b in raw], args.repeat)
+    if evals != [evals_from_blob(b) for b in raw]: raise SystemExit("[bench-ntt] MISMATCH in blob -> evals")
+    dt_vec, vec = timed(lambda: blobs_to_evals(raw), args.repeat)
+    if vec != evals: raise SystemExit("[bench-ntt] MISMATCH in batched blob -> evals")
+    dt_ref, ref = timed(lambda: [ifft_reference(e) for e in evals], args.repeat)
+    dt_one, one = timed(lambda: [eng.inverse(e, permute=False) for e in evals], args.repeat)
+    dt_batch, batch = timed(lambda: eng.transform_many(evals, inverse=True, permute=False), args.repeat)
+    if not (ref == one == batch): raise SystemExit("[bench-ntt] MISMATCH between reference and engine")
+
+    print(f"[bench-ntt] blobs={n} repeat={args.repeat} (engine tables built once in {t_setup*1e3:.1f}ms)")
+    print(f"[bench-ntt] evals       : {dt_evals:.3f}s  {n/dt_evals:,.1f} blobs/s")
+    print(f"[bench-ntt] evals batch : {dt_vec:.3f}s  {n/dt_vec:,.1f} blobs/s  (x{dt_evals/dt_vec:.1f})")
+    print(f"[bench-ntt] ifft before : {dt_ref:.3f}s  {n/dt_ref:,.1f} blobs/s")
+    print(f"[bench-ntt] ifft engine : {dt_one:.3f}s  {n/dt_one:,.1f} blobs/s  (x{dt_ref/dt_one:.1f})")
+    print(f"[bench-ntt] ifft batch  : {dt_batch:.3f}s  {n/dt_batch:,.1f} blobs/s  (x{dt_ref/dt_batch:.1f})")
+    if _mpz is not None:
+        g = NTTEngine(use_gmpy2=True)
+        dt_g, out = timed(lambda: g.transform_many(evals, inverse=True, permute=False), args.repeat)
+        if out != ref: raise SystemExit("[bench-ntt] MISMATCH in gmpy2 engine")
+        print(f"[bench-ntt] ifft gmpy2  : {dt_g:.3f}s  {n/dt_g:,.1f} blobs/s  (x{dt_ref/dt_g:.1f})")
+    else:
+        print("[bench-ntt] gmpy2 not installed; skipping the mpz variant")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# bench_parse_blob.py -- throughput of the bulk (NumPy) ZKBL decoder vs the per-record read loop
+import argparse, gzip, os, subprocess, sys, tempfile, time
+import pyarrow as pa
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from blob_to_arrow import parse_blob, ADDR_T, HASH_T  # noqa: E402
+
+def parse_blob_loop(path:str, chunk:int=200_000):
+    """Reference: the original eight-reads-per-record decoder."""
+    with gzip.open(path, "rb") as gz:
+        if gz.read(4) != b"ZKBL": raise ValueError("Bad magic")
+        gz.read(2); gz.read(2); gz.read(4)
+        ts = int.from_bytes(gz.read(8), "big")
+        n  = int.from_bytes(gz.read(4), "big")
+        gz.read(2)
+        for off in range(0, n, chunk):
+            m = min(chunk, n-off)
+            typ, addr, key, val, txh, bidx, pos, ts_list = [], [], [], [], [], [], [], []
+            for _ in range(m):
+                rtype = gz.read(1)[0]; gz.read(1)
+                address = gz.read(20); k = gz.read(32); v = gz.read(32); th = gz.read(32)
+                blob_index = int.from_bytes(gz.read(4), "big")
+                p = int.from_bytes(gz.read(4), "big")
+                typ.append("state_diff" if rtype==2 else "tx")
+                addr.append(address); key.append(k); val.append(v); txh.append(th)
+                bidx.append(blob_index); pos.append(p); ts_list.append(ts)
+            yield pa.record_batch({
+                "type": pa.array(typ, type=pa.string()),
+                "address": pa.array(addr, type=ADDR_T),
+                "key": pa.array(key, type=HASH_T),
+                "value": pa.array(val, type=HASH_T),
+                "tx_hash": pa.array(txh, type=HASH_T),
+                "blob_index": pa.array(bidx, type=pa.uint32()),
+                "position": pa.array(pos, type=pa.uint32()),
+                "timestamp": pa.array(ts_list, type=pa.uint64()),
+            })
+
+def timed(fn, path, chunk, repeat):
+    best, tbl = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter(); tbl = pa.Table.from_batches(list(fn(path, chunk))); dt = time.perf_counter()-t0
+        best = dt if best is None else min(best, dt)
+    return best, tbl
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blob", help="existing .blob.gz (default: generate one)")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--chunk", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        path = args.blob
+        if not path:
+            subprocess.check_call([sys.executable, os.path.join(HERE, "gen_blob.py"), "--out", os.path.join(td, "blob"),
+                                   "--rows", str(args.rows), "--parts", "1", "--seed", "7"], stdout=subprocess.DEVNULL)
+            path = os.path.join(td, "blob_000001.blob.gz")
+        dt_loop, ref = timed(parse_blob_loop, path, args.chunk, args.repeat)
+        dt_bulk, out = timed(parse_blob, path, args.chunk, args.repeat)
+        if not out.equals(ref): raise SystemExit("[bench-parse] MISMATCH between bulk and loop decoders")
+        n = out.num_rows
+        print(f"[bench-parse] rows={n:,} chunk={args.chunk:,}")
+        print(f"[bench-parse] loop : {dt_loop:.3f}s  {n/dt_loop:,.0f} rows/s")
+        print(f"[bench-parse] bulk : {dt_bulk:.3f}s  {n/dt_bulk:,.0f} rows/s  (x{dt_loop/dt_bulk:.1f})")
+
+if __name__ == "__main__":
+    main()
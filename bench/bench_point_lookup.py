@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# bench_point_lookup.py -- DuckDB point/range lookups on the default vs key-clustered Parquet layout
+import argparse, os, random, subprocess, sys, tempfile, time
+import duckdb
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INGESTOR = os.path.join(os.path.dirname(HERE), "legacy", "ingestor")
+
+def ingest(blobs, out, row_group, cluster):
+    env = dict(os.environ, PYTHONPATH=INGESTOR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    cmd = [sys.executable, "-m", "harborx_ingestor.cli", "ingest", "--source", blobs, "--chain", "0",
+           "--out", out, "--row-group", str(row_group)]
+    if cluster: cmd.append("--cluster")
+    t0 = time.perf_counter()
+    subprocess.check_call(cmd, env=env, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+def dir_bytes(root):
+    return sum(os.path.getsize(os.path.join(b, f)) for b, _, fs in os.walk(root) for f in fs if f.endswith(".parquet"))
+
+def lookups(out, keys, lo, hi):
+    con = duckdb.connect()
+    src = f"read_parquet('{out}/**/*.parquet', hive_partitioning=1)"
+    lat = []
+    for k in keys:
+        t0 = time.perf_counter()
+        con.execute(f"SELECT value, tx_hash FROM {src} WHERE key = ?", [k]).fetchall()
+        lat.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    n_range = con.execute(f"SELECT COUNT(*) FROM {src} WHERE key BETWEEN ? AND ?", [lo, hi]).fetchone()[0]
+    return sorted(lat), time.perf_counter() - t0, n_range
+
+def pct(xs, p): return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--parts", type=int, default=4)
+    ap.add_argument("--row-group", type=int, default=65_536)
+    ap.add_argument("--lookups", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=11)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        blobs = os.path.join(td, "blobs"); os.makedirs(blobs)
+        subprocess.check_call([sys.executable, os.path.join(HERE, "gen_blob.py"), "--out", os.path.join(blobs, "blob"),
+                               "--rows", str(args.rows), "--parts", str(args.parts), "--seed", str(args.seed)],
+                              stdout=subprocess.DEVNULL)
+        layouts = {"default": os.path.join(td, "plain"), "clustered": os.path.join(td, "clustered")}
+        t_ingest = {name: ingest(blobs, out, args.row_group, name == "clustered") for name, out in layouts.items()}
+
+        con = duckdb.connect()
+        keys = [r[0] for r in con.execute(
+            f"SELECT key FROM read_parquet('{layouts['default']}/**/*.parquet') USING SAMPLE reservoir({args.lookups} ROWS) "
+            f"REPEATABLE ({args.seed})").fetchall()]
+        random.Random(args.seed).shuffle(keys)
+        lo, hi = sorted(keys[:2])
+
+        print(f"[bench-lookup] rows={args.rows * args.parts:,} row_group={args.row_group:,} lookups={len(keys)}")
+        for name, out in layouts.items():
+            lat, dt_range, n_range = lookups(out, keys, lo, hi)
+            print(f"[bench-lookup] {name:9s}: ingest {t_ingest[name]:.2f}s  size {dir_bytes(out)/1e6:.1f} MB  "
+                  f"point p50 {pct(lat, .5)*1e3:.2f}ms p95 {pct(lat, .95)*1e3:.2f}ms  "
+                  f"range {dt_range*1e3:.1f}ms ({n_range:,} rows)")
+
+if __name__ == "__main__":
+    main()
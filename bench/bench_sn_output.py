@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# bench_sn_output.py -- sn decoder output stage: dict rows -> JSONL -> pandas -> Parquet vs Arrow batch -> Parquet
+import argparse, io, json, os, random, sys, time, tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path: sys.path.insert(0, REPO)
+import pandas as pd  # noqa: E402
+import pyarrow as pa, pyarrow.parquet as pq  # noqa: E402
+from harborx.ntt import FR_MOD  # noqa: E402
+from harborx.sn_pydecoder import _entries_to_batch, _flatten_parsed, _iter_entries, _resolver_for  # noqa: E402
+
+def make_parsed(contracts, slots, seed):
+    rng = random.Random(seed)
+    out = []
+    for i in range(contracts):
+        c = {"address": rng.randrange(FR_MOD), "storage": [[rng.randrange(FR_MOD), rng.randrange(FR_MOD)] for _ in range(slots)]}
+        if i % 4 == 0: c["class_hash"] = rng.randrange(FR_MOD)
+        if i % 3 == 0: c["nonce"] = rng.randrange(1000)
+        out.append(c)
+    return {"contracts": out}
+
+def via_json(parsed, resolver):
+    """The existing path: dict rows, JSONL text, then pandas -> Parquet as the ingest tool does."""
+    rows = _flatten_parsed(parsed, resolver)
+    text = "".join(json.dumps(r) + "\n" for r in rows)
+    df = pd.read_json(io.StringIO(text), lines=True, dtype=False)
+    buf = io.BytesIO(); df.to_parquet(buf, index=False)
+    return len(rows), len(text), buf.getbuffer().nbytes
+
+def via_arrow(parsed, resolver):
+    batch = _entries_to_batch(_iter_entries(parsed, resolver))
+    buf = io.BytesIO(); pq.write_table(pa.Table.from_batches([batch]), buf, compression="zstd")
+    return batch.num_rows, batch.nbytes, buf.getbuffer().nbytes
+
+def measure(fn, *a):
+    tracemalloc.start()
+    t0 = time.perf_counter(); out = fn(*a); dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return dt, peak, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--contracts", type=int, default=2_000)
+    ap.add_argument("--slots", type=int, default=50, help="storage entries per contract")
+    ap.add_argument("--seed", type=int, default=14)
+    args = ap.parse_args()
+
+    parsed = make_parsed(args.contracts, args.slots, args.seed)
+    resolver = _resolver_for("")
+    dt_j, pk_j, (n, txt, pq_j) = measure(via_json, parsed, resolver)
+    dt_a, pk_a, (n2, mem, pq_a) = measure(via_arrow, parsed, resolver)
+    if n != n2: raise SystemExit("[bench-sn-output] row count mismatch")
+    print(f"[bench-sn-output] rows={n:,}")
+    print(f"[bench-sn-output] json+pandas : {dt_j:.3f}s  {n/dt_j:,.0f} rows/s  peak={pk_j/2**20:.1f}MiB  jsonl={txt/2**20:.1f}MiB parquet={pq_j/2**20:.1f}MiB")
+    print(f"[bench-sn-output] arrow       : {dt_a:.3f}s  {n/dt_a:,.0f} rows/s  peak={pk_a/2**20:.1f}MiB  batch={mem/2**20:.1f}MiB parquet={pq_a/2**20:.1f}MiB  (x{dt_j/dt_a:.1f})")
+
+if __name__ == "__main__":
+    main()
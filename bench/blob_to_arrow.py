@@ -1,10 +1,33 @@
 #!/usr/bin/env python3
 import argparse, gzip, os, time
-import pyarrow as pa, pyarrow.ipc as ipc
+import numpy as np
+import pyarrow as pa, pyarrow.compute as pc, pyarrow.ipc as ipc
 
 ADDR_T = pa.binary(20)
 HASH_T = pa.binary(32)
 
+REC_LEN = 126
+REC_DTYPE = np.dtype([("rtype","u1"), ("pad","u1"), ("address","V20"), ("key","V32"), ("value","V32"),
+                      ("tx_hash","V32"), ("blob_index",">u4"), ("position",">u4")])
+TYPE_NAMES = pa.array(["state_diff", "tx"], type=pa.string())
+
+def fixed_binary(field, typ):
+    buf = np.ascontiguousarray(field).view(np.uint8)
+    return pa.FixedSizeBinaryArray.from_buffers(typ, len(field), [None, pa.py_buffer(buf)])
+
+def records_to_batch(buf, ts:int):
+    rec = np.frombuffer(buf, dtype=REC_DTYPE); m = len(rec)
+    return pa.record_batch({
+        "type": pc.take(TYPE_NAMES, pa.array((rec["rtype"] != 2).astype(np.int8))),
+        "address": fixed_binary(rec["address"], ADDR_T),
+        "key": fixed_binary(rec["key"], HASH_T),
+        "value": fixed_binary(rec["value"], HASH_T),
+        "tx_hash": fixed_binary(rec["tx_hash"], HASH_T),
+        "blob_index": pa.array(rec["blob_index"].astype(np.uint32)),
+        "position": pa.array(rec["position"].astype(np.uint32)),
+        "timestamp": pa.array(np.full(m, ts, dtype=np.uint64)),
+    })
+
 def parse_blob(path:str, chunk:int=200_000):
     with gzip.open(path, "rb") as gz:
         if gz.read(4) != b"ZKBL": raise ValueError("Bad magic")
@@ -13,31 +36,12 @@ def parse_blob(path:str, chunk:int=200_000):
         ts = int.from_bytes(gz.read(8), "big")
         n  = int.from_bytes(gz.read(4), "big")
         rec_len = int.from_bytes(gz.read(2), "big")
-        if rec_len != 126: raise ValueError(f"Unexpected rec_len {rec_len}")
+        if rec_len != REC_LEN: raise ValueError(f"Unexpected rec_len {rec_len}")
         for off in range(0, n, chunk):
             m = min(chunk, n-off)
-            typ, addr, key, val, txh, bidx, pos, ts_list = [], [], [], [], [], [], [], []
-            for _ in range(m):
-                rtype = gz.read(1)[0]; gz.read(1)
-                address = gz.read(20)
-                k = gz.read(32)
-                v = gz.read(32)
-                th = gz.read(32)
-                blob_index = int.from_bytes(gz.read(4), "big")
-                p = int.from_bytes(gz.read(4), "big")
-                typ.append("state_diff" if rtype==2 else "tx")
-                addr.append(address); key.append(k); val.append(v); txh.append(th)
-                bidx.append(blob_index); pos.append(p); ts_list.append(ts)
-            yield pa.record_batch({
-                "type": pa.array(typ, type=pa.string()),
-                "address": pa.array(addr, type=ADDR_T),
-                "key": pa.array(key, type=HASH_T),
-                "value": pa.array(val, type=HASH_T),
-                "tx_hash": pa.array(txh, type=HASH_T),
-                "blob_index": pa.array(bidx, type=pa.uint32()),
-                "position": pa.array(pos, type=pa.uint32()),
-                "timestamp": pa.array(ts_list, type=pa.uint64()),
-            })
+            buf = gz.read(m * REC_LEN)  # whole chunk in one read, split into columns in bulk
+            if len(buf) != m * REC_LEN: raise ValueError(f"Truncated blob at record {off + len(buf)//REC_LEN}/{n}")
+            yield records_to_batch(buf, ts)
 
 def atomic_replace(src, dst, retries=60, backoff=0.05):
     import time
@@ -49,25 +53,28 @@ def atomic_replace(src, dst, retries=60, backoff=0.05):
             time.sleep(min(backoff * (2 ** i), 5.0))
     raise
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--blob", required=True)
-    ap.add_argument("--out", required=True)
-    ap.add_argument("--chunk", type=int, default=200_000)
-    args = ap.parse_args()
-
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    gen = parse_blob(args.blob, args.chunk)
+def convert(blob:str, out:str, chunk:int=200_000):
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    gen = parse_blob(blob, chunk)
     first = next(gen, None)
-    if first is None: raise SystemExit("empty blob")
-    tmp = args.out + ".tmp"
+    if first is None: raise ValueError(f"empty blob: {blob}")
+    tmp = out + ".tmp"
 
     with pa.OSFile(tmp, "wb") as sink:
         with ipc.RecordBatchFileWriter(sink, first.schema) as w:
             w.write_batch(first)
             for b in gen: w.write_batch(b)
 
-    atomic_replace(tmp, args.out)
+    atomic_replace(tmp, out)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blob", required=True)
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--chunk", type=int, default=200_000)
+    args = ap.parse_args()
+
+    convert(args.blob, args.out, args.chunk)
     print(f"[blob->arrow] wrote {args.out}")
 
 if __name__ == "__main__":
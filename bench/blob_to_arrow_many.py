@@ -1,16 +1,131 @@
 #!/usr/bin/env python3
-import argparse, glob, os, sys, time, subprocess
-from concurrent.futures import ThreadPoolExecutor, as_completed
+# blob_to_arrow_many.py -- convert many .blob.gz to Arrow on a pool of long-lived worker processes
+import argparse, glob, gzip, os, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 from pathlib import Path
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path: sys.path.insert(0, HERE)
+
+def out_for(blob, outdir): return Path(outdir) / (Path(blob).name.replace(".blob.gz", ".arrow"))
+
+# Arrow IPC stream size of a decoded blob, over-estimated from its record count: 146 bytes of
+# column data per row plus padding, then per-batch metadata. A blob that still does not fit
+# is decoded again into a segment of the size the worker reports.
+ROW_BYTES, BATCH_BYTES, STREAM_BYTES = 160, 4096, 64 << 10
+
+def blob_rows(blob):
+    """Record count from the ZKBL header (magic, version, flags, batch id, ts, n, rec_len)."""
+    with gzip.open(blob, "rb") as gz:
+        return int.from_bytes(gz.read(26)[20:24], "big")
+
+def shm_capacity(rows, chunk): return rows * ROW_BYTES + (rows // max(1, chunk) + 1) * BATCH_BYTES + STREAM_BYTES
+
+# ---------- worker side (runs inside the pool; pyarrow is imported once per process) ----------
+
+def _init_worker():
+    import pyarrow, blob_to_arrow  # noqa: F401
+
 def one(blob, outdir, chunk):
-    out = Path(outdir) / (Path(blob).name.replace(".blob.gz", ".arrow"))
-    out.parent.mkdir(parents=True, exist_ok=True)
-    cmd = [sys.executable, os.path.join("bench","blob_to_arrow.py"),
-           "--blob", blob, "--out", str(out), "--chunk", str(chunk)]
-    t0 = time.time(); p = subprocess.run(cmd, capture_output=True, text=True); dt = time.time()-t0
-    ok = (p.returncode == 0)
-    return (blob, str(out), ok, dt, p.stdout, p.stderr)
+    import blob_to_arrow
+    out = out_for(blob, outdir)
+    t0 = time.time()
+    try:
+        blob_to_arrow.convert(blob, str(out), chunk)
+        return (blob, str(out), True, time.time()-t0, "")
+    except Exception:
+        return (blob, str(out), False, time.time()-t0, traceback.format_exc())
+
+def one_to_shm(blob, chunk, name, capacity):
+    """
+    Decode a blob as an Arrow IPC stream into the caller's shared-memory segment `name`
+    (`capacity` bytes); returns (blob, size, ok, dt, err). A stream larger than the segment
+    is not written: ok with size > capacity asks the caller for a bigger one.
+    """
+    import pyarrow as pa, pyarrow.ipc as ipc, blob_to_arrow
+    t0 = time.time()
+    try:
+        gen = blob_to_arrow.parse_blob(blob, chunk)
+        first = next(gen, None)
+        if first is None: raise ValueError(f"empty blob: {blob}")
+        stream = pa.BufferOutputStream()
+        with ipc.new_stream(stream, first.schema) as w:
+            w.write_batch(first)
+            for b in gen: w.write_batch(b)
+        data = stream.getvalue(); size = data.size
+        if size <= capacity:
+            # the caller created the segment and holds it open, so it outlives this handle
+            shm = shared_memory.SharedMemory(name=name)
+            try: shm.buf[:size] = memoryview(data).cast("B")
+            finally: shm.close()
+        return (blob, size, True, time.time()-t0, "")
+    except Exception:
+        return (blob, 0, False, time.time()-t0, traceback.format_exc())
+
+# ---------- caller side ----------
+
+class SharedTables:
+    """
+    Tables decoded by the pool, backed zero-copy by shared memory.
+    Segments are created here (sized per blob) and filled by the workers. Each one is
+    unlinked on attach and stays mapped for as long as any table over it is alive, so
+    close() (or leaving the `with` block) only drops this object's references.
+    """
+    def __init__(self):
+        self.tables = {}; self.failed = {}
+    @staticmethod
+    def _alloc(size):
+        return shared_memory.SharedMemory(create=True, size=max(1, size))
+    @staticmethod
+    def _free(shm):
+        shm.close(); shm.unlink()
+    def _attach(self, blob, shm, size):
+        import ctypes, pyarrow as pa, pyarrow.ipc as ipc
+        shm.unlink()                          # mapping stays valid; the name can no longer leak
+        addr = ctypes.addressof(ctypes.c_char.from_buffer(shm.buf))
+        buf = pa.foreign_buffer(addr, size, base=shm)   # buffer keeps the mapping alive
+        self.tables[blob] = ipc.open_stream(buf).read_all()
+    def close(self):
+        self.tables.clear()
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+def convert_many(blobs, outdir, workers, chunk, on_result=None):
+    """Write <outdir>/<blob>.arrow for every blob; returns [(blob, out, ok, dt, err)]."""
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+        futs = [ex.submit(one, b, outdir, chunk) for b in blobs]
+        for fut in as_completed(futs):
+            r = fut.result(); results.append(r)
+            if on_result: on_result(r)
+    return results
+
+def load_many(blobs, workers, chunk, on_result=None) -> SharedTables:
+    """Decode blobs on the pool and hand the tables back through shared memory (no files written)."""
+    out = SharedTables()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+        def submit(blob, capacity):
+            shm = out._alloc(capacity)
+            futs[ex.submit(one_to_shm, blob, chunk, shm.name, capacity)] = (shm, capacity)
+        futs = {}
+        for b in blobs:
+            try:
+                submit(b, shm_capacity(blob_rows(b), chunk))
+            except Exception:
+                out.failed[b] = traceback.format_exc()
+                if on_result: on_result((b, "shm:-", False, 0.0, out.failed[b]))
+        while futs:
+            fut = next(as_completed(futs))
+            shm, capacity = futs.pop(fut)
+            blob, size, ok, dt, err = fut.result()
+            if ok and size > capacity:        # estimate too small: decode again into a segment that fits
+                out._free(shm); submit(blob, size)
+                continue
+            if ok: out._attach(blob, shm, size)
+            else: out._free(shm); out.failed[blob] = err
+            if on_result: on_result((blob, f"shm:{shm.name}", ok, dt, err))
+    return out
 
 def main():
     ap = argparse.ArgumentParser()
@@ -19,29 +134,35 @@ def main():
     ap.add_argument("--workers", type=int, default=min(4,(os.cpu_count() or 4)))
     ap.add_argument("--chunk", type=int, default=200_000)
     ap.add_argument("--skip-exists", dest="skip_exists", action="store_true")
+    ap.add_argument("--to-shm", action="store_true", help="return tables via shared memory instead of writing files")
     args = ap.parse_args()
-    skip_exists = getattr(args, "skip_exists", False)
+    if args.skip_exists and args.to_shm:
+        ap.error("--skip-exists only applies to file output, not --to-shm")
+    skip_exists = args.skip_exists
 
     blobs = sorted(glob.glob(args.pattern))
     if not blobs:
         print(f"[par] no blobs match {args.pattern}"); return
     if skip_exists:
-        def out_for(b): return Path(args.outdir) / (Path(b).name.replace(".blob.gz",".arrow"))
         before = len(blobs)
-        blobs = [b for b in blobs if not out_for(b).exists()]
+        blobs = [b for b in blobs if not out_for(b, args.outdir).exists()]
         if before - len(blobs): print(f"[par] skipped {before-len(blobs)} existing file(s)")
         if not blobs: print("[par] nothing to do (all outputs exist)."); return
 
-    print(f"[par] converting {len(blobs)} blobs with {args.workers} worker(s)")
-    results = []
-    with ThreadPoolExecutor(max_workers=args.workers) as ex:
-        futs = [ex.submit(one, b, args.outdir, args.chunk) for b in blobs]
-        for fut in as_completed(futs):
-            blob, out, ok, dt, so, se = fut.result()
-            print(f"[par] {'OK' if ok else 'FAIL'} {Path(blob).name} -> {Path(out).name} in {dt:.2f}s")
-            if not ok: print("---- stdout ----\n", so, "\n---- stderr ----\n", se)
-            results.append((blob,out,ok,dt))
-    ok_n = sum(1 for _,_,ok,_ in results if ok)
+    def report(r):
+        blob, out, ok, dt, err = r
+        print(f"[par] {'OK' if ok else 'FAIL'} {Path(blob).name} -> {Path(out).name} in {dt:.2f}s")
+        if not ok: print("---- error ----\n", err)
+
+    print(f"[par] converting {len(blobs)} blobs with {args.workers} worker process(es)")
+    if args.to_shm:
+        with load_many(blobs, args.workers, args.chunk, report) as st:
+            rows = sum(t.num_rows for t in st.tables.values())
+            print(f"[par] done: {len(st.tables)}/{len(blobs)} succeeded, {rows:,} rows in shared memory")
+            if st.failed: sys.exit(1)
+        return
+    results = convert_many(blobs, args.outdir, args.workers, args.chunk, report)
+    ok_n = sum(1 for _,_,ok,_,_ in results if ok)
     print(f"[par] done: {ok_n}/{len(results)} succeeded")
     if ok_n != len(results): sys.exit(1)
 
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 # compact_arrow.py -- LWW-compact Arrow files (subset by blob index) into a single Arrow snapshot
-import argparse, os, time
+import argparse, os, sys, time
 from pathlib import Path
 import duckdb, pyarrow as pa, pyarrow.ipc as ipc
 
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path: sys.path.insert(0, REPO)
+from harborx.catalog import files_matching  # noqa: E402
+
 def write_empty_snapshot(out_path:str, schema):
     tmp = out_path + ".tmp"
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
@@ -24,7 +28,10 @@ def main():
         raise SystemExit(f"No .arrow in {args.arrowdir}")
 
     if args.max_index is not None:
-        paths = [p for p in all_paths if int(Path(p).stem.split("_")[-1]) <= args.max_index]
+        # prune by the blob_index range in the catalog instead of opening (or name-parsing) every file;
+        # top level only, like the glob above
+        paths = sorted(p.replace("\\","/") for p in files_matching(args.arrowdir, recursive=False,
+                                                                    blob_index=(None, args.max_index)))
     else:
         paths = all_paths
 
@@ -44,7 +51,7 @@ def main():
         tbl = ipc.open_file(p).read_all()
         name = f"t{i}"
         con.register(name, tbl)
-        views.append(f"SELECT * FROM {name}")
+        views.append(f"SELECT * FROM {name}" + (f" WHERE blob_index <= {args.max_index}" if args.max_index is not None else ""))
     con.execute("CREATE OR REPLACE VIEW state AS " + " UNION ALL ".join(views))
     sql = """
     WITH ranked AS (
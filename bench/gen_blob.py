@@ -1,6 +1,33 @@
 #!/usr/bin/env python3
 import argparse, os, time, gzip, secrets, struct, random, hashlib
 MAGIC = b"ZKBL"; REC_LEN = 1+1+20+32+32+32+4+4
+INDEX_MAGIC = b"ZKBI"; TRAILER_ID = b"ZI"
+def gz_trailer(index_off:int, index_len:int)->bytes:
+    # empty gzip member whose FEXTRA field locates the block index (42 bytes, BGZF-EOF style)
+    extra = TRAILER_ID + struct.pack("<H", 16) + struct.pack(">QQ", index_off, index_len)
+    return (b"\x1f\x8b\x08\x04" + b"\x00"*4 + b"\x00\xff" + struct.pack("<H", len(extra)) + extra
+            + b"\x03\x00" + struct.pack("<II", 0, 0))
+class BlockWriter:
+    """v2 container: header member, independently gzipped record blocks, index member, trailer."""
+    def __init__(self, fp, header:bytes, block_rows:int):
+        self.fp, self.block_rows = fp, block_rows
+        self.buf = bytearray(); self.rows = 0; self.row_start = 0; self.kmin = self.kmax = None; self.index = []
+        fp.write(gzip.compress(header, mtime=0))
+    def write(self, rec:bytes):
+        key = bytes(rec[22:54]); self.buf += rec; self.rows += 1
+        if self.kmin is None or key < self.kmin: self.kmin = key
+        if self.kmax is None or key > self.kmax: self.kmax = key
+        if self.rows >= self.block_rows: self.flush()
+    def flush(self):
+        if not self.rows: return
+        off = self.fp.tell(); member = gzip.compress(bytes(self.buf), mtime=0); self.fp.write(member)
+        self.index.append(struct.pack(">QIQI32s32s", off, len(member), self.row_start, self.rows, self.kmin, self.kmax))
+        self.row_start += self.rows; self.buf = bytearray(); self.rows = 0; self.kmin = self.kmax = None
+    def close(self):
+        self.flush()
+        off = self.fp.tell()
+        member = gzip.compress(INDEX_MAGIC + struct.pack(">I", len(self.index)) + b"".join(self.index), mtime=0)
+        self.fp.write(member); self.fp.write(gz_trailer(off, len(member)))
 def key_bytes_from_id(i:int)->bytes: return hashlib.sha256(f"K{i}".encode()).digest()
 def addr_bytes_from_id(i:int)->bytes:
     import hashlib as _h; return _h.sha1(f"A{i}".encode()).digest()
@@ -14,6 +41,8 @@ def main():
     ap.add_argument("--hot-frac", type=float, default=0.05)
     ap.add_argument("--hot-amp", type=float, default=20.0)
     ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--format", choices=["v1","v2"], default="v1", help="v2 = block-indexed, parallel-decodable container")
+    ap.add_argument("--block-rows", type=int, default=65536, help="records per compressed block (v2)")
     args = ap.parse_args()
     rng = random.Random(args.seed); ts = int(time.time())
     K = args.keyspace if args.keyspace and args.keyspace > 0 else None
@@ -26,10 +55,12 @@ def main():
         path = f"{args.out}_{i:06d}.blob.gz"; tmp = path + ".tmp"
         print(f"[gen-blob] writing {path} rows={args.rows:,}"+(f" keyspace={K:,}" if K else ""))
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with gzip.open(tmp, "wb") as gz:
-            gz.write(MAGIC); gz.write(struct.pack(">H", 1)); gz.write(struct.pack(">H", 0))
-            gz.write(struct.pack(">I", i)); gz.write(struct.pack(">Q", ts))
-            gz.write(struct.pack(">I", args.rows)); gz.write(struct.pack(">H", REC_LEN))
+        version = 2 if args.format == "v2" else 1
+        header = (MAGIC + struct.pack(">H", version) + struct.pack(">H", 0) + struct.pack(">I", i)
+                  + struct.pack(">Q", ts) + struct.pack(">I", args.rows) + struct.pack(">H", REC_LEN))
+        with open(tmp, "wb") as raw:
+            if version == 2: gz = BlockWriter(raw, header, args.block_rows)
+            else: gz = gzip.open(raw, "wb"); gz.write(header)
             for pos in range(args.rows):
                 rec = bytearray(); rec += struct.pack("B", args.blob_type); rec += b"\x00"
                 if K:
@@ -41,5 +72,6 @@ def main():
                 value = secrets.token_bytes(32); txh = secrets.token_bytes(32)
                 rec += address + key + value + txh + struct.pack(">I", i) + struct.pack(">I", pos)
                 gz.write(rec)
+            gz.close()
         os.replace(tmp, path); print(f"[gen-blob] done {path}")
 if __name__ == "__main__": main()
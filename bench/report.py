@@ -3,8 +3,12 @@
 import argparse, os, subprocess, sys, time, glob
 from pathlib import Path
 
-def run(cmd):
-    p = subprocess.run(cmd, capture_output=True, text=True)
+INGESTOR = str(Path(__file__).resolve().parents[1] / "legacy" / "ingestor")
+if INGESTOR not in sys.path: sys.path.insert(0, INGESTOR)
+from harborx_ingestor.scan import scan_blobs, select_window  # noqa: E402
+
+def run(cmd, env=None):
+    p = subprocess.run(cmd, capture_output=True, text=True, env=env)
     if p.stdout: print(p.stdout, end="")
     if p.stderr: print(p.stderr, end="")
     if p.returncode != 0:
@@ -113,6 +117,8 @@ def main():
     ap.add_argument("--windows", default="1,4,16,64")
     ap.add_argument("--out", default="report_windows.md")
     ap.add_argument("--no-exact", action="store_true", help="do not use --exact-ratio in gen")
+    ap.add_argument("--single-pass", action="store_true",
+                    help="parse each blob once and write Arrow + SQLite together (harborx_ingestor multi-sink ingest)")
     args = ap.parse_args()
     print(f"[python] using: {sys.executable}")
 
@@ -140,18 +146,28 @@ def main():
         pass
     run(gen_cmd)
 
-    # 2) blobs -> arrow
-    t0=time.time()
-    run([sys.executable, os.path.join("bench","blob_to_arrow_many.py"),
-         "--pattern","lake/blob_*.blob.gz","--outdir","lake/hot","--workers",str(args.workers),
-         "--chunk",str(args.chunk),"--skip-exists"])
-    dt_arrow_write = time.time()-t0
+    if args.single_pass:
+        # 2+3) one parse per blob, fanned out to lake/hot/*.arrow and lake/sqlite.db
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (INGESTOR, env.get("PYTHONPATH")) if p)
+        t0=time.time()
+        run([sys.executable, "-m", "harborx_ingestor.cli", "ingest", "--source", "lake", "--chain", "0",
+             "--row-group", str(args.chunk), "--arrow-dir", "lake/hot", "--sqlite", "lake/sqlite.db",
+             "--sqlite-reset"], env=env)
+        dt_single = time.time()-t0
+    else:
+        # 2) blobs -> arrow
+        t0=time.time()
+        run([sys.executable, os.path.join("bench","blob_to_arrow_many.py"),
+             "--pattern","lake/blob_*.blob.gz","--outdir","lake/hot","--workers",str(args.workers),
+             "--chunk",str(args.chunk),"--skip-exists"])
+        dt_arrow_write = time.time()-t0
 
-    # 3) load SQLite (append baseline)
-    t0=time.time()
-    run([sys.executable, os.path.join("bench","blobs_to_sqlite_many.py"),
-         "--pattern","lake/blob_*.blob.gz","--db","lake/sqlite.db","--reset","--mode","append"])
-    dt_sqlite_append = time.time()-t0
+        # 3) load SQLite (append baseline)
+        t0=time.time()
+        run([sys.executable, os.path.join("bench","blobs_to_sqlite_many.py"),
+             "--pattern","lake/blob_*.blob.gz","--db","lake/sqlite.db","--reset","--mode","append"])
+        dt_sqlite_append = time.time()-t0
 
     # Markdown
     lines = []
@@ -161,10 +177,15 @@ def main():
     lines.append(f"  Update ratio: **{args.update_ratio:.2f}** → keyspace≈**{K:,}**")
     lines.append(f"- Workers: **{args.workers}**, chunk: **{args.chunk:,}**")
     lines.append("")
-    lines.append(f"- Arrow write (all parts): **{dt_arrow_write:.3f}s**, SQLite append (all parts): **{dt_sqlite_append:.3f}s**")
+    if args.single_pass:
+        lines.append(f"- Single-pass ingest, Arrow + SQLite append (all parts): **{dt_single:.3f}s**")
+    else:
+        lines.append(f"- Arrow write (all parts): **{dt_arrow_write:.3f}s**, SQLite append (all parts): **{dt_sqlite_append:.3f}s**")
     lines.append("")
 
-    N = args.parts
+    # plan windows from blob headers (batch ids), not from file names or payloads
+    blobs = scan_blobs("lake")
+    N = max(b.batch_id for b in blobs)
     # 4) For each window W
     for W in windows:
         base_max = N - W
@@ -179,8 +200,8 @@ def main():
         dt_arrow_compact = time.time()-t0
 
         # Arrow live query
-        recent = [str(p).replace("\\","/") for p in sorted(Path("lake/hot").glob("*.arrow"))
-                  if int(Path(p).stem.split("_")[-1]) > base_max]
+        recent = [f"lake/hot/{Path(b.path).name.replace('.blob.gz', '.arrow')}"
+                  for b in select_window(blobs, batch_from=base_max + 1)]
         dt_arrow_live = run_duckdb_live(out_snap, recent)
 
         # SQLite compact base
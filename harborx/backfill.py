@@ -0,0 +1,223 @@
+from __future__ import annotations
+import json, os, shutil, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from harborx import blobscan
+from harborx.blobscan import FollowCursor, ensure_dir
+from harborx.output_ledger import OutputLedger, consumer_key
+from harborx.sn_stream import write_manifest
+
+# Historical backfill of an L1 block range: the range is cut into shards of `shard_blocks`
+# blocks, each shard is a bounded follower (blobscan.sn_follow_once with end_block) with
+# its own cursor checkpoint, raw dir and decoder output dir, and shards run on a thread
+# pool. Finished shards are merged into the lake strictly in block order, so the lake
+# only ever grows by a contiguous prefix of the range. Layout under <out>:
+#   _backfill/plan.json                 range, shard size, shards merged so far
+#   _backfill/shard-<lo>-<hi>.json      cursor checkpoint (+ .done once complete)
+#   shards/<lo>-<hi>/raw, .../decoded   downloaded blobs and decoder output (streamed:
+#                                       <table>/*.parquet, as in the lake)
+
+STATE_DIR = "_backfill"
+MAX_PAGES_PER_STEP = blobscan.MAX_PAGES_PER_STEP
+
+class Shard(NamedTuple):
+    lo: int
+    hi: int                             # inclusive
+
+    @property
+    def name(self) -> str:
+        return f"{self.lo}-{self.hi}"
+
+def plan_shards(start_block: int, end_block: int, shard_blocks: int) -> List[Shard]:
+    if end_block < start_block:
+        raise ValueError(f"empty range {start_block}..{end_block}")
+    step = max(1, shard_blocks)
+    return [Shard(lo, min(end_block, lo + step - 1)) for lo in range(start_block, end_block + 1, step)]
+
+def _fmt_eta(sec: Optional[float]) -> str:
+    if sec is None:
+        return "?"
+    sec = int(sec)
+    return f"{sec // 3600}:{sec % 3600 // 60:02d}:{sec % 60:02d}"
+
+class BackfillProgress:
+    """Blocks covered and blobs processed across shards; rate and ETA from this run's progress."""
+
+    def __init__(self, shards: List[Shard]):
+        self.total = sum(s.hi - s.lo + 1 for s in shards)
+        self.covered: Dict[Shard, int] = {s: 0 for s in shards}
+        self.blobs = 0
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._start: Optional[int] = None
+
+    def update(self, shard: Shard, cursor_block: int, blobs: int = 0) -> str:
+        with self._lock:
+            self.covered[shard] = max(0, min(shard.hi, cursor_block) - shard.lo + 1)
+            self.blobs += blobs
+            return self.line()
+
+    def start(self) -> None:
+        self._start, self._t0 = sum(self.covered.values()), time.perf_counter()
+
+    def stats(self) -> Dict[str, Any]:
+        done = sum(self.covered.values())
+        dt = time.perf_counter() - self._t0
+        rate = (done - (self._start or 0)) / dt if dt > 0 else 0.0
+        return {"blocks": self.total, "covered": done, "blobs": self.blobs, "seconds": dt,
+                "blobs_per_s": self.blobs / dt if dt > 0 else 0.0, "blocks_per_s": rate,
+                "eta": (self.total - done) / rate if rate > 0 else None}
+
+    def line(self) -> str:
+        st = self.stats()
+        return (f"{100.0 * st['covered'] / max(1, st['blocks']):.1f}% of blocks, {st['blobs']} blob(s), "
+                f"{st['blobs_per_s']:.1f} blobs/s, {st['blocks_per_s']:.1f} blocks/s, ETA {_fmt_eta(st['eta'])}")
+
+class Backfill:
+    """
+    run() processes every unfinished shard on `workers` threads and merges finished shards
+    into `lake` in block order. Re-running with the same out dir and range resumes: done
+    shards are skipped, others continue from their cursor, merging from the first unmerged
+    shard. Keywords in `opts` go to blobscan.sn_follow_once (fetch and decode options).
+    stream=True decodes each shard in memory into lake tables under its decoded dir
+    (blobscan.stream_items), which the merge then copies table by table. Otherwise the
+    merge ingests the shard's JSON decoder output, so with a lake the Python decoder's
+    columnar formats (py_format parquet/arrow) are rejected.
+    """
+
+    def __init__(self, out_dir: str, start_block: int, end_block: int, *, shard_blocks: int = 7200,
+                 workers: int = 4, lake: str = "", chain_id: int = 1, page_size: int = 100,
+                 pages_per_step: int = 4, stream: bool = False, debug: bool = False, **opts):
+        self.out_dir, self.lake = os.path.abspath(out_dir), lake
+        self.state_dir = os.path.join(self.out_dir, STATE_DIR)
+        self.workers, self.chain_id, self.page_size = max(1, workers), chain_id, page_size
+        self.pages_per_step, self.debug, self.opts = max(1, pages_per_step), debug, opts
+        self.stream = stream
+        if lake and not stream and opts.get("py_decoder") and opts.get("py_format", "json") != "json":
+            raise ValueError(f"py_format={opts['py_format']!r} output cannot be merged into a lake; "
+                             "use py_format=json or stream")
+        self.plan_path = os.path.join(self.state_dir, "plan.json")
+        plan = {"start_block": start_block, "end_block": end_block, "shard_blocks": shard_blocks, "merged": 0}
+        if os.path.exists(self.plan_path):
+            with open(self.plan_path, "r", encoding="utf-8") as f:
+                old = json.load(f)
+            if {k: old.get(k) for k in ("start_block", "end_block", "shard_blocks")} != \
+                    {k: plan[k] for k in ("start_block", "end_block", "shard_blocks")}:
+                raise ValueError(f"{self.plan_path} holds a different plan ({old}); use another --out")
+            plan = old
+        self.plan = plan
+        self.shards = plan_shards(start_block, end_block, shard_blocks)
+        self.progress = BackfillProgress(self.shards)
+        self._merge_lock = threading.Lock()
+        self._save_plan()
+
+    def _save_plan(self) -> None:
+        ensure_dir(self.state_dir)
+        tmp = self.plan_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.plan, f, indent=2)
+        os.replace(tmp, self.plan_path)
+
+    def _paths(self, shard: Shard):
+        base = os.path.join(self.out_dir, "shards", shard.name)
+        cursor = os.path.join(self.state_dir, f"shard-{shard.name}.json")
+        return os.path.join(base, "raw"), os.path.join(base, "decoded"), cursor, cursor + ".done"
+
+    def is_done(self, shard: Shard) -> bool:
+        return os.path.exists(self._paths(shard)[3])
+
+    def run_shard(self, shard: Shard) -> Shard:
+        raw, decoded, cursor_path, done_path = self._paths(shard)
+        if os.path.exists(done_path):
+            return shard
+        cursor = FollowCursor(cursor_path, start_block=shard.lo)
+        opts = dict(self.opts)
+        opts["decode_cache"] = opts.get("decode_cache") or os.path.join(self.out_dir, "_decode_cache")
+        if self.stream:
+            opts["stream"] = decoded
+        pages, stalls = self.pages_per_step, 0
+        while True:
+            got, outcome = blobscan.sn_follow_once(
+                cursor, raw, self.chain_id, self.page_size, pages, shard.hi,
+                decoder_cache=decoded, debug=self.debug, **opts)
+            print(f"[backfill] shard {shard.name}: +{got} blob(s), at eth_block={cursor.eth_block} | "
+                  f"{self.progress.update(shard, cursor.eth_block, got)}")
+            if outcome == blobscan.CAUGHT_UP:
+                break
+            if got:
+                stalls = 0
+                continue
+            # nothing processed: a failed batch, or more pages behind a block larger than the step
+            stalls += 1
+            if outcome == blobscan.MORE:
+                pages = min(pages * 2, max(self.pages_per_step, MAX_PAGES_PER_STEP))
+            if stalls > 3:
+                raise RuntimeError(f"shard {shard.name} is not making progress at eth_block={cursor.eth_block}")
+        self.progress.update(shard, shard.hi)
+        with open(done_path, "w", encoding="utf-8") as f:
+            json.dump({"eth_block": cursor.eth_block}, f)
+        return shard
+
+    def _merge_ready(self) -> None:
+        """Merge finished shards into the lake, in order, up to the first unfinished one."""
+        with self._merge_lock:
+            while self.plan["merged"] < len(self.shards) and self.is_done(self.shards[self.plan["merged"]]):
+                shard = self.shards[self.plan["merged"]]
+                if self.lake:
+                    self._merge(shard)
+                self.plan["merged"] += 1
+                self._save_plan()
+
+    def _merge(self, shard: Shard) -> None:
+        _, decoded, _, _ = self._paths(shard)
+        if not os.path.isdir(decoded):
+            return
+        ensure_dir(self.lake)
+        tables = sorted(n for n in os.listdir(decoded) if os.path.isdir(os.path.join(decoded, n)) and not n.startswith("_"))
+        for t in tables:
+            ensure_dir(os.path.join(self.lake, t))
+            for n in sorted(os.listdir(os.path.join(decoded, t))):
+                if n.endswith(".parquet"):
+                    tmp = os.path.join(self.lake, t, f".{n}.tmp")
+                    shutil.copyfile(os.path.join(decoded, t, n), tmp)
+                    os.replace(tmp, os.path.join(self.lake, t, n))
+        if tables:
+            write_manifest(self.lake)
+        todo = []
+        if OutputLedger.exists(decoded):
+            with OutputLedger(decoded) as ledger:
+                todo = ledger.pending(consumer_key(self.lake), (".json",))
+        if todo and blobscan.run_ingest(decoded, self.lake, debug=self.debug) != 0:
+            raise RuntimeError(f"ingest of shard {shard.name} failed")
+        print(f"[backfill] merged shard {shard.name} into {self.lake}")
+
+    def run(self) -> Dict[str, Any]:
+        for s in self.shards:
+            if self.is_done(s):
+                self.progress.update(s, s.hi)
+            elif os.path.exists(self._paths(s)[2]):
+                self.progress.update(s, FollowCursor(self._paths(s)[2], s.lo).eth_block)
+        self.progress.start()
+        todo = [s for s in self.shards if not self.is_done(s)]
+        print(f"[backfill] {len(self.shards)} shard(s), {len(todo)} to run on {self.workers} worker(s); "
+              f"{self.plan['merged']} merged")
+        self._merge_ready()
+        failed: List[str] = []
+        with ThreadPoolExecutor(max_workers=self.workers) as ex:
+            futs = {ex.submit(self.run_shard, s): s for s in todo}
+            for fut in as_completed(futs):
+                s = futs[fut]
+                try:
+                    fut.result()
+                except Exception as e:
+                    failed.append(s.name)
+                    print(f"[backfill] shard {s.name} failed: {e}")
+                    continue
+                self._merge_ready()
+        st = self.progress.stats()
+        st.update(shards=len(self.shards), merged=self.plan["merged"], failed=failed)
+        print(f"[backfill] done: {self.plan['merged']}/{len(self.shards)} shard(s) merged, "
+              f"{st['blobs']} blob(s) in {st['seconds']:.1f}s ({st['blobs_per_s']:.1f} blobs/s)"
+              + (f"; failed: {', '.join(failed)}" if failed else ""))
+        return st
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import hashlib, os, sqlite3, threading, zlib
+from typing import Optional
+
+# Content-addressed store of raw blobs. A blob lives once, under the sha256 of its bytes,
+# at <root>/objects/<h[:2]>/<h[2:4]>/<h>.zst, compressed (the 128 KiB payloads are mostly
+# zero padding) and written atomically, only when not already present. zstd comes from
+# pyarrow; without it a store uses zlib (.z), about ten times slower per blob. A store
+# keeps the codec it was created with, recorded in its index. index.sqlite maps
+# (eth_block, tx_hash, index) to that hash, so "do we already have this blob?" is a
+# lookup instead of a download. Object paths can be handed to sn_pydecoder like plain
+# blob files: its _load_blob reads them through read_blob.
+
+INDEX_NAME = "index.sqlite"
+BLOB_SUFFIXES = (".zst", ".z")
+
+def _zstd_compress(data: bytes) -> bytes:
+    import pyarrow as pa
+    return pa.compress(data, codec="zstd", asbytes=True)
+
+def _zstd_decompress(data: bytes) -> bytes:
+    import pyarrow as pa
+    return pa.CompressedInputStream(pa.BufferReader(data), "zstd").read()
+
+# suffix -> (compress, decompress); zlib level 1: zero runs pack about as well as at 9
+_CODECS = {
+    ".zst": (_zstd_compress, _zstd_decompress),
+    ".z": (lambda b: zlib.compress(b, 1), zlib.decompress),
+}
+
+def _default_suffix() -> str:
+    try:
+        import pyarrow  # noqa: F401
+        return ".zst"
+    except ImportError:
+        return ".z"
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def read_blob(path: str) -> bytes:
+    """The raw bytes of a store object (or of a plain blob file)."""
+    with open(path, "rb") as fp:
+        data = fp.read()
+    ext = os.path.splitext(path)[1]
+    return _CODECS[ext][1](data) if ext in _CODECS else data
+
+class BlobStore:
+    """
+    put(data) -> hash stores a blob unless its hash is already there; add(eth_block,
+    tx_hash, index, data) also indexes it; lookup(eth_block, tx_hash, index) -> hash or
+    None (only for blobs whose object exists). Safe to share between threads, and
+    several processes can use one root (sqlite WAL, atomic object writes).
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, INDEX_NAME), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")   # WAL: no fsync per indexed blob
+        self._db.execute("CREATE TABLE IF NOT EXISTS blob_index (eth_block INTEGER NOT NULL, tx_hash TEXT NOT NULL, "
+                         "idx INTEGER NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (eth_block, tx_hash, idx))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('suffix', ?)", (_default_suffix(),))
+        self._db.commit()
+        self.suffix = self._db.execute("SELECT v FROM meta WHERE k='suffix'").fetchone()[0]
+        self._compress = _CODECS[self.suffix][0]
+        self.stored = self.deduped = self.bytes_in = self.bytes_written = 0
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest[2:4], digest + self.suffix)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, data: bytes) -> str:
+        digest = blob_hash(data)
+        p = self.path(digest)
+        with self._lock:
+            self.bytes_in += len(data)
+        if os.path.exists(p):
+            with self._lock:
+                self.deduped += 1
+            return digest
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        packed = self._compress(data)
+        tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fp:
+            fp.write(packed)
+        os.replace(tmp, p)
+        with self._lock:
+            self.stored += 1
+            self.bytes_written += len(packed)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return read_blob(self.path(digest))
+
+    def add(self, eth_block: int, tx_hash: str, index: int, data: bytes) -> str:
+        digest = self.put(data)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO blob_index VALUES (?,?,?,?)", (eth_block, tx_hash, index, digest))
+            self._db.commit()
+        return digest
+
+    def lookup(self, eth_block: int, tx_hash: str, index: int) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT hash FROM blob_index WHERE eth_block=? AND tx_hash=? AND idx=?",
+                                   (eth_block, tx_hash, index)).fetchone()
+        return row[0] if row and self.has(row[0]) else None
+
+    def stats(self) -> str:
+        ratio = self.bytes_in / self.bytes_written if self.bytes_written else 0.0
+        return (f"stored={self.stored} deduped={self.deduped} in={self.bytes_in} "
+                f"written={self.bytes_written} (x{ratio:.0f})")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
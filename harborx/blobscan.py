@@ -5,10 +5,16 @@ from typing import List, Dict, Any, Tuple, Optional
 from collections import defaultdict
 import requests
 
-def _write_txt(base: str, chain_id: int, eth_block: int, idx: int, content: bytes, ts: int) -> str:
+def _raw_txt_path(base: str, chain_id: int, eth_block: int, idx: int, ts: int, tx_hash: str="") -> str:
     outdir = os.path.join(base, f"chain_id={chain_id}", f"date={_ts_utc_str(ts)}", "topic=raw_txt")
     ensure_dir(outdir)
-    path = os.path.join(outdir, f"part-{int(time.time()*1000)}.txt")
+    # block/tx/index suffix: concurrent downloads land within the same millisecond, and
+    # several txs of one block each have a blob 0
+    tx = tx_hash[2:10] if tx_hash.startswith("0x") else tx_hash[:8]
+    return os.path.abspath(os.path.join(outdir, f"part-{int(time.time()*1000)}-{eth_block}-{tx}-{idx}.txt"))
+
+def _write_txt(base: str, chain_id: int, eth_block: int, idx: int, content: bytes, ts: int, tx_hash: str="") -> str:
+    path = _raw_txt_path(base, chain_id, eth_block, idx, ts, tx_hash)
     with open(path, "wb") as fp:
         fp.write(content) 
     return os.path.abspath(path)
@@ -59,11 +65,12 @@ def _pick_storage_url(it: Dict[str, Any]) -> Optional[str]:
     return None
 
 # ----------------------------- fetch blobs -----------------------------
-BLOSCAN_API = "https://api.blobscan.com/blobs"
+BLOSCAN_API = os.environ.get("HARBORX_BLOBSCAN_API", "https://api.blobscan.com/blobs")
 
-def fetch_starknet_blobs(page: int, page_size: int, start_block: int=0, end_block: int=0, debug: bool=False) -> List[Dict[str, Any]]:
+def fetch_starknet_blobs(page: int, page_size: int, start_block: int=0, end_block: int=0, debug: bool=False,
+                         sort: str="desc") -> List[Dict[str, Any]]:
     params = {
-        "p": page, "ps": page_size, "count": "false", "sort": "desc",
+        "p": page, "ps": page_size, "count": "false", "sort": sort,
         "rollups": "starknet", "category": "rollup", "type": "canonical"
     }
     if start_block:
@@ -92,29 +99,45 @@ def fetch_starknet_blobs(page: int, page_size: int, start_block: int=0, end_bloc
     return items
 
 # ----------------------------- manifest & config -----------------------------
-def build_grouped_manifest(entries: List[Tuple[int,str,int,str,int]], root_out: str) -> str:
-    """
-    entries: [(eth_block, tx_hash, idx, abs_path, ts), ...]
-    manifest schema:
-    { "entries": [ { "eth_block": u64, "starknet_block": 0, "blobs":[{"path": "..."}...] }, ... ] }
-    """
+def _complete_groups(entries: List[Tuple[int,str,int,str,int]]) -> List[Tuple[int,str,List[str]]]:
+    """(eth_block, tx_hash, [paths by blob idx]) for every tx whose blobs 0..k are all present."""
     groups: Dict[Tuple[int,str], List[Tuple[int,str]]] = defaultdict(list)
     for eb, txh, idx, pth, ts in entries:
         groups[(eb, txh)].append((idx, pth))
 
-    manifest_entries = []
-    for (eb, _txh), lst in groups.items():
+    out = []
+    for (eb, txh), lst in groups.items():
         lst.sort(key=lambda t: t[0])  # by idx
         idxs = [i for i,_ in lst]
         if not idxs or idxs != list(range(idxs[-1] + 1)):
             continue
-        manifest_entries.append({
-            "eth_block": int(eb),
-            "starknet_block": 0,
-            "blobs": [{"path": os.path.abspath(p)} for _, p in lst],
-        })
+        out.append((int(eb), txh, [os.path.abspath(p) for _, p in lst]))
+    return out
+
+def group_entries(entries: List[Tuple[int,str,int,str,int]]):
+    """Complete blob groups as sn_pydecoder.BlobGroup, indexed by tx_hash order within each eth_block."""
+    from harborx.sn_pydecoder import BlobGroup
+    complete = sorted(_complete_groups(entries), key=lambda g: (g[0], g[1]))
+    groups, seen = [], defaultdict(int)
+    for eb, _txh, paths in complete:
+        groups.append(BlobGroup(eb, seen[eb], paths))
+        seen[eb] += 1
+    return groups
+
+def build_grouped_manifest(entries: List[Tuple[int,str,int,str,int]], root_out: str) -> str:
+    """
+    entries: [(eth_block, tx_hash, idx, abs_path, ts), ...]
+    manifest schema:
+    { "entries": [ { "eth_block": u64, "starknet_block": 0, "blobs":[{"path": "..."}...] }, ... ] }
+    """
+    manifest_entries = [{
+        "eth_block": eb,
+        "starknet_block": 0,
+        "blobs": [{"path": p} for p in paths],
+    } for eb, _txh, paths in _complete_groups(entries)]
 
     root = os.path.dirname(root_out.rstrip("\\/"))
+    ensure_dir(root)
     path = os.path.join(root, "decoder_manifest.json")
     with open(path, "w", encoding="utf-8") as fp:
         json.dump({"entries": manifest_entries}, fp, indent=2)
@@ -160,7 +183,228 @@ def run_external_decoder(decoder_path: str, config_path: str, manifest_path: str
         print(proc.stdout)
     return proc.returncode
 
+# Sharded runs: the grouped manifest is cut into contiguous runs of groups (balanced by
+# blob count, block order kept within each), and every shard runs its own starknet-scrape
+# process with a private config, manifest and db_file in <cache_dir>/_shards/shard-<k>,
+# and shard-<k>/cache as its cache_dir. Outputs are moved back into cache_dir after all shards
+# finish, in shard order, so the merged result does not depend on which process ended first.
+# Every run re-seeds each shard's db_file from the configured one, and once all shards
+# succeed their tables are folded back into it (_merge_shard_dbs), so the next run starts
+# from the state this one reached. A single shard is the plain run, staged the same way
+# (with the configured db_file, if any), so the outputs of every run are known without
+# rescanning cache_dir.
+SHARD_DIR = "_shards"
+
+def _toml_with(text: str, **values: str) -> str:
+    """Config TOML with top-level `key = "..."` lines set to `values` (replaced or appended)."""
+    lines, seen = [], set()
+    for line in text.splitlines():
+        key = line.split("=", 1)[0].strip()
+        if "=" in line and key in values:
+            line = f'{key} = "{values[key]}"'
+            seen.add(key)
+        lines.append(line)
+    lines += [f'{k} = "{v}"' for k, v in values.items() if k not in seen]
+    return "\n".join(lines) + "\n"
+
+def _toml_value(text: str, key: str) -> str:
+    for line in text.splitlines():
+        k, _, v = line.partition("=")
+        if k.strip() == key:
+            return v.strip().strip('"')
+    return ""
+
+def _merge_shard_dbs(base_db: str, shard_dbs: List[str]) -> None:
+    """
+    Fold the shards' sqlite db_files into base_db (replaced atomically): every table is
+    created if missing and gets the shard rows it lacks, later shards winning on a
+    conflicting key. Shards were seeded from base_db, so their copies of its rows are
+    skipped rather than duplicated.
+    """
+    import shutil, sqlite3
+    tmp = base_db + ".tmp"
+    if os.path.exists(base_db):
+        shutil.copyfile(base_db, tmp)
+    elif os.path.exists(tmp):
+        os.remove(tmp)
+    cx = sqlite3.connect(tmp)
+    try:
+        for db in shard_dbs:
+            if not os.path.exists(db):
+                continue
+            cx.execute("ATTACH DATABASE ? AS shard", (db,))
+            tables = cx.execute("SELECT name, sql FROM shard.sqlite_master "
+                                "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall()
+            for name, sql in tables:
+                if not cx.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                                  (name,)).fetchone():
+                    cx.execute(sql)
+                cx.execute(f'INSERT OR REPLACE INTO main."{name}" '
+                           f'SELECT * FROM shard."{name}" EXCEPT SELECT * FROM main."{name}"')
+            cx.commit()
+            cx.execute("DETACH DATABASE shard")
+    finally:
+        cx.close()
+    os.replace(tmp, base_db)
+
+def split_manifest(entries: List[Dict[str, Any]], shards: int) -> List[List[Dict[str, Any]]]:
+    """Contiguous runs of manifest entries with about equal blob counts; no empty shards."""
+    shards = max(1, min(shards, len(entries)))
+    total = sum(max(1, len(e.get("blobs", []))) for e in entries)
+    out: List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+    acc = 0
+    for i, e in enumerate(entries):
+        k = min(shards - 1, acc * shards // total) if total else 0
+        k = max(k, shards - (len(entries) - i))     # leave one entry for each remaining shard
+        out[k].append(e)
+        acc += max(1, len(e.get("blobs", [])))
+    return [s for s in out if s]
+
+def run_external_decoder_sharded(decoder_path: str, config_path: str, manifest_path: str, cache_dir: str,
+                                 shards: int=1, debug: bool=False) -> Tuple[int, List[str]]:
+    """
+    run_external_decoder over `shards` concurrent slices of the manifest. Each shard
+    gets its own cache_dir and, with more than one shard, its own db_file, re-seeded on
+    every run with a copy of the configured one (when there is one) and merged back into
+    it once every shard succeeded; the JSON outputs are then moved into cache_dir and
+    recorded in its OutputLedger. A name written by more than one shard
+    keeps the first shard's file under its name and the others as <stem>-s<k>.json.
+    Returns (0, or the first failing shard's exit code; the merged outputs). Outputs of
+    the shards that succeeded are merged either way.
+    """
+    from harborx.output_ledger import OutputLedger
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        entries = json.load(f).get("entries", [])
+    with open(config_path, "r", encoding="utf-8") as f:
+        base_cfg = f.read()
+    base_db = _toml_value(base_cfg, "db_file")
+    parts = split_manifest(entries, shards)
+    jobs, shard_dbs = [], []
+    for k, part in enumerate(parts):
+        work = os.path.abspath(os.path.join(cache_dir, SHARD_DIR, f"shard-{k}"))
+        out = os.path.join(work, "cache")
+        ensure_dir(out)
+        for n in list_new_json(out):        # leftovers of an interrupted run
+            os.remove(n)
+        values = {"cache_dir": out.replace("\\", "/")}
+        if len(parts) > 1:
+            db = os.path.join(work, "decoder.sqlite")
+            for stale in (db, db + "-wal", db + "-shm", db + "-journal"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            if base_db and os.path.exists(base_db):
+                shutil.copyfile(base_db, db)
+            values["db_file"] = db.replace("\\", "/")
+            shard_dbs.append(db)
+        cfg = os.path.join(work, "decoder.toml")
+        with open(cfg, "w", encoding="utf-8") as f:
+            f.write(_toml_with(base_cfg, **values))
+        man = os.path.join(work, "decoder_manifest.json")
+        with open(man, "w", encoding="utf-8") as f:
+            json.dump({"entries": part}, f, indent=2)
+        jobs.append((out, cfg, man))
+    if len(jobs) > 1:
+        print(f"[sn] external decoder: {len(entries)} group(s) on {len(jobs)} shard(s)")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs) or 1) as ex:
+        rcs = list(ex.map(lambda j: run_external_decoder(decoder_path, j[1], j[2], debug=debug), jobs))
+    taken, merged = set(), []
+    for k, ((out, _, _), rc) in enumerate(zip(jobs, rcs)):
+        if rc != 0:
+            print(f"[sn] decoder shard {k} exit code = {rc}")
+            continue
+        for src in list_new_json(out):
+            name = os.path.basename(src)
+            if name in taken:
+                stem, ext = os.path.splitext(name)
+                name = f"{stem}-s{k}{ext}"
+            taken.add(name)
+            os.replace(src, os.path.join(cache_dir, name))
+            merged.append(os.path.join(cache_dir, name))
+    with OutputLedger(cache_dir) as ledger:
+        ledger.record(merged)
+    if base_db and shard_dbs and all(rc == 0 for rc in rcs):
+        _merge_shard_dbs(base_db, shard_dbs)
+    if len(jobs) > 1:
+        print(f"[sn] decoder shards done in {time.perf_counter() - t0:.2f}s")
+    return next((rc for rc in rcs if rc != 0), 0), merged
+
+def _hex(v: str) -> str:
+    return hex(int(v))
+
+def _rows_to_state_diff(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Flattened sn_pydecoder rows -> the external decoder's JSON shape (read by tools/ingest_decoded_json.py)."""
+    storage: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    classes: Dict[str, str] = {}
+    nonces: Dict[str, str] = {}
+    for r in rows:
+        addr = _hex(r["addr"])
+        storage[addr].append({"key": _hex(r["key"]), "value": _hex(r["value"])})
+        if "class_hash" in r:
+            classes[addr] = _hex(r["class_hash"])
+        if "nonce" in r:
+            nonces[addr] = _hex(r["nonce"])
+    return {
+        "storage_diffs": [{"address": a, "storage_entries": e} for a, e in storage.items()],
+        "declared_classes": [],
+        "deployed_or_replaced": [{"address": a, "class_hash": c} for a, c in classes.items()],
+        "nonces": [{"contract_address": a, "nonce": n} for a, n in nonces.items()],
+    }
+
+def run_python_decoder(entries: List[Tuple[int,str,int,str,int]], out_dir: str, stateful_db: str="",
+                       workers: int=0, debug: bool=False, out_format: str="json",
+                       cache_dir: str="", cache_mb: int=2048) -> List[str]:
+    """
+    Decode every complete blob group with sn_pydecoder on a process pool and write
+    <out_dir>/<eth_block>-<index>.json per group, in (eth_block, index) order.
+    out_format="parquet"|"arrow" instead streams every group's rows, columnar, into one
+    <out_dir>/sn-<first_block>-<last_block>.<ext> file.
+    With cache_dir, decoded groups are kept in a content-addressed DecodeCache
+    (cache_mb budget), so re-runs only decode groups not seen before.
+    """
+    from harborx.sn_pydecoder import decode_blob_groups, decode_bin_files_to_arrow
+    from harborx.sn_cache import DecodeCache
+    from harborx.output_ledger import OutputLedger
+    ensure_dir(out_dir)
+    cache = DecodeCache(cache_dir, max_bytes=cache_mb << 20) if cache_dir else None
+    if out_format in ("parquet", "arrow"):
+        groups = group_entries(entries)
+        if not groups:
+            return []
+        blocks = [g.eth_block for g in groups]
+        path = os.path.join(out_dir, f"sn-{min(blocks)}-{max(blocks)}.{out_format}")
+        decode_bin_files_to_arrow(groups, stateful_db, path, fmt=out_format, workers=workers or None, debug=debug,
+                                  cache=cache)
+        print(f"[sn] decoded {len(groups)} group(s) -> {path}")
+        with OutputLedger(out_dir) as ledger:
+            ledger.record([path])
+        return [path]
+    written = []
+    for res in decode_blob_groups(group_entries(entries), stateful_db, workers=workers or None, debug=debug,
+                                  cache=cache):
+        g = res.group
+        if res.error:
+            print(f"[sn] decode failed for eth_block={g.eth_block} index={g.index}:\n{res.error}")
+            continue
+        path = os.path.join(out_dir, f"{g.eth_block}-{g.index}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump(_rows_to_state_diff(res.rows), fp)
+        os.replace(tmp, path)
+        written.append(path)
+        how = "cached" if res.cached else "decoded"
+        print(f"[sn] {how} eth_block={g.eth_block} index={g.index}: {len(res.rows)} row(s) in {res.seconds:.2f}s")
+    if cache is not None:
+        print(f"[sn] decode cache {cache.stats()}")
+    with OutputLedger(out_dir) as ledger:
+        ledger.record(written)
+    return written
+
 def list_new_json(cache_dir: str) -> List[str]:
+    """Every JSON file in cache_dir (a full scan; the runs above report theirs, see output_ledger)."""
     outs = []
     if not os.path.isdir(cache_dir):
         return outs
@@ -171,63 +415,403 @@ def list_new_json(cache_dir: str) -> List[str]:
     return outs
 
 # ----------------------------- main pipeline -----------------------------
-def sn_pipeline(out_dir: str, chain_id: int=1, page: int=1, page_size: int=50,
-                max_items: int=20, start_block: int=0, end_block: int=0,
-                storage_only: bool=False, download_only: bool=False,
-                decoder_path: str="", decoder_config: str="", decoder_cache: str="",
-                flip_endian: bool=False, debug: bool=False) -> None:
+INGEST_TOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools", "ingest_decoded_json.py")
+
+def _api_entry(it: Dict[str, Any]) -> Tuple[int, str, int, int, Optional[str]]:
+    """(eth_block, tx_hash, index, ts, storage_url) of one Blobscan item."""
+    eth_block = int(it.get("eth_block_number") or it.get("blockNumber") or 0)
+    tx_hash   = it.get("tx_hash") or it.get("txHash") or ""
+    idx       = int(it.get("index", 0))
+    return eth_block, tx_hash, idx, _parse_ts(it), _pick_storage_url(it)
+
+def download_entries(api_entries: List[Tuple[int, str, int, int, Optional[str]]], out_dir: str, chain_id: int=1,
+                     fetch_workers: int=8, fetch_per_host: int=4, fetch_retries: int=4,
+                     debug: bool=False, blob_store: str="") -> List[Tuple[int,str,int,str,int]]:
     """
-    Download blobs -> write .bin -> grouped manifest (full sets only) ->
-    call tools/starknet-scrape --manifest -> list JSON outputs.
+    Download the blobs of _api_entry tuples concurrently; returns (eth_block, tx_hash, idx,
+    abs_path, ts) of those written. With blob_store, blobs already indexed there are not
+    fetched again, new ones are added to it, and the paths are its (compressed) objects.
     """
-    items_api = fetch_starknet_blobs(page, page_size, start_block=start_block, end_block=end_block, debug=debug)
-    if not items_api:
-        print("[sn] no blobs returned")
-        return
-
+    from harborx.fetch import BlobFetcher, FetchJob
+    from harborx.blob_store import BlobStore
     items: List[Tuple[int,str,int,str,int]] = []  # (eth_block, tx_hash, idx, abs_path, ts)
+    planned, jobs = [], []
+    store = BlobStore(blob_store) if blob_store else None
 
-    for it in items_api[:max_items]:
-        eth_block = int(it.get("eth_block_number") or it.get("blockNumber") or 0)
-        tx_hash   = it.get("tx_hash") or it.get("txHash") or ""
-        idx       = int(it.get("index", 0))
-        ts        = _parse_ts(it)
-        storage_url = _pick_storage_url(it)
+    for eth_block, tx_hash, idx, ts, storage_url in api_entries:
+        if store is not None:
+            digest = store.lookup(eth_block, tx_hash, idx)
+            if digest:
+                items.append((eth_block, tx_hash, idx, store.path(digest), ts))
+                continue
         if not storage_url:
             if debug: print(f"[sn] skip: no storage url for tx={tx_hash} idx={idx}")
             continue
+        if debug:
+            print(f"[sn] storage bytes from {storage_url} (expect 131072 bytes)")
+        p = "" if store is not None else _raw_txt_path(out_dir, chain_id, eth_block, idx, ts, tx_hash)
+        planned.append((eth_block, tx_hash, idx, p, ts))
+        jobs.append(FetchJob(storage_url, p))
+    if items:
+        print(f"[sn] {len(items)} blob(s) already in the blob store, not fetched")
 
-        raw = fetch_storage_bytes(storage_url, debug=debug)
-        p = _write_txt(out_dir, chain_id, eth_block, idx, raw, ts)
-        print(f"[sn] wrote bin: {p} (block={eth_block}, index={idx})")
-        items.append((eth_block, tx_hash, idx, p, ts))
+    t0 = time.perf_counter()
+    with BlobFetcher(workers=fetch_workers, per_host=fetch_per_host, retries=fetch_retries) as fetcher:
+        for entry, res in zip(planned, fetcher.fetch_iter(jobs)):
+            eth_block, txh, idx, p, ts = entry
+            if not res.ok:
+                print(f"[sn] fetch failed after {res.attempts} attempt(s) (block={eth_block}, index={idx}): {res.error}")
+                continue
+            if store is not None:
+                p = store.path(store.add(eth_block, txh, idx, res.data))
+                entry = (eth_block, txh, idx, p, ts)
+            print(f"[sn] wrote bin: {p} (block={eth_block}, index={idx})")
+            items.append(entry)
+        dt = time.perf_counter() - t0
+        if jobs:
+            print(f"[sn] fetched {fetcher.stats()} in {dt:.2f}s ({fetcher.ok / dt if dt else 0:.1f} blobs/s)")
+    if store is not None:
+        print(f"[sn] blob store {store.stats()}")
+        store.close()
+    return items
 
-    if not items:
-        print("[sn] nothing written")
-        return
+def _plain_blob_files(items: List[Tuple[int,str,int,str,int]], work_dir: str) -> Tuple[List[Tuple[int,str,int,str,int]], List[str]]:
+    """Items with blob store objects expanded to plain files under work_dir (for starknet-scrape); plus the files written."""
+    from harborx.blob_store import BLOB_SUFFIXES, read_blob
+    out, written = [], []
+    for eb, txh, idx, p, ts in items:
+        if p.endswith(BLOB_SUFFIXES):
+            plain = os.path.join(work_dir, os.path.splitext(os.path.basename(p))[0] + ".bin")
+            if not os.path.exists(plain):
+                ensure_dir(work_dir)
+                with open(plain, "wb") as fp:
+                    fp.write(read_blob(p))
+                written.append(plain)
+            p = plain
+        out.append((eb, txh, idx, p, ts))
+    return out, written
 
+def _decode_cache_dir(out_dir: str, decoder_cache: str, decode_cache: str) -> str:
+    """DecodeCache root: decode_cache, else <decoder_cache>/_decode_cache; "" when it is "off"."""
+    if decode_cache == "off":
+        return ""
+    decoder_cache = decoder_cache or os.path.join(os.path.dirname(out_dir.rstrip("\\/")), "decoder_cache")
+    return decode_cache or os.path.join(decoder_cache, "_decode_cache")
+
+def stream_items(api_entries: List[Tuple[int, str, int, int, Optional[str]]], out_dir: str, lake: str,
+                 chain_id: int=1, *, keep_raw: bool=False, blob_store: str="", decoder_cache: str="", stateful_db: str="",
+                 decode_workers: int=0, decode_cache: str="", decode_cache_mb: int=2048,
+                 fetch_workers: int=8, fetch_per_host: int=4, fetch_retries: int=4, queue_size: int=0,
+                 flush_rows: int=0, on_flush=None, debug: bool=False) -> List[Tuple[int, str, int, int, Optional[str]]]:
+    """
+    The in-memory path (sn_stream.stream_entries): fetched bytes go straight to
+    sn_pydecoder and the rows into the lake's Parquet tables, fetch, decode and write
+    overlapping with at most queue_size groups queued between them, and the write stage
+    holding at most about flush_rows rows (0: sn_stream.FLUSH_ROWS) before it writes them.
+    on_flush(entries) is called after each write with the groups it made durable.
+    Raw blobs are written under out_dir only with keep_raw, and kept in (and re-read
+    from) blob_store when set.
+    """
+    from harborx.sn_stream import FLUSH_ROWS, stream_entries
+    return stream_entries(api_entries, lake, chain_id=chain_id, raw_dir=out_dir if keep_raw else "",
+                          blob_store=blob_store,
+                          stateful_db=stateful_db, decode_workers=decode_workers,
+                          decode_cache=_decode_cache_dir(out_dir, decoder_cache, decode_cache),
+                          decode_cache_mb=decode_cache_mb, fetch_workers=fetch_workers,
+                          fetch_per_host=fetch_per_host, fetch_retries=fetch_retries, queue_size=queue_size,
+                          flush_rows=flush_rows or FLUSH_ROWS, on_flush=on_flush, debug=debug)
+
+def decode_items(items: List[Tuple[int,str,int,str,int]], out_dir: str, *,
+                 download_only: bool=False, decoder_path: str="", decoder_config: str="", decoder_cache: str="",
+                 debug: bool=False, py_decoder: bool=False, decode_workers: int=0, stateful_db: str="",
+                 py_format: str="json", decode_cache: str="", decode_cache_mb: int=2048,
+                 decoder_shards: int=1) -> Optional[List[str]]:
+    """
+    Grouped manifest of downloaded items, then decode them (sn_pydecoder or
+    tools/starknet-scrape, as decoder_shards concurrent processes when > 1). Returns the
+    decoder outputs, or None when decoding was skipped or failed.
+    """
     manifest_path = build_grouped_manifest(items, out_dir)
     print(f"[sn] manifest: {manifest_path}")
 
     if download_only:
         print("[sn] download only, skip decoding")
-        return
+        return None
 
     root_dir = os.path.dirname(out_dir.rstrip("\\/"))
     decoder_cache = decoder_cache or os.path.join(root_dir, "decoder_cache")
     ensure_dir(decoder_cache)
+    if py_decoder:
+        written = run_python_decoder(items, decoder_cache, stateful_db=stateful_db, workers=decode_workers,
+                                     debug=debug, out_format=py_format,
+                                     cache_dir=_decode_cache_dir(out_dir, decoder_cache, decode_cache),
+                                     cache_mb=decode_cache_mb)
+        if py_format == "json":
+            print(f"[sn] {len(written)} JSON output(s) under {decoder_cache}")
+        return written
     config_path = decoder_config or os.path.join(root_dir, "decoder.toml")
     config_path = ensure_decoder_config(config_path, decoder_cache)
+    items, plain = _plain_blob_files(items, os.path.join(decoder_cache, "_plain"))
+    if plain:
+        manifest_path = build_grouped_manifest(items, out_dir)
 
-    rc = run_external_decoder(decoder_path, config_path, manifest_path, debug=debug)
+    try:
+        rc, outs = run_external_decoder_sharded(decoder_path, config_path, manifest_path, decoder_cache,
+                                                max(1, decoder_shards), debug=debug)
+    finally:
+        for p in plain:                     # the store keeps the blobs; these were only for the tool
+            os.remove(p)
     if rc != 0:
         print(f"[sn] external decoder exit code = {rc}")
-        return
+        return None
 
-    outs = list_new_json(decoder_cache)
     if outs:
         print("[sn] JSON outputs:")
         for f in outs:
             print("   ", f)
     else:
         print("[sn] decoder finished but no JSON found under", decoder_cache)
+    return outs
+
+def sn_pipeline(out_dir: str, chain_id: int=1, page: int=1, page_size: int=50,
+                max_items: int=20, start_block: int=0, end_block: int=0,
+                storage_only: bool=False, download_only: bool=False,
+                decoder_path: str="", decoder_config: str="", decoder_cache: str="",
+                flip_endian: bool=False, debug: bool=False,
+                py_decoder: bool=False, decode_workers: int=0, stateful_db: str="",
+                py_format: str="json", decode_cache: str="", decode_cache_mb: int=2048,
+                fetch_workers: int=8, fetch_per_host: int=4, fetch_retries: int=4,
+                stream: str="", keep_raw: bool=False, decoder_shards: int=1, blob_store: str="",
+                queue_size: int=0, flush_rows: int=0) -> None:
+    """
+    Download blobs -> write .bin -> grouped manifest (full sets only) ->
+    call tools/starknet-scrape --manifest -> list JSON outputs.
+    py_decoder=True decodes the groups with sn_pydecoder on `decode_workers`
+    processes instead of the external tool; py_format picks json (per-group
+    state-diff files) or parquet/arrow (one columnar file). Decoded groups are cached
+    under decode_cache (default <decoder_cache>/_decode_cache; "off" disables it).
+    Blobs are downloaded by a BlobFetcher: fetch_workers threads over one connection
+    pool, at most fetch_per_host requests per host, fetch_retries retries each.
+    stream=<lake> skips all of the above after the listing: blobs are decoded in memory
+    by sn_pydecoder and the rows written to the lake's Parquet tables (stream_items), as
+    overlapping stages with queue_size groups at most between them, written every
+    flush_rows rows; keep_raw also saves the raw blobs under out_dir.
+    decoder_shards > 1 splits the manifest and runs that many starknet-scrape processes
+    (run_external_decoder_sharded). blob_store keeps raw blobs deduplicated and
+    compressed in a blob_store.BlobStore, and skips fetching the ones it already holds.
+    """
+    items_api = fetch_starknet_blobs(page, page_size, start_block=start_block, end_block=end_block, debug=debug)
+    if not items_api:
+        print("[sn] no blobs returned")
+        return
+
+    if stream:
+        stream_items([_api_entry(it) for it in items_api[:max_items]], out_dir, stream, chain_id,
+                     keep_raw=keep_raw, blob_store=blob_store, decoder_cache=decoder_cache, stateful_db=stateful_db,
+                     decode_workers=decode_workers, decode_cache=decode_cache, decode_cache_mb=decode_cache_mb,
+                     fetch_workers=fetch_workers, fetch_per_host=fetch_per_host, fetch_retries=fetch_retries,
+                     queue_size=queue_size, flush_rows=flush_rows, debug=debug)
+        return
+
+    items = download_entries([_api_entry(it) for it in items_api[:max_items]], out_dir, chain_id,
+                             fetch_workers=fetch_workers, fetch_per_host=fetch_per_host,
+                             fetch_retries=fetch_retries, debug=debug, blob_store=blob_store)
+    if not items:
+        print("[sn] nothing written")
+        return
+
+    decode_items(items, out_dir, download_only=download_only, decoder_path=decoder_path,
+                 decoder_config=decoder_config, decoder_cache=decoder_cache, debug=debug,
+                 py_decoder=py_decoder, decode_workers=decode_workers, stateful_db=stateful_db,
+                 py_format=py_format, decode_cache=decode_cache, decode_cache_mb=decode_cache_mb,
+                 decoder_shards=decoder_shards)
+
+# ----------------------------- follow mode -----------------------------
+CURSOR_NAME = "_sn_cursor.json"
+MAX_PAGES_PER_STEP = 64             # page budget doubles on a stalled step, up to this
+# sn_follow_once outcomes
+CAUGHT_UP, MORE, FAILED = "caught_up", "more", "failed"
+
+class FollowCursor:
+    """
+    Durable position of `harborx sn --follow`: the last fully processed eth_block and the
+    (tx_hash, index) blobs already processed within it. Saved atomically after every batch,
+    so a restarted follower resumes where the last one stopped.
+    """
+
+    def __init__(self, path: str, start_block: int=0):
+        self.path, self.floor = path, start_block     # blocks below floor are never new
+        self.eth_block, self.done = max(0, start_block - 1), set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                d = json.load(f)
+            self.eth_block = int(d.get("eth_block", 0))
+            self.done = {(t, int(i)) for t, i in d.get("done", [])}
+
+    def is_new(self, eth_block: int, tx_hash: str, idx: int) -> bool:
+        if eth_block < self.floor:
+            return False
+        return eth_block > self.eth_block or (eth_block == self.eth_block and (tx_hash, idx) not in self.done)
+
+    def advance(self, entries) -> None:
+        """Mark (eth_block, tx_hash, idx, ...) entries processed."""
+        top = max([e[0] for e in entries] + [self.eth_block])
+        if top > self.eth_block:
+            self.eth_block, self.done = top, set()
+        self.done |= {(e[1], e[2]) for e in entries if e[0] == top}
+
+    def save(self) -> None:
+        ensure_dir(os.path.dirname(os.path.abspath(self.path)))
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"eth_block": self.eth_block, "done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+def _complete_entries(entries):
+    """Entries of tx groups whose blob indices are exactly 0..k; plus the rest."""
+    by_tx: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+    for e in entries:
+        by_tx[(e[0], e[1])].append(e[2])
+    ok = {k for k, idxs in by_tx.items() if sorted(idxs) == list(range(len(idxs)))}
+    return [e for e in entries if (e[0], e[1]) in ok], [e for e in entries if (e[0], e[1]) not in ok]
+
+def poll_new_entries(cursor: FollowCursor, page_size: int=100, max_pages: int=0, end_block: int=0,
+                     debug: bool=False) -> Tuple[List[Tuple[int, str, int, int, Optional[str]]], bool]:
+    """
+    Page Blobscan forward (ascending) from the cursor block; returns the entries not yet
+    processed and whether the listing was exhausted (caught up). When paging stops on a
+    full page, the last block seen may continue on the next page, so it is held back.
+    """
+    new, last_block, caught_up, page = [], None, False, 1
+    while True:
+        items = fetch_starknet_blobs(page, page_size, start_block=cursor.eth_block, end_block=end_block,
+                                     debug=debug, sort="asc")
+        for it in items:
+            e = _api_entry(it)
+            last_block = e[0]
+            if cursor.is_new(e[0], e[1], e[2]):
+                new.append(e)
+        if len(items) < page_size:
+            caught_up = True
+            break
+        page += 1
+        if max_pages and page > max_pages:
+            break
+    if not caught_up and last_block is not None:
+        new = [e for e in new if e[0] < last_block]
+    return new, caught_up
+
+def sn_follow_once(cursor: FollowCursor, out_dir: str, chain_id: int=1, page_size: int=100, max_pages: int=0,
+                   end_block: int=0, fetch_workers: int=8, fetch_per_host: int=4, fetch_retries: int=4,
+                   ingest_out: str="", debug: bool=False, stream: str="", keep_raw: bool=False,
+                   blob_store: str="", queue_size: int=0, flush_rows: int=0, **decode_kw) -> Tuple[int, str]:
+    """
+    One catch-up step: list new blobs, download and decode the complete groups among them,
+    optionally ingest the decoder JSON, then advance and save the cursor.
+    stream=<lake> decodes in memory straight into the lake instead (stream_items), saving
+    the cursor after every flush of the lake writer.
+    Returns (blobs processed, outcome): CAUGHT_UP when the listing was exhausted, MORE when
+    pages remain, FAILED when a download or the decoder failed (the cursor stops before it).
+    """
+    new, caught_up = poll_new_entries(cursor, page_size, max_pages, end_block, debug=debug)
+    ready, partial = _complete_entries(new)
+    if partial:
+        print(f"[sn-follow] {len(partial)} blob(s) of incomplete groups skipped")
+    if not ready:
+        return 0, CAUGHT_UP if caught_up else MORE
+    if stream:
+        def checkpoint(done) -> None:
+            cursor.advance(done)
+            cursor.save()
+        kw = {k: decode_kw[k] for k in ("decoder_cache", "stateful_db", "decode_workers", "decode_cache",
+                                        "decode_cache_mb") if k in decode_kw}
+        items = stream_items(ready, out_dir, stream, chain_id, keep_raw=keep_raw, blob_store=blob_store,
+                             fetch_workers=fetch_workers, fetch_per_host=fetch_per_host,
+                             fetch_retries=fetch_retries, queue_size=queue_size, flush_rows=flush_rows,
+                             on_flush=checkpoint, debug=debug, **kw)
+        return _advance(cursor, ready, items, caught_up)
+    items = download_entries(ready, out_dir, chain_id, fetch_workers=fetch_workers, fetch_per_host=fetch_per_host,
+                             fetch_retries=fetch_retries, debug=debug, blob_store=blob_store)
+    items, _ = _complete_entries(items)
+    if items:
+        outs = decode_items(items, out_dir, debug=debug, **decode_kw)
+        if outs is None and not decode_kw.get("download_only"):
+            return 0, FAILED                    # decoder failed: keep the cursor, retry later
+        if ingest_out and outs:
+            run_ingest(decode_kw.get("decoder_cache") or os.path.join(os.path.dirname(out_dir.rstrip("\\/")), "decoder_cache"),
+                       ingest_out, debug=debug)
+    return _advance(cursor, ready, items, caught_up)
+
+def _advance(cursor: FollowCursor, ready, items, caught_up: bool) -> Tuple[int, str]:
+    """Move the cursor over the processed items, but never past a group that failed to download."""
+    outcome = CAUGHT_UP if caught_up else MORE
+    failed_tx = {(e[0], e[1]) for e in ready} - {(e[0], e[1]) for e in items}
+    if failed_tx:
+        first_failed = min(eb for eb, _ in failed_tx)
+        items = [e for e in items if e[0] < first_failed]
+        outcome = FAILED
+    if items:
+        cursor.advance(items)
+        cursor.save()
+    return len(items), outcome
+
+def run_ingest(src: str, out: str, debug: bool=False) -> int:
+    """
+    tools/ingest_decoded_json.py over the decoder output; its ledger skips JSON already ingested.
+    This package's root goes on the tool's PYTHONPATH, so it reads the decoder output ledger.
+    """
+    cmd = [sys.executable, INGEST_TOOL, "--src", src, "--out", out, "--ledger", os.path.join(out, "_processed.json")]
+    if debug:
+        print("[sn] exec:", " ".join(cmd))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get("PYTHONPATH")))))
+    rc = subprocess.run(cmd, env=env).returncode
+    if rc != 0:
+        print(f"[sn-follow] ingest exit code = {rc}")
+    return rc
+
+def sn_follow(out_dir: str, chain_id: int=1, page_size: int=100, max_pages: int=0, start_block: int=0,
+              end_block: int=0, poll_min: float=12.0, poll_max: float=300.0, max_polls: int=0,
+              cursor_path: str="", debug: bool=False, **kw) -> FollowCursor:
+    """
+    Follow Blobscan: catch up from the durable cursor (<out_dir>/_sn_cursor.json, or
+    start_block on the first run), then poll. The interval resets to poll_min whenever a
+    poll finds new groups and doubles up to poll_max while nothing arrives. A failed step
+    (listing, download or decoder) is retried after a backoff that starts at poll_min and
+    doubles up to poll_max. A step that lists max_pages without finishing a block doubles
+    its page budget, up to MAX_PAGES_PER_STEP. max_polls=0 runs until interrupted. Other
+    keywords are passed to sn_follow_once.
+    """
+    cursor = FollowCursor(cursor_path or os.path.join(out_dir, CURSOR_NAME), start_block)
+    print(f"[sn-follow] cursor: eth_block={cursor.eth_block} ({len(cursor.done)} blob(s) done in it)")
+    interval, backoff, polls, pages = poll_min, poll_min, 0, max_pages
+    while True:
+        try:
+            got, outcome = sn_follow_once(cursor, out_dir, chain_id, page_size, pages, end_block,
+                                          debug=debug, **kw)
+        except requests.RequestException as e:
+            print(f"[sn-follow] listing failed: {e}")
+            got, outcome = 0, FAILED
+        polls += 1
+        if max_polls and polls >= max_polls:
+            break
+        if outcome == MORE and not got:
+            if 0 < pages < max(max_pages, MAX_PAGES_PER_STEP):
+                pages = min(pages * 2, max(max_pages, MAX_PAGES_PER_STEP))
+                print(f"[sn-follow] eth_block={cursor.eth_block} fills the page budget; listing {pages} page(s)")
+                continue
+            outcome = FAILED
+        elif got:
+            pages = max_pages
+        if outcome == FAILED:
+            print(f"[sn-follow] step failed at eth_block={cursor.eth_block}; retry in {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(poll_max, backoff * 2)
+            continue
+        backoff = poll_min
+        if outcome == MORE:
+            continue                            # more pages waiting: no sleep
+        interval = poll_min if got else min(poll_max, interval * 2)
+        print(f"[sn-follow] caught up at eth_block={cursor.eth_block}; next poll in {interval:.0f}s")
+        time.sleep(interval)
+    return cursor
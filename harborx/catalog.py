@@ -0,0 +1,209 @@
+from __future__ import annotations
+import json, os, sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Per-file statistics sidecar for a lake directory (Parquet dataset or Arrow hot files).
+# One row per data file: row count, size, partition values and min/max of STAT_COLS,
+# so callers can decide which files a predicate can touch without opening them.
+# SQLite rather than Parquet so `**/*.parquet` globs over the dataset never pick it up.
+
+CATALOG_NAME = "_catalog.sqlite"
+STAT_COLS = ("key", "timestamp", "blob_index", "position")
+DATA_EXTS = (".parquet", ".arrow")
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS files(
+    path TEXT PRIMARY KEY,          -- relative to the catalog root, '/' separated
+    format TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    partition TEXT NOT NULL,        -- JSON object of hive key=value directory parts
+    key_min, key_max,
+    timestamp_min INTEGER, timestamp_max INTEGER,
+    blob_index_min INTEGER, blob_index_max INTEGER,
+    position_min INTEGER, position_max INTEGER
+)"""
+
+_FIELDS = ("path", "format", "rows", "bytes", "mtime", "partition") + tuple(
+    f"{c}_{m}" for c in STAT_COLS for m in ("min", "max"))
+
+# ----------------------------- stats -----------------------------
+
+def _partition_values(rel: str) -> Dict[str, str]:
+    parts = rel.split("/")[:-1]
+    return dict(p.split("=", 1) for p in parts if "=" in p)
+
+def _parquet_stats(path: str) -> Tuple[int, Dict[str, Any]]:
+    """min/max from the footer's row-group statistics; None when any row group lacks them."""
+    import pyarrow.parquet as pq
+    md = pq.ParquetFile(path).metadata
+    names = [md.schema.column(i).name for i in range(md.num_columns)]
+    out: Dict[str, Any] = {}
+    for c in STAT_COLS:
+        if c not in names:
+            continue
+        i = names.index(c)
+        lo = hi = None
+        for g in range(md.num_row_groups):
+            st = md.row_group(g).column(i).statistics
+            if st is None or not st.has_min_max:
+                lo = hi = None
+                break
+            lo = st.min if lo is None else min(lo, st.min)
+            hi = st.max if hi is None else max(hi, st.max)
+        out[c] = (lo, hi)
+    return md.num_rows, out
+
+def _arrow_stats(path: str) -> Tuple[int, Dict[str, Any]]:
+    import pyarrow as pa, pyarrow.compute as pc, pyarrow.ipc as ipc
+    with pa.memory_map(path, "r") as src:
+        tbl = ipc.open_file(src).read_all()
+        out = {}
+        for c in STAT_COLS:
+            if c in tbl.column_names and tbl.num_rows:
+                mm = pc.min_max(tbl.column(c))
+                out[c] = (mm["min"].as_py(), mm["max"].as_py())
+        return tbl.num_rows, out
+
+def file_stats(path: str, root: str) -> Dict[str, Any]:
+    """Catalog row for one data file (Parquet: footer only; Arrow IPC: memory-mapped scan)."""
+    rel = os.path.relpath(path, root).replace("\\", "/")
+    st = os.stat(path)
+    fmt = "parquet" if path.endswith(".parquet") else "arrow"
+    rows, stats = (_parquet_stats if fmt == "parquet" else _arrow_stats)(path)
+    row = {"path": rel, "format": fmt, "rows": int(rows), "bytes": st.st_size, "mtime": st.st_mtime,
+           "partition": json.dumps(_partition_values(rel), sort_keys=True)}
+    for c in STAT_COLS:
+        lo, hi = stats.get(c, (None, None))
+        row[f"{c}_min"], row[f"{c}_max"] = lo, hi
+    return row
+
+# ----------------------------- catalog -----------------------------
+
+def _bounds(v) -> Tuple[Any, Any]:
+    """scalar -> (v, v); (lo, hi) with None for an open end."""
+    if isinstance(v, (tuple, list)):
+        lo, hi = v
+        return lo, hi
+    return v, v
+
+def _norm_key(v):
+    """Hex strings ('0x..') address binary key columns: 32 bytes, left-padded."""
+    if isinstance(v, str) and v.startswith("0x"):
+        return bytes.fromhex(v[2:].rjust(64, "0"))
+    return v
+
+class Catalog:
+    """
+    Statistics sidecar at <root>/_catalog.sqlite.
+
+    update(paths) records the given files (the ingestor calls this for what it just wrote);
+    refresh() rescans the tree and re-reads only files whose size or mtime changed;
+    files(**predicate) returns the files whose stats can satisfy the predicate.
+    """
+
+    def __init__(self, root: str, path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.path = path or os.path.join(self.root, CATALOG_NAME)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.con = sqlite3.connect(self.path)
+        self.con.execute(_SCHEMA)
+
+    def _put(self, rows: Iterable[Dict[str, Any]]):
+        sql = f"INSERT OR REPLACE INTO files({','.join(_FIELDS)}) VALUES ({','.join('?' * len(_FIELDS))})"
+        with self.con:
+            self.con.executemany(sql, ([r[f] for f in _FIELDS] for r in rows))
+
+    def _drop_missing(self) -> int:
+        gone = [p for (p,) in self.con.execute("SELECT path FROM files")
+                if not os.path.exists(os.path.join(self.root, p))]
+        with self.con:
+            self.con.executemany("DELETE FROM files WHERE path=?", ((p,) for p in gone))
+        return len(gone)
+
+    def update(self, paths: Iterable[str]) -> int:
+        """Add or replace the stats of `paths` and forget files that no longer exist."""
+        rows = [file_stats(p, self.root) for p in paths if p.endswith(DATA_EXTS) and os.path.exists(p)]
+        self._put(rows)
+        self._drop_missing()
+        return len(rows)
+
+    def refresh(self, recursive: bool = True) -> Tuple[int, int]:
+        """Rescan root (only its top level unless recursive); returns (files re-read, files dropped)."""
+        known = {p: (b, m) for p, b, m in self.con.execute("SELECT path, bytes, mtime FROM files")}
+        changed = []
+        for base, dirs, names in os.walk(self.root):
+            dirs[:] = [d for d in dirs if recursive and not d.startswith(("_", "."))]
+            for n in names:
+                if not n.endswith(DATA_EXTS) or n.startswith(("_", ".")):
+                    continue
+                p = os.path.join(base, n)
+                st = os.stat(p)
+                rel = os.path.relpath(p, self.root).replace("\\", "/")
+                if known.get(rel) != (st.st_size, st.st_mtime):
+                    changed.append(p)
+        self._put(file_stats(p, self.root) for p in changed)
+        return len(changed), self._drop_missing()
+
+    def entries(self) -> List[Dict[str, Any]]:
+        cur = self.con.execute(f"SELECT {','.join(_FIELDS)} FROM files ORDER BY path")
+        out = []
+        for r in cur:
+            e = dict(zip(_FIELDS, r))
+            e["partition"] = json.loads(e["partition"])
+            out.append(e)
+        return out
+
+    def files(self, *, key=None, timestamp=None, blob_index=None, position=None,
+              **partition) -> List[str]:
+        """
+        Absolute paths of files that may hold rows matching every given condition.
+        Stat conditions are a value (equality) or an inclusive (lo, hi) range with None
+        for an open end; extra keywords match hive partition values (compared as strings).
+        Files without statistics for a column are always kept.
+        """
+        where, params = [], []
+        for col, cond in (("key", key), ("timestamp", timestamp), ("blob_index", blob_index),
+                          ("position", position)):
+            if cond is None:
+                continue
+            lo, hi = _bounds(cond)
+            if col == "key":
+                lo, hi = _norm_key(lo), _norm_key(hi)
+            for v, test in ((lo, f"{col}_max >= ?"), (hi, f"{col}_min <= ?")):
+                if v is None:
+                    continue
+                # a file whose stats have another type than the probe (e.g. hex TEXT keys) cannot be pruned
+                stat = test.split()[0]
+                where.append(f"({stat} IS NULL OR typeof({stat}) != typeof(?) OR {test})")
+                params += [v, v]
+        sql = "SELECT path, partition FROM files"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        want = {k: str(v) for k, v in partition.items()}
+        out = []
+        for rel, part in self.con.execute(sql + " ORDER BY path", params):
+            pv = json.loads(part)
+            if all(pv.get(k) == v for k, v in want.items()):
+                out.append(os.path.join(self.root, rel))
+        return out
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def files_matching(root: str, refresh: bool = True, recursive: bool = True, **predicate) -> List[str]:
+    """
+    Which files under `root` can match `predicate` (see Catalog.files); builds/refreshes the
+    catalog first. recursive=False considers only files directly in `root`.
+    """
+    with Catalog(root) as cat:
+        if refresh:
+            cat.refresh(recursive)
+        files = cat.files(**predicate)
+    return files if recursive else [p for p in files if os.path.dirname(p) == os.path.abspath(root)]
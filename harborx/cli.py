@@ -7,9 +7,78 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
 
-from blobscan import sn_pipeline
+from blobscan import sn_follow, sn_pipeline
+
+def _add_decode_args(sp: argparse.ArgumentParser, decode_workers_flag: str) -> None:
+    """Fetch and decode options of sn / sn-backfill; read back with _decode_opts."""
+    sp.add_argument("--download-only", action="store_true", help="Skip decoding (download .bin only).")
+    sp.add_argument("--decoder", default="", help="Path to tools/starknet-scrape(.exe). Default: auto under ./tools/")
+    sp.add_argument("--decoder-config", default="", help="Path to decoder config TOML. Default: ./decoder.toml")
+    sp.add_argument("--decoder-shards", type=int, default=1,
+                    help="Split the manifest and run this many starknet-scrape processes, each with its own cache_dir/db_file")
+    sp.add_argument("--py-decoder", action="store_true", help="Decode with the built-in Python decoder instead of starknet-scrape.")
+    sp.add_argument(decode_workers_flag, dest="decode_workers", type=int, default=0, help="Decoder processes for --py-decoder. Default: one per CPU")
+    sp.add_argument("--stateful-db", default="", help="idxmap sqlite for v0.13.x stateful index resolution (--py-decoder)")
+    sp.add_argument("--py-format", choices=["json", "parquet", "arrow"], default="json",
+                    help="--py-decoder output: per-group JSON, or one Parquet / Arrow IPC file with binary(32) felts")
+    sp.add_argument("--decode-cache", default="", help="Content-addressed cache of decoded groups (--py-decoder). Default: <decoder-cache>/_decode_cache; 'off' disables")
+    sp.add_argument("--decode-cache-mb", type=int, default=2048, help="Size budget of --decode-cache; least recently used entries are evicted")
+    sp.add_argument("--fetch-workers", type=int, default=8, help="Concurrent blob downloads (one shared connection pool)")
+    sp.add_argument("--fetch-per-host", type=int, default=4, help="Max in-flight downloads per storage host")
+    sp.add_argument("--fetch-retries", type=int, default=4, help="Retries per blob on connection errors, 429 and 5xx (exponential backoff)")
+    sp.add_argument("--stream", action="store_true",
+                    help="Decode fetched blobs in memory with the Python decoder and write rows straight into the lake's Parquet tables (no raw files, manifest, starknet-scrape or JSON)")
+    sp.add_argument("--keep-raw", action="store_true", help="--stream: also save the raw blobs under --out")
+    sp.add_argument("--queue-size", type=int, default=0,
+                    help="--stream: max groups queued between the fetch, decode and write stages. Default: twice the next stage's workers")
+    sp.add_argument("--flush-rows", type=int, default=0,
+                    help="--stream: rows the write stage buffers before writing them to the lake. Default: 250000")
+    sp.add_argument("--blob-store", default="",
+                    help="Keep raw blobs in this content-addressed store (deduplicated, compressed, indexed by block/tx/index) instead of per-fetch files under --out; indexed blobs are not fetched again")
+
+def _decode_opts(args: argparse.Namespace) -> dict:
+    return dict(
+        fetch_workers=args.fetch_workers,
+        fetch_per_host=args.fetch_per_host,
+        fetch_retries=args.fetch_retries,
+        download_only=args.download_only,
+        decoder_path=args.decoder,
+        decoder_config=args.decoder_config,
+        decoder_shards=args.decoder_shards,
+        py_decoder=args.py_decoder,
+        decode_workers=args.decode_workers,
+        stateful_db=args.stateful_db,
+        py_format=args.py_format,
+        decode_cache=args.decode_cache,
+        decode_cache_mb=args.decode_cache_mb,
+        keep_raw=args.keep_raw,
+        blob_store=args.blob_store,
+        queue_size=args.queue_size,
+        flush_rows=args.flush_rows,
+    )
 
 def cmd_sn(args: argparse.Namespace) -> None:
+    if args.stream and not args.ingest_out:
+        raise SystemExit("[sn] --stream writes into the lake: pass --ingest-out")
+    stream = args.ingest_out if args.stream else ""
+    if args.follow:
+        sn_follow(
+            out_dir=args.out,
+            chain_id=args.chain_id,
+            page_size=args.page_size,
+            max_pages=args.max_pages,
+            start_block=args.start_block,
+            end_block=args.end_block,
+            poll_min=args.poll_min,
+            poll_max=args.poll_max,
+            max_polls=args.max_polls,
+            ingest_out=args.ingest_out,
+            debug=args.debug,
+            decoder_cache=args.decoder_cache,
+            stream=stream,
+            **_decode_opts(args),
+        )
+        return
     sn_pipeline(
         out_dir=args.out,
         chain_id=args.chain_id,
@@ -25,8 +94,48 @@ def cmd_sn(args: argparse.Namespace) -> None:
         decoder_cache=args.decoder_cache,
         flip_endian=args.flip_endian,
         debug=args.debug,
+        py_decoder=args.py_decoder,
+        decode_workers=args.decode_workers,
+        stateful_db=args.stateful_db,
+        py_format=args.py_format,
+        decode_cache=args.decode_cache,
+        decode_cache_mb=args.decode_cache_mb,
+        fetch_workers=args.fetch_workers,
+        fetch_per_host=args.fetch_per_host,
+        fetch_retries=args.fetch_retries,
+        stream=stream,
+        keep_raw=args.keep_raw,
+        decoder_shards=args.decoder_shards,
+        blob_store=args.blob_store,
+        queue_size=args.queue_size,
+        flush_rows=args.flush_rows,
     )
 
+def cmd_sn_backfill(args: argparse.Namespace) -> None:
+    from harborx.backfill import Backfill
+    Backfill(args.out, args.start_block, args.end_block, shard_blocks=args.shard_blocks,
+             workers=args.workers, lake=args.lake, chain_id=args.chain_id, page_size=args.page_size,
+             pages_per_step=args.pages_per_step, stream=args.stream, debug=args.debug, **_decode_opts(args)).run()
+
+def _range(lo, hi):
+    return None if lo is None and hi is None else (lo, hi)
+
+def cmd_catalog(args: argparse.Namespace) -> None:
+    from harborx.catalog import Catalog
+    with Catalog(args.root) as cat:
+        if not args.no_refresh:
+            read, dropped = cat.refresh()
+            print(f"[catalog] {cat.path}: re-read {read} file(s), dropped {dropped}", file=sys.stderr)
+        partition = dict(kv.split("=", 1) for kv in args.where)
+        files = cat.files(key=args.key, timestamp=_range(args.ts_from, args.ts_to),
+                          blob_index=_range(args.blob_index_from, args.blob_index_to), **partition)
+    for f in files:
+        print(f)
+
+def cmd_sn_bench(args: argparse.Namespace) -> None:
+    from harborx import sn_bench
+    sn_bench.run(args)
+
 def main() -> None:
     ap = argparse.ArgumentParser(prog="harborx-cli")
     sub = ap.add_subparsers(dest="cmd", required=True)
@@ -40,11 +149,15 @@ def main() -> None:
     sp.add_argument("--start-block", type=int, default=0, help="Filter by L1 start block (inclusive).")
     sp.add_argument("--end-block", type=int, default=0, help="Filter by L1 end block (inclusive).")
     sp.add_argument("--storage-only", action="store_true", help="Prefer storage url fields only.")
-    sp.add_argument("--download-only", action="store_true", help="Skip decoding (download .bin only).")
     sp.add_argument("--flip-endian", action="store_true", help="(reserved) flip byte order in 32B words.")
-    sp.add_argument("--decoder", default="", help="Path to tools/starknet-scrape(.exe). Default: auto under ./tools/")
-    sp.add_argument("--decoder-config", default="", help="Path to decoder config TOML. Default: ./decoder.toml")
     sp.add_argument("--decoder-cache", default="", help="Decoder work/output dir. Default: ./decoder_cache")
+    _add_decode_args(sp, "--workers")
+    sp.add_argument("--follow", action="store_true", help="Catch up from a durable cursor (<out>/_sn_cursor.json), then keep polling for new blob groups")
+    sp.add_argument("--poll-min", type=float, default=12.0, help="--follow: seconds between polls while new groups keep arriving")
+    sp.add_argument("--poll-max", type=float, default=300.0, help="--follow: the interval doubles up to this while idle")
+    sp.add_argument("--max-polls", type=int, default=0, help="--follow: stop after N polls (0 = run until interrupted)")
+    sp.add_argument("--max-pages", type=int, default=0, help="--follow: pages listed per poll (0 = until caught up)")
+    sp.add_argument("--ingest-out", default="", help="Lake dir: --follow runs tools/ingest_decoded_json.py into it after each batch; --stream writes rows into it directly")
     sp.add_argument("--debug", action="store_true")
     sp.set_defaults(func=cmd_sn)
 
@@ -59,6 +172,36 @@ def main() -> None:
     sp_add.add_argument("--overwrite", action="store_true", help="Re-download even if file size matches")
     sp_add.set_defaults(func=cmd_add)
 
+    sp_cat = sub.add_parser("catalog", help="Refresh a lake's statistics catalog and list the files that can match a predicate")
+    sp_cat.add_argument("--root", required=True, help="Dataset or Arrow directory (catalog: <root>/_catalog.sqlite)")
+    sp_cat.add_argument("--key", help="Point lookup: 0x-prefixed hex key")
+    sp_cat.add_argument("--ts-from", type=int)
+    sp_cat.add_argument("--ts-to", type=int)
+    sp_cat.add_argument("--blob-index-from", type=int)
+    sp_cat.add_argument("--blob-index-to", type=int)
+    sp_cat.add_argument("--where", action="append", default=[], metavar="COL=VALUE", help="Partition filter, e.g. topic=state_diff")
+    sp_cat.add_argument("--no-refresh", action="store_true", help="Use the catalog as is, without rescanning")
+    sp_cat.set_defaults(func=cmd_catalog)
+
+    sp_bf = sub.add_parser("sn-backfill", help="Backfill an L1 block range: shards on a worker pool, per-shard checkpoints, merged into the lake in block order")
+    sp_bf.add_argument("--out", required=True, help="Work dir (plan, shard checkpoints, raw blobs, decoder output); re-run to resume")
+    sp_bf.add_argument("--start-block", type=int, required=True, help="First L1 block (inclusive)")
+    sp_bf.add_argument("--end-block", type=int, required=True, help="Last L1 block (inclusive)")
+    sp_bf.add_argument("--shard-blocks", type=int, default=7200, help="L1 blocks per shard (7200 ~ one day)")
+    sp_bf.add_argument("--workers", type=int, default=4, help="Shards processed concurrently")
+    sp_bf.add_argument("--lake", default="", help="Merge finished shards here in block order (JSON via tools/ingest_decoded_json.py; Parquet/Arrow copied)")
+    sp_bf.add_argument("--chain-id", type=int, default=1)
+    sp_bf.add_argument("--page-size", type=int, default=100)
+    sp_bf.add_argument("--pages-per-step", type=int, default=4, help="Blobscan pages listed between checkpoints")
+    _add_decode_args(sp_bf, "--decode-workers")
+    sp_bf.add_argument("--debug", action="store_true")
+    sp_bf.set_defaults(func=cmd_sn_backfill)
+
+    from harborx.sn_bench import add_arguments as sn_bench_arguments
+    sp_bench = sub.add_parser("sn-bench", help="Profile the Python Starknet decoder over saved blob groups; per-stage p50/p95 and blobs/s as JSON")
+    sn_bench_arguments(sp_bench)
+    sp_bench.set_defaults(func=cmd_sn_bench)
+
     args = ap.parse_args()
     args.func(args)
 
@@ -0,0 +1,146 @@
+from __future__ import annotations
+import os, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Concurrent blob downloads: one requests.Session (one urllib3 pool per host, sized to the
+# worker count) shared by a thread pool, a cap on in-flight requests per host, retries
+# with jittered exponential backoff on connection errors / 429 / 5xx, and bodies streamed
+# to <dest>.part and renamed into place, so a file at `dest` is always complete. A job
+# without a dest keeps the body in memory instead (FetchResult.data).
+
+RETRY_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+class FetchJob(NamedTuple):
+    url: str
+    dest: str = ""                          # "" -> body returned in FetchResult.data
+
+class FetchResult(NamedTuple):
+    job: FetchJob
+    ok: bool
+    nbytes: int
+    attempts: int
+    seconds: float
+    error: Optional[str]
+    data: Optional[bytes] = None
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int, retry_after: Optional[float]):
+        super().__init__(f"HTTP {status}")
+        self.retry_after = retry_after
+
+def _retry_after(resp) -> Optional[float]:
+    v = resp.headers.get("Retry-After")
+    try:
+        return max(0.0, float(v)) if v is not None else None
+    except ValueError:
+        return None
+
+class BlobFetcher:
+    """
+    fetch_all(jobs) downloads every job on `workers` threads and returns FetchResults in
+    job order; fetch_iter yields them in that order as they complete. A job that still
+    fails after `retries` retries (or gets a non-retryable status) is reported, not raised.
+    """
+
+    def __init__(self, workers: int = 8, per_host: int = 4, retries: int = 4, backoff: float = 0.5,
+                 max_backoff: float = 8.0, timeout: float = 60.0, chunk_size: int = 1 << 16,
+                 session: Optional[requests.Session] = None):
+        self.workers, self.per_host = max(1, workers), max(1, per_host)
+        self.retries, self.backoff, self.max_backoff = max(0, retries), backoff, max_backoff
+        self.timeout, self.chunk_size = timeout, chunk_size
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.workers, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.nbytes = self.ok = self.failed = self.retried = 0
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            sem = self._hosts.get(host)
+            if sem is None:
+                sem = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def _download(self, job: FetchJob) -> Tuple[int, Optional[bytes]]:
+        part = f"{job.dest}.part"
+        with self._host_slot(job.url):
+            with self.session.get(job.url, stream=True, timeout=self.timeout) as r:
+                if r.status_code in RETRY_STATUS:
+                    raise _RetryableStatus(r.status_code, _retry_after(r))
+                r.raise_for_status()
+                if not job.dest:
+                    buf = bytearray()
+                    for chunk in r.iter_content(self.chunk_size):
+                        buf += chunk
+                    return len(buf), bytes(buf)
+                n = 0
+                with open(part, "wb") as fp:
+                    for chunk in r.iter_content(self.chunk_size):
+                        fp.write(chunk)
+                        n += len(chunk)
+        os.replace(part, job.dest)
+        return n, None
+
+    def fetch_one(self, job: FetchJob) -> FetchResult:
+        if job.dest:
+            os.makedirs(os.path.dirname(os.path.abspath(job.dest)), exist_ok=True)
+        t0 = time.perf_counter()
+        attempt, err = 0, None
+        while True:
+            attempt += 1
+            try:
+                n, data = self._download(job)
+                with self._lock:
+                    self.nbytes += n
+                    self.ok += 1
+                return FetchResult(job, True, n, attempt, time.perf_counter() - t0, None, data)
+            except (_RetryableStatus, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                err, wait, retryable = f"{type(e).__name__}: {e}", getattr(e, "retry_after", None), True
+            except Exception as e:
+                err, wait, retryable = f"{type(e).__name__}: {e}", None, False
+            if not retryable or attempt > self.retries:
+                break
+            with self._lock:
+                self.retried += 1
+            if wait is None:
+                wait = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+            time.sleep(min(wait, self.max_backoff))
+        if job.dest:
+            try:
+                os.remove(f"{job.dest}.part")
+            except OSError:
+                pass
+        with self._lock:
+            self.failed += 1
+        return FetchResult(job, False, 0, attempt, time.perf_counter() - t0, err)
+
+    def fetch_iter(self, jobs: Iterable[FetchJob]) -> Iterator[FetchResult]:
+        jobs = list(jobs)
+        if not jobs:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as ex:
+            yield from ex.map(self.fetch_one, jobs)
+
+    def fetch_all(self, jobs: Iterable[FetchJob]) -> List[FetchResult]:
+        return list(self.fetch_iter(jobs))
+
+    def stats(self) -> str:
+        return f"ok={self.ok} failed={self.failed} retried={self.retried} bytes={self.nbytes}"
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# ntt.py — number-theoretic transform over the Cairo field with cached tables
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+# gmpy2 is optional (the `ntt` extra) and opt-in (use_gmpy2=True or HARBORX_NTT_GMPY2=1):
+# whether mpz beats Python ints at 251 bits depends on the interpreter and GMP build, so
+# bench/bench_ntt.py measures both. Results are handed back as plain ints either way.
+try:
+    import gmpy2  # type: ignore
+    _mpz = gmpy2.mpz
+except Exception:
+    gmpy2 = None  # type: ignore
+    _mpz = None
+
+# Cairo felt field modulus: 2^251 + 17*2^192 + 1
+FR_MOD = (1 << 251) + 17 * (1 << 192) + 1
+GENERATOR = 5  # primitive root used by Starknet DA for length-4096 NTT
+BLOB_N = 4096
+
+def bit_reverse_permutation(n: int) -> List[int]:
+    """rev[i] = i with its log2(n) low bits reversed."""
+    bits = (n - 1).bit_length()
+    rev = [0] * n
+    for i in range(1, n):
+        rev[i] = (rev[i >> 1] >> 1) | ((i & 1) << (bits - 1))
+    return rev
+
+class NTTEngine:
+    """
+    Iterative radix-2 NTT of a fixed length with everything except the butterflies
+    precomputed: the bit-reversal permutation, one table of n/2 twiddles per
+    direction (stage m uses every (n/m)-th entry) and n^-1.
+
+    Results are identical to the textbook loop (`bit-reverse; for m = 2..n: butterflies
+    with w = root^(n/m)`). Sums and differences are left unreduced (at most log2(n)+1
+    multiples of mod away from the true value; every product is reduced) and brought
+    into [0, mod) once at the end. Butterflies run as list comprehensions over
+    slices: strided slices for the early stages (many small blocks), contiguous
+    slices for the late ones. Several length-n inputs can be transformed as one
+    batch, since every stage stays inside aligned blocks of length <= n.
+    """
+
+    def __init__(self, n: int = BLOB_N, mod: int = FR_MOD, generator: int = GENERATOR,
+                 use_gmpy2: Optional[bool] = None):
+        if n < 2 or n & (n - 1):
+            raise ValueError(f"NTT length must be a power of two >= 2, got {n}")
+        if (mod - 1) % n:
+            raise ValueError(f"{n} does not divide mod-1")
+        self.n, self.mod = n, mod
+        self.root = pow(generator, (mod - 1) // n, mod)
+        self.root_inv = pow(self.root, -1, mod)
+        self.n_inv = pow(n, -1, mod)
+        self.rev = bit_reverse_permutation(n)
+        if use_gmpy2 is None:
+            use_gmpy2 = os.environ.get("HARBORX_NTT_GMPY2", "") == "1"
+        if use_gmpy2 and _mpz is None:
+            raise ImportError("use_gmpy2=True but gmpy2 is not installed")
+        self.mpz = _mpz if use_gmpy2 else None
+        self._twiddles = {False: self._powers(self.root), True: self._powers(self.root_inv)}
+
+    def _num(self, x: int):
+        return self.mpz(x) if self.mpz is not None else x
+
+    def _powers(self, w: int) -> list:
+        out, x = [], 1
+        for _ in range(self.n // 2):
+            out.append(self._num(x))
+            x = x * w % self.mod
+        return out
+
+    def _permute(self, a: list, count: int) -> list:
+        n, rev = self.n, self.rev
+        out = []
+        for b in range(count):
+            base = b * n
+            out.extend(a[base + r] for r in rev)
+        return out
+
+    def _butterflies(self, a: list, inverse: bool) -> None:
+        p, n, total = self.mod, self.n, len(a)
+        tw = self._twiddles[inverse]
+        m = 2
+        while m <= n:
+            half, stride = m // 2, n // m
+            if half < total // m:
+                # many blocks: one pass per twiddle, across every block at once
+                for j in range(half):
+                    w = tw[j * stride]
+                    lo, hi = a[j::m], a[j + half::m]
+                    t = [v * w % p for v in hi] if j else hi
+                    a[j::m] = [u + v for u, v in zip(lo, t)]
+                    a[j + half::m] = [u - v for u, v in zip(lo, t)]
+            else:
+                ws = tw[::stride][:half]
+                for k in range(0, total, m):
+                    lo, hi = a[k:k + half], a[k + half:k + m]
+                    t = [v * w % p for v, w in zip(hi, ws)]
+                    a[k:k + half] = [u + v for u, v in zip(lo, t)]
+                    a[k + half:k + m] = [u - v for u, v in zip(lo, t)]
+            m <<= 1
+
+    def transform_many(self, blocks: Sequence[Sequence[int]], *, inverse: bool = False,
+                       permute: bool = True) -> List[List[int]]:
+        """
+        Transform several length-n inputs in one pass. `permute` applies the
+        bit-reversal permutation first (the standard decimation-in-time input order).
+        """
+        if not blocks:
+            return []
+        n, p = self.n, self.mod
+        for b in blocks:
+            if len(b) != n:
+                raise ValueError(f"expected {n} elements per input, got {len(b)}")
+        a = [self._num(x % p) for b in blocks for x in b]
+        if permute:
+            a = self._permute(a, len(blocks))
+        self._butterflies(a, inverse)
+        if inverse:
+            inv_n = self._num(self.n_inv)
+            a = [x * inv_n % p for x in a]
+        else:
+            a = [x % p for x in a]
+        if self.mpz is not None:
+            a = [int(x) for x in a]
+        return [a[i:i + n] for i in range(0, len(a), n)]
+
+    def forward(self, a: Sequence[int], *, permute: bool = True) -> List[int]:
+        return self.transform_many([a], inverse=False, permute=permute)[0]
+
+    def inverse(self, a: Sequence[int], *, permute: bool = True) -> List[int]:
+        return self.transform_many([a], inverse=True, permute=permute)[0]
+
+@lru_cache(maxsize=None)
+def get_engine(n: int = BLOB_N, mod: int = FR_MOD) -> NTTEngine:
+    """Shared engine per (n, mod); tables are built once per process."""
+    return NTTEngine(n, mod)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import hashlib, os, sqlite3, threading
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# Ledger of decoder outputs, shared by the producers (sn_pydecoder runs, starknet-scrape
+# runs) and the consumers (tools/ingest_decoded_json.py, backfill merges). Producers
+# record() each file once as they write it: size, mtime and sha1 are taken then, and the
+# file gets the next sequence number (a rewritten file with new content gets a new one).
+# A consumer's ingested state is a single high-water mark, so pending() and mark() cost
+# the same however many outputs came before. Lives in <output dir>/_outputs.sqlite.
+
+LEDGER_NAME = "_outputs.sqlite"
+
+class Output(NamedTuple):
+    seq: int
+    name: str                               # relative to the ledger's directory
+    size: int
+    mtime_ns: int
+    sha1: str
+
+def sha1_file(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def consumer_key(out: str) -> str:
+    """Consumers are identified by their (absolute) output location."""
+    return os.path.abspath(out)
+
+class OutputLedger:
+    """
+    record(paths) -> Outputs after writing files under `root`; pending(consumer) ->
+    Outputs recorded since that consumer's mark, in production order; mark(consumer, seq)
+    once they are ingested.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, LEDGER_NAME), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outputs (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "name TEXT NOT NULL UNIQUE, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha1 TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS consumers (consumer TEXT PRIMARY KEY, seq INTEGER NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def exists(root: str) -> bool:
+        return os.path.exists(os.path.join(root, LEDGER_NAME))
+
+    def _name(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root).replace("\\", "/")
+
+    def path(self, out: Output) -> str:
+        return os.path.join(self.root, out.name)
+
+    def record(self, paths: Iterable[str]) -> List[Output]:
+        """Register freshly written files; unchanged files (same size and sha1) keep their entry."""
+        got = []
+        for p in paths:
+            st = os.stat(p)
+            name, digest = self._name(p), sha1_file(p)
+            with self._lock:
+                row = self._db.execute("SELECT seq, size, sha1 FROM outputs WHERE name=?", (name,)).fetchone()
+                if row and (row[1], row[2]) == (st.st_size, digest):
+                    self._db.execute("UPDATE outputs SET mtime_ns=? WHERE seq=?", (st.st_mtime_ns, row[0]))
+                    seq = row[0]
+                else:
+                    if row:
+                        self._db.execute("DELETE FROM outputs WHERE seq=?", (row[0],))
+                    seq = self._db.execute("INSERT INTO outputs (name, size, mtime_ns, sha1) VALUES (?,?,?,?)",
+                                           (name, st.st_size, st.st_mtime_ns, digest)).lastrowid
+                self._db.commit()
+            got.append(Output(seq, name, st.st_size, st.st_mtime_ns, digest))
+        return got
+
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM outputs").fetchone()[0]
+
+    def mark_of(self, consumer: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT seq FROM consumers WHERE consumer=?", (consumer,)).fetchone()
+        return row[0] if row else 0
+
+    def pending(self, consumer: str, suffixes: Optional[Tuple[str, ...]] = None) -> List[Output]:
+        with self._lock:
+            rows = self._db.execute("SELECT seq, name, size, mtime_ns, sha1 FROM outputs WHERE seq > "
+                                    "COALESCE((SELECT seq FROM consumers WHERE consumer=?), 0) ORDER BY seq",
+                                    (consumer,)).fetchall()
+        outs = [Output(*r) for r in rows]
+        return [o for o in outs if o.name.lower().endswith(suffixes)] if suffixes else outs
+
+    def mark(self, consumer: str, seq: int) -> None:
+        with self._lock:
+            self._db.execute("INSERT INTO consumers VALUES (?, ?) ON CONFLICT(consumer) DO UPDATE SET "
+                             "seq=MAX(seq, excluded.seq)", (consumer, seq))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,212 @@
+from __future__ import annotations
+import heapq, queue, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+# Staged pipeline runtime: items from a source iterator flow through stages joined by
+# bounded queues, each stage with its own workers -- threads for I/O, processes for
+# CPU-bound work (fn and items must pickle; a process stage with one worker runs in the
+# calling process, like decode_blob_groups(workers=1)). Stages overlap, so wall time
+# approaches that of the slowest stage rather than the sum. Back-pressure: a full queue
+# blocks the stage feeding it, and at most `window` items are in flight between the
+# source and the consumer, which also bounds the reorder buffers -- results come out in
+# source order whatever the worker counts. Each stage counts items, busy time and the
+# depth of its input queue.
+
+_DONE = object()
+_POLL = 0.1                                 # seconds between stop checks while blocked
+
+class _Stopped(Exception):
+    pass
+
+class Stage(NamedTuple):
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    kind: str = "thread"                    # "thread" | "process"
+    when: Optional[Callable[[Any], bool]] = None    # items it rejects skip fn and pass through
+    ordered: bool = False                   # take items in source order (runs one worker)
+    initializer: Optional[Callable[[], None]] = None    # once per worker process
+
+class StageStats:
+    """Counters of one stage; depth is sampled from its input queue on every take."""
+
+    def __init__(self, stage: Stage, capacity: int):
+        self.name, self.kind, self.workers, self.capacity = stage.name, stage.kind, stage.workers, capacity
+        self.items = self.skipped = self.max_depth = 0
+        self.busy = 0.0
+        self._depth_sum = self._samples = 0
+        self._lock = threading.Lock()
+
+    def sample(self, depth: int) -> None:
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_sum += depth
+            self._samples += 1
+
+    def count(self, seconds: float, ran: bool) -> None:
+        with self._lock:
+            self.items += 1
+            self.skipped += not ran
+            self.busy += seconds
+
+    def as_dict(self, wall: float) -> Dict[str, Any]:
+        return {"stage": self.name, "kind": self.kind, "workers": self.workers, "items": self.items,
+                "skipped": self.skipped, "busy": self.busy, "items_per_s": self.items / wall if wall > 0 else 0.0,
+                "utilization": self.busy / (wall * self.workers) if wall > 0 else 0.0,
+                "queue_max": self.max_depth, "queue_avg": self._depth_sum / self._samples if self._samples else 0.0,
+                "queue_capacity": self.capacity}
+
+    def line(self, wall: float) -> str:
+        st = self.as_dict(wall)
+        unit = "process(es)" if self.kind == "process" and self.workers > 1 else "thread(s)"
+        return (f"{self.name}: {st['items']} item(s), {st['items_per_s']:.1f}/s, busy {100 * st['utilization']:.0f}% "
+                f"of {self.workers} {unit}, queue max {st['queue_max']}/{self.capacity} avg {st['queue_avg']:.1f}")
+
+class Pipeline:
+    """
+    Pipeline(stages).run(items) yields each item's result from the last stage, in source
+    order. queue_size bounds every stage's input queue (0: twice the stage's workers);
+    window bounds the items in flight (0: the sum of queue sizes and workers). An
+    exception in the source or in a stage stops every stage and is raised from run().
+    After run() finishes, stats() / report() describe the run.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 0, window: int = 0):
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        self.stages = [s._replace(workers=1) if s.ordered else s._replace(workers=max(1, s.workers)) for s in stages]
+        self.capacity = [queue_size or 2 * s.workers for s in self.stages]
+        self.window = window or sum(self.capacity) + sum(s.workers for s in self.stages)
+        self.wall = 0.0
+        self._stats = [StageStats(s, c) for s, c in zip(self.stages, self.capacity)]
+
+    def _get(self, q: queue.Queue):
+        while True:
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise _Stopped()
+
+    def _put(self, q: queue.Queue, x) -> None:
+        while True:
+            try:
+                return q.put(x, timeout=_POLL)
+            except queue.Full:
+                if self._stop.is_set():
+                    raise _Stopped()
+
+    def _fail(self, e: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = e
+        self._stop.set()
+
+    def _feed(self, items: Iterable) -> None:
+        try:
+            it, seq = iter(items), 0
+            while True:
+                while not self._slots.acquire(timeout=_POLL):       # before pulling: no read-ahead
+                    if self._stop.is_set():
+                        return
+                item = next(it, _DONE)
+                if item is _DONE:
+                    break
+                self._put(self._queues[0], (seq, item))
+                seq += 1
+            for _ in range(self.stages[0].workers):
+                self._put(self._queues[0], _DONE)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _work(self, i: int, pool: Optional[ProcessPoolExecutor]) -> None:
+        stage, st = self.stages[i], self._stats[i]
+        q_in, q_out = self._queues[i], self._queues[i + 1]
+        held: list = []                     # ordered stages: items that arrived early
+        nxt = 0
+        try:
+            while True:
+                st.sample(q_in.qsize())
+                got = self._get(q_in)
+                if got is _DONE:
+                    break
+                if not stage.ordered:
+                    self._put(q_out, self._run(stage, st, pool, got))
+                    continue
+                heapq.heappush(held, got)
+                while held and held[0][0] == nxt:
+                    self._put(q_out, self._run(stage, st, pool, heapq.heappop(held)))
+                    nxt += 1
+            with self._lock:
+                self._running[i] -= 1
+                last = self._running[i] == 0
+            if last:
+                for _ in range(self.stages[i + 1].workers if i + 1 < len(self.stages) else 1):
+                    self._put(q_out, _DONE)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    @staticmethod
+    def _run(stage: Stage, st: StageStats, pool: Optional[ProcessPoolExecutor], got):
+        seq, item = got
+        t0 = time.perf_counter()
+        ran = stage.when is None or stage.when(item)
+        if ran:
+            item = pool.submit(stage.fn, item).result() if pool is not None else stage.fn(item)
+        st.count(time.perf_counter() - t0, ran)
+        return seq, item
+
+    def run(self, items: Iterable) -> Iterator[Any]:
+        self._stop, self._lock, self._error = threading.Event(), threading.Lock(), None
+        self._slots = threading.Semaphore(self.window)
+        self._queues = [queue.Queue(maxsize=c) for c in self.capacity] + [queue.Queue()]
+        self._running = [s.workers for s in self.stages]
+        pools = [ProcessPoolExecutor(max_workers=s.workers, initializer=s.initializer)
+                 if s.kind == "process" and s.workers > 1 else None for s in self.stages]
+        threads = [threading.Thread(target=self._feed, args=(items,), name="pipeline-source", daemon=True)]
+        for i, s in enumerate(self.stages):
+            threads += [threading.Thread(target=self._work, args=(i, pools[i]), name=f"pipeline-{s.name}-{w}",
+                                         daemon=True) for w in range(s.workers)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        held: list = []
+        nxt = 0
+        try:
+            while True:
+                got = self._get(self._queues[-1])
+                if got is _DONE:
+                    break
+                heapq.heappush(held, got)
+                while held and held[0][0] == nxt:
+                    _, item = heapq.heappop(held)
+                    nxt += 1
+                    self._slots.release()
+                    yield item
+        except _Stopped:
+            pass
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+            for p in pools:
+                if p is not None:
+                    p.shutdown(cancel_futures=True)
+            self.wall = time.perf_counter() - t0
+        if self._error is not None:
+            raise self._error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [s.as_dict(self.wall) for s in self._stats]
+
+    def bottleneck(self) -> str:
+        """The stage with the highest busy time per worker: the one bounding wall time."""
+        return max(self._stats, key=lambda s: s.busy / s.workers).name
+
+    def report(self) -> List[str]:
+        return [s.line(self.wall) for s in self._stats]
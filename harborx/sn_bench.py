@@ -0,0 +1,120 @@
+from __future__ import annotations
+import json, math, os, time, tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+from harborx.sn_pydecoder import BlobGroup, DecodeProfile, _load_blob, decode_blob_bins_to_kv
+
+# Decoder benchmark over saved blob groups: every group is decoded in this process with a
+# DecodeProfile, and the per-stage timings are summarised as p50/p95 across groups. Blob
+# files are read before the clock starts, so the numbers are pure decode cost.
+
+MANIFEST_NAME = "decoder_manifest.json"
+
+def load_corpus(path: str) -> List[BlobGroup]:
+    """Blob groups of a grouped manifest (as written by sn_pipeline), or of <dir>/decoder_manifest.json."""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f).get("entries", [])
+    base = os.path.dirname(os.path.abspath(path))
+    groups, seen = [], {}
+    for e in entries:
+        eb = int(e.get("eth_block", 0))
+        blobs = [os.path.join(base, b["path"]) for b in e.get("blobs", [])]
+        groups.append(BlobGroup(eb, seen.get(eb, 0), blobs))
+        seen[eb] = seen.get(eb, 0) + 1
+    return groups
+
+def _pct(vals: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values."""
+    if not vals:
+        return None
+    s = sorted(vals)
+    return s[max(0, math.ceil(q / 100.0 * len(s)) - 1)]
+
+def _summary(vals: Sequence[float]) -> Dict:
+    return {"p50": _pct(vals, 50), "p95": _pct(vals, 95), "total": sum(vals), "n": len(vals)}
+
+def run_bench(groups: Sequence[BlobGroup], stateful_db: str = "", *, repeat: int = 1,
+              alloc: bool = False) -> Dict:
+    """
+    Decode each group `repeat` times; returns per-stage and per-group timing summaries.
+    blobs/rows and blobs_per_s count successful decodes only; failures are in errors.
+    """
+    per_stage: Dict[str, List[float]] = {s: [] for s in DecodeProfile.STAGES}
+    peaks: Dict[str, List[int]] = {s: [] for s in DecodeProfile.STAGES}
+    totals: List[float] = []
+    blobs = rows = 0
+    ok_seconds = 0.0
+    errors: List[Dict] = []
+    started = alloc and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        for g in groups:
+            data = [_load_blob(b) for b in g.blobs]
+            for _ in range(repeat):
+                prof = DecodeProfile()
+                t0 = time.perf_counter()
+                try:
+                    out = decode_blob_bins_to_kv(data, stateful_db, profile=prof)
+                except Exception as e:
+                    errors.append({"eth_block": g.eth_block, "index": g.index, "error": f"{type(e).__name__}: {e}"})
+                    out = None
+                totals.append(time.perf_counter() - t0)
+                if out is not None:
+                    rows += len(out)
+                    blobs += len(data)
+                    ok_seconds += totals[-1]
+                for s, dt in prof.seconds.items():
+                    per_stage.setdefault(s, []).append(dt)
+                for s, pk in prof.alloc_peak.items():
+                    peaks.setdefault(s, []).append(pk)
+    finally:
+        if started:
+            tracemalloc.stop()
+    wall = sum(totals)
+    stages = {}
+    for s, vals in per_stage.items():
+        if not vals:
+            continue
+        stages[s] = _summary(vals)
+        stages[s]["share"] = sum(vals) / wall if wall else None
+        if peaks.get(s):
+            stages[s]["alloc_peak_p95"] = _pct(peaks[s], 95)
+    return {
+        "groups": len(groups), "repeat": repeat, "decodes": len(totals), "blobs": blobs, "rows": rows,
+        "errors": len(errors), "first_errors": errors[:5],
+        "seconds": wall, "blobs_per_s": blobs / ok_seconds if ok_seconds else None,
+        "group": _summary(totals), "stages": stages,
+    }
+
+def add_arguments(ap) -> None:
+    ap.add_argument("--corpus", required=True, help=f"Grouped manifest JSON, or a directory holding {MANIFEST_NAME}")
+    ap.add_argument("--stateful-db", default="", help="idxmap sqlite for v0.13.x stateful index resolution")
+    ap.add_argument("--repeat", type=int, default=1, help="Decodes per group")
+    ap.add_argument("--limit", type=int, default=0, help="Only the first N groups")
+    ap.add_argument("--alloc", action="store_true", help="Also record per-stage peak allocations (tracemalloc; slower)")
+    ap.add_argument("--out", default="", help="Write the JSON report here as well as to stdout")
+
+def run(args) -> Dict:
+    groups = load_corpus(args.corpus)
+    if args.limit:
+        groups = groups[:args.limit]
+    report = run_bench(groups, args.stateful_db, repeat=max(1, args.repeat), alloc=args.alloc)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return report
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    import argparse
+    ap = argparse.ArgumentParser(prog="harborx sn-bench")
+    add_arguments(ap)
+    run(ap.parse_args(argv))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import os
+from typing import Dict, Optional, Tuple
+
+# Content-addressed store of decoded blob groups. Entries are single Arrow RecordBatches
+# (zstd-compressed IPC files) under <root>/<key[:2]>/<key>.arrow, written atomically so
+# a crashed run leaves only whole entries behind. The key (see
+# sn_pydecoder.group_cache_key) hashes the blob contents together with the decoder
+# version, so nothing here needs invalidating when inputs or code change: stale
+# entries simply stop being asked for and age out under the size budget.
+
+CACHE_EXT = ".arrow"
+DEFAULT_MAX_BYTES = 2 << 30
+
+class DecodeCache:
+    """
+    get(key) -> RecordBatch or None; put(key, batch). Least recently used entries
+    (by mtime, refreshed on every hit) are evicted once the cache exceeds max_bytes.
+    hits / misses / stores / evictions count this instance's activity.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root, self.max_bytes = os.path.abspath(root), max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._sizes: Optional[Dict[str, Tuple[int, float]]] = None   # path -> (bytes, mtime), scanned lazily
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + CACHE_EXT)
+
+    def _index(self) -> Dict[str, Tuple[int, float]]:
+        if self._sizes is None:
+            self._sizes = {}
+            for base, _, names in os.walk(self.root):
+                for n in names:
+                    if n.endswith(CACHE_EXT):
+                        p = os.path.join(base, n)
+                        st = os.stat(p)
+                        self._sizes[p] = (st.st_size, st.st_mtime)
+        return self._sizes
+
+    @property
+    def nbytes(self) -> int:
+        return sum(sz for sz, _ in self._index().values())
+
+    def get(self, key: str):
+        import pyarrow as pa
+        p = self._path(key)
+        try:
+            with pa.OSFile(p, "rb") as f:
+                batch = pa.ipc.open_file(f).get_batch(0)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(p)
+            st = os.stat(p)
+            self._index()[p] = (st.st_size, st.st_mtime)
+        except OSError:
+            pass
+        return batch
+
+    def put(self, key: str, batch) -> None:
+        import pyarrow as pa
+        p = self._path(key)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        tmp = f"{p}.{os.getpid()}.tmp"
+        opts = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.OSFile(tmp, "wb") as f, pa.ipc.new_file(f, batch.schema, options=opts) as w:
+            w.write_batch(batch)
+        os.replace(tmp, p)
+        st = os.stat(p)
+        self._index()[p] = (st.st_size, st.st_mtime)
+        self.stores += 1
+        self.evict(keep=p)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Drop least recently used entries until the cache fits max_bytes; returns how many."""
+        idx = self._index()
+        total = sum(sz for sz, _ in idx.values())
+        dropped = 0
+        for p, (sz, _) in sorted(idx.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            del idx[p]
+            total -= sz
+            dropped += 1
+        self.evictions += dropped
+        return dropped
+
+    def stats(self) -> str:
+        return f"hits={self.hits} misses={self.misses} stored={self.stores} evicted={self.evictions}"
@@ -2,9 +2,14 @@
 # sn_pydecoder.py — robust Starknet blob → KV decoder
 from __future__ import annotations
 
-from typing import List, Dict, Tuple, Iterable, Optional
+from typing import Any, List, Dict, Tuple, Iterable, Iterator, NamedTuple, Optional, Sequence, Union
 
-import os, json, sqlite3
+import os, json, hashlib, sqlite3, time, traceback, tracemalloc
+from pathlib import Path
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from collections.abc import Sequence as _SequenceABC
+from concurrent.futures import ProcessPoolExecutor
 
 # ----------------------------- Imports (vendored) -----------------------------
 
@@ -33,13 +38,22 @@ def _get_stateless_decompress():
     raise ImportError("No stateless decompressor available. Ensure vendored files exist.")
 
 # 3) Program output parser (uncompressed felts -> locate and parse state diff)
-from harborx.vendor.program_output_minimal import extract_state_diff  # type: ignore
+try:
+    from harborx.vendor.program_output_minimal import extract_state_diff  # type: ignore
+except Exception:
+    extract_state_diff = None  # type: ignore
 
 # ----------------------------- Cairo field (Fr) -------------------------------
 
-# Cairo felt field modulus: 2^251 + 17*2^192 + 1
-FR_MOD = (1 << 251) + 17 * (1 << 192) + 1
-GENERATOR = 5  # primitive root used by Starknet DA for length-4096 NTT
+# Field constants and the cached-table NTT live in harborx.ntt (no vendored deps).
+from harborx.ntt import FR_MOD, GENERATOR, BLOB_N, bit_reverse_permutation, get_engine  # noqa: E402
+from harborx.blob_store import BLOB_SUFFIXES, read_blob  # noqa: E402
+
+# NumPy (the cli extra) speeds up blob -> felt conversion; without it the per-word loop is used.
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
 
 # ----------------------------- Utilities -------------------------------------
 
@@ -62,234 +76,788 @@ def _blob_to_evals_32B_words(blob: bytes, *, endian: str = "BE") -> List[int]:
         raise AssertionError("expected 4096 evals per blob")
     return out
 
-def _bit_reverse(x: int, bits: int) -> int:
-    y = 0
-    for _ in range(bits):
-        y = (y << 1) | (x & 1)
-        x >>= 1
-    return y
-
-def _bit_reverse_list(a: List[int]) -> None:
-    n = len(a)
-    bits = (n - 1).bit_length()
-    for i in range(n):
-        j = _bit_reverse(i, bits)
-        if j > i:
-            a[i], a[j] = a[j], a[i]
-
-def _egcd(a: int, b: int) -> Tuple[int,int,int]:
-    if b == 0:
-        return (a, 1, 0)
-    g, x1, y1 = _egcd(b, a % b)
-    return (g, y1, x1 - (a // b) * y1)
-
-def _modinv(a: int, mod: int = FR_MOD) -> int:
-    a %= mod
-    g, x, _ = _egcd(a, mod)
-    if g != 1:
-        raise ZeroDivisionError("no modular inverse")
-    return x % mod
-
-def _root_of_unity(n: int) -> int:
-    # Since 4096 | (FR_MOD - 1), generator^((FR_MOD-1)/n) is an n-th root.
-    return pow(GENERATOR, (FR_MOD - 1) // n, FR_MOD)
+BLOB_BYTES = 32 * BLOB_N
+_FR_TOP = FR_MOD >> 192         # a word whose top 64 bits are below this is already < FR_MOD
+
+def blobs_to_evals(blobs: Sequence[bytes], *, endian: str = "BE", bitrev: bool = False) -> List[List[int]]:
+    """
+    Many blobs at once -> per blob, 4096 field elements (32-byte words mod FR_MOD), the
+    same values as _blob_to_evals_32B_words. bitrev=True returns each blob's words in
+    bit-reversed order, applied as one precomputed gather over all blobs' words.
+
+    With NumPy the blobs are viewed as one (words, 32) byte matrix: byte order and the
+    permutation are array operations, the top 64-bit limb of every word is compared
+    against FR_MOD in one pass, and only words at or above it pay for a modulo.
+    """
+    for b in blobs:
+        if len(b) != BLOB_BYTES:
+            raise ValueError(f"blob length must be 131072 bytes, got {len(b)}")
+    if not blobs:
+        return []
+    if np is None:
+        out = [_blob_to_evals_32B_words(b, endian=endian) for b in blobs]
+        if bitrev:
+            rev = bit_reverse_permutation(BLOB_N)
+            out = [[e[r] for r in rev] for e in out]
+        return out
+    w = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(-1, 32)
+    if endian != "BE":
+        w = w[:, ::-1]
+    if bitrev:
+        w = w[_bitrev_gather(len(blobs))]
+    top = np.ascontiguousarray(w[:, :8]).view(">u8").ravel()
+    raw = w.tobytes()
+    fb = int.from_bytes
+    vals = [fb(raw[i:i + 32], "big") for i in range(0, len(raw), 32)]
+    for i in np.flatnonzero(top >= _FR_TOP).tolist():
+        vals[i] %= FR_MOD
+    return [vals[i:i + BLOB_N] for i in range(0, len(vals), BLOB_N)]
+
+_GATHERS: Dict[int, "np.ndarray"] = {}
+
+def _bitrev_gather(count: int):
+    """Word indices that bit-reverse each of `count` consecutive blobs (cached per count)."""
+    g = _GATHERS.get(count)
+    if g is None:
+        rev = np.asarray(bit_reverse_permutation(BLOB_N), dtype=np.intp)
+        g = _GATHERS[count] = (np.arange(count, dtype=np.intp)[:, None] * BLOB_N + rev).ravel()
+    return g
 
 def _ntt_inplace(a: List[int], inverse: bool = False, mod: int = FR_MOD) -> None:
-    n = len(a)
-    _bit_reverse_list(a)
-    m = 2
-    while m <= n:
-        step = pow(_root_of_unity(n), n // m, mod)
-        if inverse:
-            step = _modinv(step, mod)
-        for k in range(0, n, m):
-            w = 1
-            half = m // 2
-            for j in range(half):
-                u = a[k + j]
-                t = (a[k + j + half] * w) % mod
-                a[k + j] = (u + t) % mod
-                a[k + j + half] = (u - t) % mod
-                w = (w * step) % mod
-        m <<= 1
-    if inverse:
-        inv_n = _modinv(n, mod)
-        for i in range(n):
-            a[i] = (a[i] * inv_n) % mod
+    # bit-reverse, then radix-2 butterflies; twiddles, permutation and n^-1 are cached per (n, mod)
+    a[:] = get_engine(len(a), mod).transform_many([a], inverse=inverse, permute=True)[0]
 
-def _ifft_one_blob(evals: List[int], *, bitrev: bool = True) -> List[int]:
+def _ifft_blobs(evals_per_blob: List[List[int]], *, bitrev: bool = True) -> List[List[int]]:
     """
-    In-place inverse NTT to obtain coefficients from evaluation values.
+    Inverse NTT of several blobs in one batch (coefficients from evaluation values).
     Starknet blobs require bit-reversal before inverse; we mimic common pipelines.
+    That reversal and the transform's own input permutation cancel out, so with
+    bitrev=True no permutation is applied at all.
     """
-    arr = list(evals)
-    # Typical Starknet DA expects bit-reversed order for inverse transform.
-    if bitrev:
-        _bit_reverse_list(arr)
-    _ntt_inplace(arr, inverse=True, mod=FR_MOD)
-    return arr
+    return get_engine(BLOB_N, FR_MOD).transform_many(evals_per_blob, inverse=True, permute=not bitrev)
+
+def _ifft_one_blob(evals: List[int], *, bitrev: bool = True) -> List[int]:
+    """Inverse NTT of one blob; see _ifft_blobs."""
+    return get_engine(len(evals), FR_MOD).transform_many([evals], inverse=True, permute=not bitrev)[0]
 
 # -------------------------- Stateless header scanning -------------------------
 
+# Stateless-compression header (cairo-lang stateless_compression): one felt packing
+# [version, data_len, 6 unique-value bucket lengths, n_repeating_values] as 20-bit
+# little-endian fields. Every data element is either a unique value or a repeat, so
+# data_len == sum(buckets) + n_repeating; bucket b packs floor(251 / bits_b) values per felt.
+COMPRESSION_VERSION = 0
+_HDR_ELM_BITS = 20
+_HDR_N_ELMS = 9
+_HDR_ELM_MASK = (1 << _HDR_ELM_BITS) - 1
+_UNIQUE_BUCKET_BITS = (252, 125, 83, 62, 31, 15)
+
+# Winning header offsets, most recent first, per (decompressor, header version).
+_HEADER_OFFSETS: Dict[Tuple[str, int], List[int]] = {}
+_HEADER_OFFSETS_KEEP = 4
+
+class _FeltView(_SequenceABC):
+    """Read-only view of felts[off:] without copying the list."""
+    __slots__ = ("_base", "_off")
+
+    def __init__(self, base: List[int], off: int):
+        self._base, self._off = base, off
+
+    def __len__(self) -> int:
+        return len(self._base) - self._off
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._base[self._off + j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._base[self._off + i]
+
+    def __iter__(self):
+        return map(self._base.__getitem__, range(self._off, len(self._base)))
+
+def _stateless_header_version(felts: List[int], off: int) -> Optional[int]:
+    """Header version if felts[off] can start a compressed stream of this length, else None."""
+    h = felts[off]
+    if h >> (_HDR_ELM_BITS * _HDR_N_ELMS):
+        return None
+    f = [(h >> (_HDR_ELM_BITS * i)) & _HDR_ELM_MASK for i in range(_HDR_N_ELMS)]
+    version, data_len, buckets, n_repeating = f[0], f[1], f[2:8], f[8]
+    if version != COMPRESSION_VERSION or data_len == 0 or sum(buckets) + n_repeating != data_len:
+        return None
+    min_felts = 1 + sum(-(-n // max(1, 251 // bits)) for n, bits in zip(buckets, _UNIQUE_BUCKET_BITS))
+    if off + min_felts > len(felts):
+        return None
+    return version
+
 def _try_stateless_decompress_scan(felts: List[int], *, max_scan: int = 16384, debug: bool = False) -> Tuple[List[int], int]:
     """
-    Try to find the start of the stateless-compressed stream by scanning offsets.
+    Find the start of the stateless-compressed stream and decompress from there.
     Returns (uncompressed_program_output_felts, header_offset).
+
+    Order of attempts: offsets that won before for this decompressor, then every
+    offset whose felt passes the header's structural checks, then (only if all of
+    those fail) every remaining offset, as the old exhaustive scan did. Attempts
+    read a zero-copy view of felts[off:].
     """
     decompress = _get_stateless_decompress()
+    dkey = getattr(decompress, "__module__", "") or repr(decompress)
     last_err: Optional[str] = None
     limit = min(max_scan, len(felts))
-    for off in range(limit):
+    t0 = time.perf_counter()
+    tried = set()
+
+    def attempt(off: int):
+        nonlocal last_err
+        tried.add(off)
         try:
-            uncompressed = list(decompress(felts[off:]))
+            uncompressed = list(decompress(_FeltView(felts, off)))
             if not uncompressed:
                 raise ValueError("empty uncompressed stream")
-            if debug:
-                print(f"[stateless] candidate header@{off}, uncompressed_len={len(uncompressed)}")
-            return uncompressed, off
+            return uncompressed
         except Exception as e:
             last_err = str(e)[:120]
-            continue
+            return None
+
+    def plausible(offsets):
+        return (o for o in offsets if o < limit and _stateless_header_version(felts, o) is not None)
+
+    remembered = [o for (k, _v), offs in _HEADER_OFFSETS.items() if k == dkey for o in offs]
+    for phase, offsets in (("remembered", plausible(remembered)),
+                           ("structural", plausible(range(limit))),
+                           ("exhaustive", range(limit))):
+        for off in offsets:
+            if off in tried:
+                continue
+            uncompressed = attempt(off)
+            if uncompressed is None:
+                continue
+            version = _stateless_header_version(felts, off)
+            if version is not None:
+                offs = _HEADER_OFFSETS.setdefault((dkey, version), [])
+                if off in offs:
+                    offs.remove(off)
+                offs.insert(0, off)
+                del offs[_HEADER_OFFSETS_KEEP:]
+            if debug:
+                print(f"[stateless] header@{off} ({phase}), uncompressed_len={len(uncompressed)}, "
+                      f"{len(tried)} attempt(s) in {time.perf_counter()-t0:.3f}s")
+            return uncompressed, off
     raise EOFError(f"bitstream exhausted (scanned 0..{limit-1}); last error: {last_err}")
 
 # -------------------------- v0.13.x index map (optional) ----------------------
 
+_INDEX_MIN = 128            # v0.13.x aliases start at 0x80; smaller values are always literal
+_SQLITE_INT_MAX = (1 << 63) - 1   # wider values are real felts (addresses/keys are ~251 bits)
+_MISSING = object()
+
+def _is_index(v: int) -> bool:
+    """Whether v may be an index surrogate: aliases are small counters, real felts are far wider."""
+    return _INDEX_MIN <= v <= _SQLITE_INT_MAX
+
 class StatefulIndexMap:
     """
     Optional resolver for v0.13.x stateful encoding where addresses/keys may be
     replaced by indices. Expects a sqlite db file with table:
       CREATE TABLE IF NOT EXISTS idxmap (idx INTEGER PRIMARY KEY, val TEXT);
     where val is decimal string of the 251-bit felt value.
+
+    One read-only connection is opened on first use and kept; resolved lookups go
+    through a bounded LRU (misses are not cached: the db may gain the alias later);
+    get_many resolves a whole batch with
+    chunked `idx IN (...)` queries. Index surrogates are small counters, so only
+    values in [_INDEX_MIN, 2^63) are candidates; anything wider cannot be stored
+    in idxmap and is a literal felt. A failed query is not cached.
     """
-    def __init__(self, db_file: str):
+    BATCH = 900     # bound parameters per IN (...) query, below SQLite's oldest limit of 999
+
+    def __init__(self, db_file: str, cache_size: int = 1 << 16):
         self.db_file = db_file
-        self._ok = os.path.exists(db_file)
+        self._ok = bool(db_file) and os.path.exists(db_file)
+        self._cx: Optional[sqlite3.Connection] = None
+        self._cache: "OrderedDict[int, Optional[int]]" = OrderedDict()
+        self.cache_size = max(0, cache_size)
+        self.hits = self.misses = self.queries = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._cx is None:
+            uri = Path(os.path.abspath(self.db_file)).as_uri() + "?mode=ro"
+            self._cx = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._cx
+
+    def _remember(self, idx: int, val: Optional[int]) -> None:
+        if not self.cache_size:
+            return
+        self._cache[idx] = val
+        self._cache.move_to_end(idx)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
 
     def get(self, idx: int) -> Optional[int]:
-        if not self._ok:
-            return None
-        try:
-            with sqlite3.connect(self.db_file) as cx:
-                row = cx.execute("SELECT val FROM idxmap WHERE idx=?", (idx,)).fetchone()
-            if not row:
-                return None
-            v = int(row[0])
-            return v
-        except Exception:
-            return None
+        return self.get_many([idx]).get(idx)
+
+    def get_many(self, idxs: Iterable[int]) -> Dict[int, Optional[int]]:
+        """Resolve many indices at once: cache first, then one IN (...) query per BATCH misses."""
+        out: Dict[int, Optional[int]] = {}
+        todo: List[int] = []
+        for idx in idxs:
+            if idx in out:
+                continue
+            hit = self._cache.get(idx, _MISSING)
+            if hit is not _MISSING:
+                self._cache.move_to_end(idx)
+                self.hits += 1
+                out[idx] = hit
+            else:
+                out[idx] = None
+                if self._ok and 0 <= idx <= _SQLITE_INT_MAX:
+                    todo.append(idx)
+        self.misses += len(todo)
+        done = 0
+        if todo:
+            try:
+                cx = self._conn()
+                for i in range(0, len(todo), self.BATCH):
+                    chunk = todo[i:i + self.BATCH]
+                    self.queries += 1
+                    q = f"SELECT idx, val FROM idxmap WHERE idx IN ({','.join('?' * len(chunk))})"
+                    for idx, val in cx.execute(q, chunk).fetchall():
+                        out[idx] = int(val)
+                    done = i + len(chunk)
+            except Exception:
+                pass        # unreadable db / missing table: leave unresolved, as before
+        for idx in todo[:done]:
+            if out[idx] is not None:        # aliases never change once assigned; misses are asked again
+                self._remember(idx, out[idx])
+        return out
+
+    def resolve_many(self, values: Iterable[int]) -> Dict[int, int]:
+        """{value: resolved} for every value that looks like an index surrogate and has an idxmap entry."""
+        cands = {v for v in values if _is_index(v)}
+        return {k: v for k, v in self.get_many(cands).items() if v is not None} if cands else {}
 
     def maybe_addr(self, addr_or_idx: int) -> int:
-        # Heuristic: small values are literal; big (>2^127) likely an index surrogate
-        if addr_or_idx.bit_length() <= 127:
+        if not _is_index(addr_or_idx):
             return addr_or_idx
         v = self.get(addr_or_idx)
         return v if v is not None else addr_or_idx
 
     def maybe_key(self, key_or_idx: int) -> int:
-        if key_or_idx.bit_length() <= 127:
+        if not _is_index(key_or_idx):
             return key_or_idx
         v = self.get(key_or_idx)
         return v if v is not None else key_or_idx
 
+    def close(self) -> None:
+        if self._cx is not None:
+            self._cx.close()
+            self._cx = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_RESOLVERS: Dict[Tuple[int, str], Tuple[Any, StatefulIndexMap]] = {}
+
+def _db_stamp(db_file: str):
+    """(mtime, size) of the db and its WAL, or None while it does not exist."""
+    stamp = []
+    for p in (db_file, db_file + "-wal"):
+        try:
+            st = os.stat(p)
+        except OSError:
+            if p == db_file:
+                return None
+            continue
+        stamp += [st.st_mtime_ns, st.st_size]
+    return tuple(stamp)
+
+def _resolver_for(db_file: str) -> StatefulIndexMap:
+    """
+    One StatefulIndexMap (connection + cache) per db file per process; never shared across
+    fork. It is rebuilt once the db changes on disk (or appears), so a long-running follower
+    picks up aliases added after it started.
+    """
+    key = (os.getpid(), db_file)
+    stamp = _db_stamp(db_file) if db_file else None
+    seen = _RESOLVERS.get(key)
+    if seen is not None and seen[0] == stamp:
+        return seen[1]
+    if seen is not None:
+        seen[1].close()
+    r = StatefulIndexMap(db_file)
+    _RESOLVERS[key] = (stamp, r)
+    return r
+
 # -------------------------- Flatten state-diff to KV --------------------------
 
-def _flatten_parsed(parsed: Dict, resolver: StatefulIndexMap) -> List[Dict]:
+Entry = Tuple[int, int, int, Optional[int], Optional[int]]   # (addr, key, value, class_hash, nonce)
+
+def _raw_entries(parsed: Dict) -> Iterator[Entry]:
     """
     parsed: {"contracts":[{"address":int,"class_hash":opt int,"nonce":opt int,"storage":[[k,v],...] }], "declared":[[class_hash,version], ...]}
+    Yields one Entry per storage entry as decoded, index surrogates still unresolved.
     """
-    out: List[Dict] = []
-    contracts = parsed.get("contracts", [])
-    for c in contracts:
-        addr = resolver.maybe_addr(int(c.get("address", 0)))
+    def _kv(pair):
+        if isinstance(pair, dict):
+            return pair.get("key"), pair.get("value")
+        return pair  # assume [k,v]
+
+    for c in parsed.get("contracts", []):
+        addr = int(c.get("address", 0))
         ch = c.get("class_hash")
         nn = c.get("nonce")
+        ch = int(ch) if ch is not None else None
+        nn = int(nn) if nn is not None else None
         for pair in c.get("storage", []):
-            if isinstance(pair, dict):
-                k = pair.get("key"); v = pair.get("value")
-            else:
-                # assume [k,v]
-                k, v = pair
-            k = resolver.maybe_key(int(k))
-            v = int(v)
-            out.append({
-                "addr": str(addr),
-                "key": str(k),
-                "value": str(v),
-                **({"class_hash": str(int(ch))} if ch is not None else {}),
-                **({"nonce": str(int(nn))} if nn is not None else {}),
-            })
+            k, v = _kv(pair)
+            yield addr, int(k), int(v), ch, nn
+
+def _resolve_entries(entries: Sequence[Entry], resolver: StatefulIndexMap) -> Iterator[Entry]:
+    """Replace index surrogates in addr/key, resolving every one of the diff in bulk."""
+    resolved = resolver.resolve_many([e[0] for e in entries] + [e[1] for e in entries])
+    for addr, k, v, ch, nn in entries:
+        yield resolved.get(addr, addr), resolved.get(k, k), v, ch, nn
+
+def _iter_entries(parsed: Dict, resolver: StatefulIndexMap) -> Iterator[Entry]:
+    """Entries of a parsed diff with surrogates resolved."""
+    return _resolve_entries(list(_raw_entries(parsed)), resolver)
+
+def _rows_from_entries(entries: Iterable[Entry]) -> List[Dict]:
+    out: List[Dict] = []
+    for addr, k, v, ch, nn in entries:
+        out.append({
+            "addr": str(addr),
+            "key": str(k),
+            "value": str(v),
+            **({"class_hash": str(ch)} if ch is not None else {}),
+            **({"nonce": str(nn)} if nn is not None else {}),
+        })
     return out
 
+def _flatten_parsed(parsed: Dict, resolver: StatefulIndexMap) -> List[Dict]:
+    """State diff -> one dict of decimal strings per storage entry (the JSONL row format)."""
+    return _rows_from_entries(_iter_entries(parsed, resolver))
+
+# -------------------------- Flatten state-diff to Arrow -----------------------
+
+# Felts are < 2^252, so each one is a big-endian fixed_size_binary(32) value (the
+# same layout the lake uses for keys) instead of a ~77-char decimal string.
+FELT_BYTES = 32
+KV_COLUMNS = ("addr", "key", "value", "class_hash", "nonce")
+
+def kv_schema(tagged: bool = False):
+    """Arrow schema of decoded rows; tagged=True prepends the eth_block/group columns."""
+    import pyarrow as pa
+    felt = pa.binary(FELT_BYTES)
+    fields = [pa.field("addr", felt, nullable=False), pa.field("key", felt, nullable=False),
+              pa.field("value", felt, nullable=False),
+              pa.field("class_hash", felt), pa.field("nonce", felt)]
+    if tagged:
+        fields = [pa.field("eth_block", pa.uint64(), nullable=False),
+                  pa.field("group", pa.uint32(), nullable=False)] + fields
+    return pa.schema(fields)
+
+def _felt_array(values: Sequence[Optional[int]]):
+    import pyarrow as pa
+    typ = pa.binary(FELT_BYTES)
+    if any(v is None for v in values):
+        return pa.array([None if v is None else v.to_bytes(FELT_BYTES, "big") for v in values], type=typ)
+    buf = b"".join([v.to_bytes(FELT_BYTES, "big") for v in values])
+    return pa.FixedSizeBinaryArray.from_buffers(typ, len(values), [None, pa.py_buffer(buf)])
+
+def _entries_to_batch(entries: Iterable[Entry]):
+    import pyarrow as pa
+    cols = list(zip(*entries)) or [()] * len(KV_COLUMNS)
+    return pa.RecordBatch.from_arrays([_felt_array(c) for c in cols], schema=kv_schema())
+
+def _batch_entries(batch) -> List[Entry]:
+    """Inverse of _entries_to_batch."""
+    def ints(col):
+        return [None if b is None else int.from_bytes(b, "big") for b in col.to_pylist()]
+    return list(zip(*(ints(batch.column(c)) for c in KV_COLUMNS)))
+
+def _tag_batch(batch, eth_block: int, group: int):
+    """Prepend constant eth_block/group columns to a kv_schema() batch."""
+    import pyarrow as pa
+    n = batch.num_rows
+    return pa.RecordBatch.from_arrays(
+        [pa.array([eth_block] * n, pa.uint64()), pa.array([group] * n, pa.uint32())] + batch.columns,
+        schema=kv_schema(tagged=True))
+
 # -------------------- Top-level: decode blobs -> KV rows --------------------
 
-def decode_blob_bins_to_kv(
-    blobs: List[bytes],
-    stateful_db_file: str,
-    *,
-    debug: bool = False,
-    force_ifft: bool = False,  # placeholder
-) -> List[Dict]:
+class DecodeProfile:
     """
-    Input: several blob binaries (same L1 tx/frame), index 0..k.
-    Output: flattened (addr,key,value,...) rows extracted from state-diff.
+    Per-stage cost of one decode, filled in when passed as profile= to the decode
+    functions: wall seconds per stage, element counts between stages and, while
+    tracemalloc is tracing, the peak bytes allocated within each stage. A stage that
+    raised is recorded up to the failure, so partial decodes still profile.
     """
+
+    STAGES = ("evals", "ifft", "da_unpack", "stateless", "state_diff", "flatten")
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.alloc_peak: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - t0
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.alloc_peak[name] = max(self.alloc_peak.get(name, 0), peak)
+
+    @property
+    def total(self) -> float:
+        return sum(self.seconds.values())
+
+    def as_dict(self) -> Dict:
+        return {"seconds": dict(self.seconds), "alloc_peak": dict(self.alloc_peak),
+                "counts": dict(self.counts), "total": self.total}
+
+def _stages(profile: Optional[DecodeProfile]):
+    return profile.stage if profile is not None else (lambda name: nullcontext())
+
+def _decode_state_diff(blobs: List[bytes], *, debug: bool = False,
+                       profile: Optional[DecodeProfile] = None) -> Dict:
+    """Blob binaries of one group -> parsed state diff (steps 1-4 of the decode)."""
     if fr_coeffs_to_cairo_felts is None:
         raise ImportError("DA unpacker not available. Please vendor Starknet DA packing/unpacking code (see harborx/vendor/da_unp.py).")
-
-    # 1) evals -> coeffs (IFFT) per blob
-    coeffs_per_blob: List[List[int]] = []
-    for i, b in enumerate(blobs):
-        evals = _blob_to_evals_32B_words(b, endian="BE")
-        coeffs = _ifft_one_blob(evals, bitrev=True)
-        coeffs_per_blob.append(coeffs)
-        if debug:
-            print(f"[blob#{i}] evals={len(evals)} -> coeffs={len(coeffs)} (concat_total={4096*len(coeffs_per_blob)})")
+    if extract_state_diff is None:
+        raise ImportError("Program output parser not available. Ensure harborx/vendor/program_output_minimal.py exists.")
+    stage = _stages(profile)
+    counts = profile.counts if profile is not None else {}
+
+    # 1) evals -> coeffs (IFFT), all blobs of the group in one batch
+    counts["blobs"] = len(blobs)
+    with stage("evals"):
+        evals_per_blob = blobs_to_evals(blobs, endian="BE")
+    with stage("ifft"):
+        coeffs_per_blob: List[List[int]] = _ifft_blobs(evals_per_blob, bitrev=True)
+    if debug:
+        for i, coeffs in enumerate(coeffs_per_blob):
+            print(f"[blob#{i}] evals={len(evals_per_blob[i])} -> coeffs={len(coeffs)} (concat_total={4096*(i+1)})")
 
     # 2) DA unpack: coeffs_per_blob -> Cairo felts stream
-    felts: List[int] = list(fr_coeffs_to_cairo_felts(coeffs_per_blob))
+    with stage("da_unpack"):
+        felts: List[int] = list(fr_coeffs_to_cairo_felts(coeffs_per_blob))
+    counts["felts"] = len(felts)
     if debug:
         print(f"[da] coeffs_per_blob={len(coeffs_per_blob)} -> felts={len(felts)}")
 
     # 3) Scan & stateless decompress to get uncompressed program output felts
-    uncompressed, header_off = _try_stateless_decompress_scan(felts, max_scan=16384, debug=debug)
+    with stage("stateless"):
+        uncompressed, header_off = _try_stateless_decompress_scan(felts, max_scan=16384, debug=debug)
+    counts["uncompressed"] = len(uncompressed)
     if debug:
         print(f"[stateless] header@{header_off}, uncompressed_len={len(uncompressed)}")
 
     # 4) Locate and parse state-diff from uncompressed output
     #    extract_state_diff may return (parsed, start, used)
     parsed: Dict
-    try:
-        parsed, start, used = extract_state_diff(uncompressed, debug=debug)  # type: ignore
-        if debug:
-            print(f"[po] state-diff@{start} used={used}")
-    except TypeError:
-        # older signature returning dict only
-        parsed = extract_state_diff(uncompressed, debug=debug)  # type: ignore
-
-    # 5) Flatten
-    resolver = StatefulIndexMap(stateful_db_file)
-    rows = _flatten_parsed(parsed, resolver)
+    with stage("state_diff"):
+        try:
+            parsed, start, used = extract_state_diff(uncompressed, debug=debug)  # type: ignore
+            if debug:
+                print(f"[po] state-diff@{start} used={used}")
+        except TypeError:
+            # older signature returning dict only
+            parsed = extract_state_diff(uncompressed, debug=debug)  # type: ignore
+    counts["contracts"] = len(parsed.get("contracts", []))
+
+    return parsed
+
+def decode_blob_bins_to_kv(
+    blobs: List[bytes],
+    stateful_db_file: str,
+    *,
+    debug: bool = False,
+    force_ifft: bool = False,  # placeholder
+    profile: Optional[DecodeProfile] = None,
+) -> List[Dict]:
+    """
+    Input: several blob binaries (same L1 tx/frame), index 0..k.
+    Output: flattened (addr,key,value,...) rows extracted from state-diff.
+    profile: a DecodeProfile to fill with per-stage timings and counts.
+    """
+    parsed = _decode_state_diff(blobs, debug=debug, profile=profile)
+    with _stages(profile)("flatten"):
+        rows = _flatten_parsed(parsed, _resolver_for(stateful_db_file))
+    if profile is not None:
+        profile.counts["rows"] = len(rows)
     return rows
 
+def decode_blob_bins_to_arrow(
+    blobs: List[bytes],
+    stateful_db_file: str,
+    *,
+    debug: bool = False,
+    profile: Optional[DecodeProfile] = None,
+):
+    """
+    Same decode as decode_blob_bins_to_kv, but the rows come back as one pyarrow
+    RecordBatch (kv_schema()): felts as fixed_size_binary(32), class_hash/nonce null
+    where the diff has none. No per-row dicts or decimal strings are built.
+    """
+    parsed = _decode_state_diff(blobs, debug=debug, profile=profile)
+    with _stages(profile)("flatten"):
+        batch = _entries_to_batch(_iter_entries(parsed, _resolver_for(stateful_db_file)))
+    if profile is not None:
+        profile.counts["rows"] = batch.num_rows
+    return batch
+
+# -------------------- Batch: many blob groups on a process pool --------------------
+
+class BlobGroup(NamedTuple):
+    """One L1 transaction's blobs, in blob-index order; each blob is a file path or raw bytes."""
+    eth_block: int
+    index: int                              # order of the group within eth_block
+    blobs: Sequence[Union[str, bytes]]
+
+class GroupResult(NamedTuple):
+    group: BlobGroup
+    rows: Any                               # List[Dict], or a pyarrow RecordBatch with arrow=True
+    error: Optional[str]                    # traceback text when the group failed to decode
+    seconds: float
+    cached: bool = False                    # served from the decode cache
+
+def _load_blob(b: Union[str, bytes]) -> bytes:
+    if isinstance(b, (bytes, bytearray, memoryview)):
+        return bytes(b)
+    if b.endswith(BLOB_SUFFIXES):
+        return read_blob(b)                 # blob_store object (compressed)
+    with open(b, "rb") as fp:
+        return fp.read()
+
+# Part of every decode-cache key: bump whenever the rows decoded from the same blobs change.
+DECODER_VERSION = 1
+
+def _decoder_id() -> str:
+    impl = "official" if _official_decompress else "minimal" if _minimal_decompress else "none"
+    return f"sn_pydecoder/{DECODER_VERSION}/{impl}"
+
+def group_cache_key(blobs: Sequence[Union[str, bytes]]) -> str:
+    """Content address of a group's decode: sha256 over the decoder id and each blob's sha256."""
+    return _blobs_cache_key([_load_blob(b) for b in blobs])
+
+def _blobs_cache_key(data: Sequence[bytes]) -> str:
+    h = hashlib.sha256(_decoder_id().encode())
+    for b in data:
+        h.update(hashlib.sha256(b).digest())
+    return h.hexdigest()
+
+def _decode_raw_batch(blobs: List[bytes], stateful_db_file: str, *, debug: bool = False):
+    """Unresolved entries as a kv_schema() batch: what the decode cache stores."""
+    return _entries_to_batch(_raw_entries(_decode_state_diff(blobs, debug=debug)))
+
+def _finish_raw(batch, stateful_db_file: str, arrow: bool):
+    entries = list(_resolve_entries(_batch_entries(batch), _resolver_for(stateful_db_file)))
+    return _entries_to_batch(entries) if arrow else _rows_from_entries(entries)
+
+def _init_decode_worker() -> None:
+    get_engine(BLOB_N, FR_MOD)              # build NTT tables once per worker process
+
+def _decode_group(blobs: Sequence[Union[str, bytes]], stateful_db_file: str,
+                  debug: bool, arrow: bool = False, raw: bool = False) -> Tuple[Any, Optional[str], float]:
+    t0 = time.perf_counter()
+    decode = _decode_raw_batch if raw else decode_blob_bins_to_arrow if arrow else decode_blob_bins_to_kv
+    try:
+        rows = decode([_load_blob(b) for b in blobs], stateful_db_file, debug=debug)
+        return rows, None, time.perf_counter() - t0
+    except Exception:
+        return (_entries_to_batch([]) if arrow else []), traceback.format_exc(), time.perf_counter() - t0
+
+def decode_blob_groups(
+    groups: Iterable[BlobGroup],
+    stateful_db_file: str,
+    *,
+    workers: Optional[int] = None,
+    debug: bool = False,
+    arrow: bool = False,
+    cache=None,
+    ordered: bool = False,
+) -> Iterator[GroupResult]:
+    """
+    Decode many blob groups on a process pool and yield one GroupResult per group,
+    in (eth_block, index) order, as soon as it and every group before it are done.
+    At most 2*workers groups are in flight, so memory stays flat on long backfills.
+    A group that fails to decode is reported through GroupResult.error, not raised.
+    workers=1 decodes in the calling process. arrow=True yields each group's rows as a
+    RecordBatch (see decode_blob_bins_to_arrow), which also pickles back far cheaper.
+
+    With a cache (sn_cache.DecodeCache), groups whose group_cache_key is stored skip
+    the decode entirely, and every newly decoded group is stored as soon as it is
+    done. The cache holds entries before idxmap resolution, so a grown stateful db
+    never invalidates it; resolution runs here, in the calling process.
+
+    ordered=True takes `groups` as already in (eth_block, index) order and pulls them
+    lazily, so a producer (e.g. a download still in progress) can feed the pool while
+    earlier groups decode; only the in-flight groups are held in memory.
+    """
+    source = iter(groups) if ordered else sorted(groups, key=lambda g: (g.eth_block, g.index))
+    workers = workers or os.cpu_count() or 1
+    raw = cache is not None
+
+    def lookup(g: BlobGroup) -> Tuple[Optional[str], Optional[GroupResult], Sequence[Union[str, bytes]]]:
+        """(cache key, cached result, blobs to decode on a miss): with a cache each blob is
+        read once here, and the worker decodes those bytes instead of reading it again."""
+        if cache is None:
+            return None, None, g.blobs
+        t0 = time.perf_counter()
+        data = [_load_blob(b) for b in g.blobs]
+        key = _blobs_cache_key(data)
+        hit = cache.get(key)
+        if hit is None:
+            return key, None, data
+        rows = _finish_raw(hit, stateful_db_file, arrow)
+        return key, GroupResult(g, rows, None, time.perf_counter() - t0, True), ()
+
+    def finish(g: BlobGroup, key: Optional[str], res: Tuple[Any, Optional[str], float]) -> GroupResult:
+        rows, err, secs = res
+        if not raw or err:
+            return GroupResult(g, rows, err, secs)
+        cache.put(key, rows)
+        return GroupResult(g, _finish_raw(rows, stateful_db_file, arrow), None, secs)
+
+    if workers == 1:
+        for g in source:
+            key, hit, blobs = lookup(g)
+            yield hit or finish(g, key, _decode_group(blobs, stateful_db_file, debug, arrow, raw))
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_decode_worker) as ex:
+        pending: deque = deque()
+        it = iter(source)
+        def submit():
+            g = next(it, None)
+            if g is not None:
+                key, hit, blobs = lookup(g)
+                fut = None if hit else ex.submit(_decode_group, blobs, stateful_db_file, debug, arrow, raw)
+                pending.append((g, key, hit, fut))
+        for _ in range(2 * workers):
+            submit()
+        while pending:
+            g, key, hit, fut = pending.popleft()
+            res = hit or finish(g, key, fut.result())
+            submit()
+            yield res
+
 # -------------------- Helper: files -> jsonl --------------------
 
 def decode_bin_files_to_json(
-    bin_paths: List[str],
+    bin_paths: Union[List[str], List[BlobGroup], List[List[str]]],
     stateful_db_file: str,
     out_jsonl: str,
     *,
     debug: bool = False,
     force_ifft: bool = False,
+    workers: Optional[int] = None,
+    cache=None,
 ) -> str:
-    blobs = [open(p, "rb").read() for p in bin_paths]
-    rows = decode_blob_bins_to_kv(
-        blobs,
-        stateful_db_file,
-        debug=debug,
-        force_ifft=force_ifft,
-    )
+    """
+    bin_paths is either one group's .bin paths (rows written as before) or a list of
+    groups (BlobGroup, or path lists taken as eth_block=0, index=i). Groups are decoded
+    with decode_blob_groups (through `cache` when given) and written as they complete,
+    each row tagged with its group's eth_block/group index; failed groups are reported
+    and skipped. force_ifft only applies to a single group's paths.
+    """
     os.makedirs(os.path.dirname(out_jsonl), exist_ok=True)
-    with open(out_jsonl, "w", encoding="utf-8") as fp:
-        for r in rows:
-            fp.write(json.dumps(r) + "\n")
+    if bin_paths and isinstance(bin_paths[0], str):
+        blobs = [open(p, "rb").read() for p in bin_paths]
+        rows = decode_blob_bins_to_kv(
+            blobs,
+            stateful_db_file,
+            debug=debug,
+            force_ifft=force_ifft,
+        )
+        with open(out_jsonl, "w", encoding="utf-8") as fp:
+            for r in rows:
+                fp.write(json.dumps(r) + "\n")
+        return os.path.abspath(out_jsonl)
+
+    if force_ifft:
+        raise ValueError("force_ifft is only supported for a single group's .bin paths, not for group lists")
+    groups = [g if isinstance(g, BlobGroup) else BlobGroup(0, i, list(g)) for i, g in enumerate(bin_paths)]
+    tmp = out_jsonl + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        for res in decode_blob_groups(groups, stateful_db_file, workers=workers, debug=debug, cache=cache):
+            if res.error:
+                print(f"[decode] group eth_block={res.group.eth_block} index={res.group.index} failed:\n{res.error}")
+                continue
+            for r in res.rows:
+                fp.write(json.dumps({"eth_block": res.group.eth_block, "group": res.group.index, **r}) + "\n")
+    os.replace(tmp, out_jsonl)
+    if cache is not None:
+        print(f"[decode] cache {cache.stats()}")
     return os.path.abspath(out_jsonl)
+
+# -------------------- Helper: files -> Parquet / Arrow IPC --------------------
+
+def _as_groups(bin_paths) -> List[BlobGroup]:
+    if bin_paths and isinstance(bin_paths[0], str):
+        return [BlobGroup(0, 0, list(bin_paths))]
+    return [g if isinstance(g, BlobGroup) else BlobGroup(0, i, list(g)) for i, g in enumerate(bin_paths)]
+
+def decode_bin_files_to_arrow(
+    bin_paths: Union[List[str], List[BlobGroup], List[List[str]]],
+    stateful_db_file: str,
+    out_path: str,
+    *,
+    fmt: Optional[str] = None,
+    debug: bool = False,
+    workers: Optional[int] = None,
+    compression: str = "zstd",
+    cache=None,
+) -> str:
+    """
+    Columnar counterpart of decode_bin_files_to_json: groups are decoded straight to
+    RecordBatches (kv_schema(tagged=True)) and streamed into one Parquet file
+    (fmt="parquet", one row group per decoded group) or Arrow IPC file (fmt="arrow"),
+    inferred from out_path's extension when fmt is None. Written to a tmp file and
+    renamed, so readers never see a partial file; the tmp file is removed if the decode
+    or the write raises. `cache` as in decode_blob_groups.
+    """
+    import pyarrow as pa
+    fmt = fmt or ("arrow" if out_path.endswith((".arrow", ".ipc", ".feather")) else "parquet")
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"unknown output format {fmt!r} (parquet|arrow)")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    schema = kv_schema(tagged=True)
+    tmp = out_path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(tmp, schema, compression=compression)
+    else:
+        writer = pa.ipc.new_file(tmp, schema)
+    try:
+        try:
+            for res in decode_blob_groups(_as_groups(bin_paths), stateful_db_file, workers=workers,
+                                          debug=debug, arrow=True, cache=cache):
+                if res.error:
+                    print(f"[decode] group eth_block={res.group.eth_block} index={res.group.index} failed:\n{res.error}")
+                    continue
+                if res.rows.num_rows:
+                    writer.write_batch(_tag_batch(res.rows, res.group.eth_block, res.group.index))
+        finally:
+            writer.close()
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, out_path)
+    if cache is not None:
+        print(f"[decode] cache {cache.stats()}")
+    return os.path.abspath(out_path)
@@ -0,0 +1,243 @@
+from __future__ import annotations
+import hashlib, importlib.util, os, threading, time
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from harborx.blobscan import INGEST_TOOL, _complete_entries, _rows_to_state_diff, _write_txt
+from harborx.pipeline import Pipeline, Stage
+from harborx.sn_pydecoder import BlobGroup, _decode_group, _finish_raw, _init_decode_worker, group_cache_key
+
+# In-memory Starknet pipeline: blobs are fetched into memory, each group goes to
+# sn_pydecoder as soon as its blobs arrive and its rows are written straight into the
+# lake's Parquet tables, the three steps running as overlapping pipeline.Pipeline
+# stages with bounded queues between them. Nothing is spooled to raw .txt files, no
+# decoder manifest or starknet-scrape process is involved, and no JSON is written and
+# parsed back. The tables are the ones tools/ingest_decoded_json.py writes, built with
+# its own extract_frames / safe_write_parquet, so a lake fed either way reads the same.
+# The writer flushes every flush_rows rows and each flush is reported through on_flush,
+# so a follower checkpoints its cursor as the files land: a crash loses at most the
+# unflushed groups, and those are not reported as done.
+
+FLUSH_ROWS = 250_000                    # rows buffered by LakeWriter before it writes a file set
+
+_tool = None
+
+def _ingest_tool():
+    """tools/ingest_decoded_json.py, loaded as a module (it is a script, not part of the package)."""
+    global _tool
+    if _tool is None:
+        spec = importlib.util.spec_from_file_location("_harborx_ingest_decoded_json", INGEST_TOOL)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        _tool = mod
+    return _tool
+
+def write_manifest(lake: str) -> None:
+    """The lake's primary manifest (<lake>/../manifest.json), as the ingest tool writes it."""
+    lake_p = Path(lake)
+    _ingest_tool().write_primary_manifest(lake_p, lake_p.parent / "manifest.json")
+
+class LakeWriter:
+    """
+    add() decoded groups, then flush() writes them as one file per non-empty table,
+    <lake>/<table>/sn-<first_block>-<last_block>-<sha1[:8]>.parquet, and refreshes the
+    manifest. add() flushes by itself once flush_rows rows are buffered (0: only on
+    flush()); `buffered` is the row count not yet written, `peak` its high-water mark.
+    Rows carry src=<eth_block>-<index>.json, the file the JSON path would have produced
+    for the group. The digest covers the data, so a flush repeated with the same groups
+    gets the same name and overwrites the earlier file, but groups flushed again in a
+    different batch are written twice: stream_entries reports every flush (on_flush) so
+    callers checkpoint past the flushed groups instead of re-reading them.
+    """
+
+    def __init__(self, lake: str, cluster: bool = False, flush_rows: int = FLUSH_ROWS):
+        self.lake, self.cluster, self.flush_rows = lake, cluster, max(0, flush_rows)
+        self._frames: Dict[str, list] = defaultdict(list)
+        self._blocks: List[int] = []
+        self.rows, self.buffered, self.peak, self.files = 0, 0, 0, []
+
+    def add(self, eth_block: int, index: int, rows: List[Dict]) -> List[str]:
+        """Buffer one group's rows; returns the files written if this filled the buffer."""
+        frames = _ingest_tool().extract_frames([_rows_to_state_diff(rows)], f"{eth_block}-{index}.json")
+        for t, df in frames.items():
+            if not df.empty:
+                self._frames[t].append(df)
+        self._blocks.append(eth_block)
+        self.rows += len(rows)
+        self.buffered += len(rows)
+        self.peak = max(self.peak, self.buffered)
+        return self.flush() if self.flush_rows and self.buffered >= self.flush_rows else []
+
+    def flush(self) -> List[str]:
+        import pandas as pd
+        tool = _ingest_tool()
+        tables = {t: pd.concat(dfs, ignore_index=True) for t, dfs in self._frames.items()}
+        written = []
+        if tables:
+            h = hashlib.sha1()
+            for t in sorted(tables):
+                h.update(t.encode())
+                h.update(pd.util.hash_pandas_object(tables[t], index=False).values.tobytes())
+            name = f"sn-{min(self._blocks)}-{max(self._blocks)}-{h.hexdigest()[:8]}.parquet"
+            for t, df in tables.items():
+                cluster_by = tool.CLUSTER_KEYS.get(t, ()) if self.cluster else ()
+                tool.safe_write_parquet(df, Path(self.lake) / t, name, cluster_by)
+                written.append(os.path.join(self.lake, t, name))
+            write_manifest(self.lake)
+        self._frames.clear()
+        self._blocks = []
+        self.buffered = 0
+        self.files += written
+        return written
+
+class _Work(NamedTuple):
+    """A group on its way through the stream pipeline."""
+    entries: list                           # its _api_entry tuples, in blob-index order
+    group: Optional[BlobGroup] = None       # blobs as bytes, once fetched
+    key: Optional[str] = None               # decode-cache key
+    rows: Any = None                        # decoded (unresolved with a cache) entries
+    error: Optional[str] = None
+    seconds: float = 0.0
+    cached: bool = False
+    failed: bool = False                    # a blob could not be fetched
+
+def _decode_work(w: _Work, stateful_db: str, debug: bool, raw: bool) -> _Work:
+    rows, err, secs = _decode_group(w.group.blobs, stateful_db, debug, False, raw)
+    return w._replace(rows=rows, error=err, seconds=secs)
+
+def stream_entries(api_entries: List[Tuple[int, str, int, int, Optional[str]]], lake: str, *, chain_id: int = 1,
+                   raw_dir: str = "", blob_store: str = "", stateful_db: str = "", decode_workers: int = 0, decode_cache: str = "",
+                   decode_cache_mb: int = 2048, fetch_workers: int = 8, fetch_per_host: int = 4,
+                   fetch_retries: int = 4, queue_size: int = 0, cluster: bool = False, flush_rows: int = FLUSH_ROWS,
+                   on_flush: Optional[Callable[[list], None]] = None,
+                   debug: bool = False) -> List[Tuple[int, str, int, int, Optional[str]]]:
+    """
+    Fetch, decode and write the complete groups among _api_entry tuples into `lake`, as
+    a pipeline.Pipeline: fetch (fetch_workers threads) -> decode (decode_workers
+    processes) -> write (one thread, in block order), with queue_size groups at most
+    between stages. raw_dir also keeps every blob on disk (the download_entries layout);
+    with blob_store (blob_store.BlobStore), blobs indexed there are read from it instead
+    of fetched and fetched ones are added to it. Tables are written every flush_rows rows
+    (LakeWriter), and after each write on_flush gets the entries of the groups now on
+    disk, in block order, up to the first group that failed. Returns the entries of the
+    groups that were fetched, decoded and written; a group that fails to decode is
+    reported and skipped, as in run_python_decoder, and is not among them.
+    """
+    from harborx.fetch import BlobFetcher, FetchJob
+    from harborx.sn_cache import DecodeCache
+    from harborx.blob_store import BlobStore
+
+    ready, _ = _complete_entries([e for e in api_entries if e[4]])
+    ready.sort(key=lambda e: (e[0], e[1], e[2]))
+    members: Dict[Tuple[int, str], list] = defaultdict(list)
+    for e in ready:
+        members[(e[0], e[1])].append(e)
+    gidx, per_block = {}, defaultdict(int)
+    for key in sorted(members):
+        gidx[key] = per_block[key[0]]
+        per_block[key[0]] += 1
+    store = BlobStore(blob_store) if blob_store else None
+    known = {}
+    if store is not None:
+        for e in ready:
+            digest = store.lookup(e[0], e[1], e[2])
+            if digest:
+                known[e[:3]] = digest
+        if known:
+            print(f"[sn] {len(known)} blob(s) already in the blob store, not fetched")
+    cache = DecodeCache(decode_cache, max_bytes=decode_cache_mb << 20) if decode_cache else None
+    cache_lock = threading.Lock()           # DecodeCache keeps an unlocked size index
+    writer = LakeWriter(lake, cluster=cluster, flush_rows=flush_rows)
+    fetched: List[Tuple[int, str, int, int, Optional[str]]] = []
+    unflushed: list = []                    # entries of groups added but not yet flushed
+    pending: list = []                      # ... of those, the ones before any failed group
+    broken = False
+
+    def flushed() -> None:
+        fetched.extend(unflushed)
+        unflushed.clear()
+        if on_flush is not None and pending:
+            on_flush(list(pending))
+        pending.clear()
+
+    def fetch(w: _Work) -> _Work:
+        blobs = []
+        for e in w.entries:
+            if e[:3] in known:
+                blobs.append(store.get(known[e[:3]]))
+                continue
+            res = fetcher.fetch_one(FetchJob(e[4]))
+            if not res.ok:
+                print(f"[sn] fetch failed after {res.attempts} attempt(s) (block={e[0]}, index={e[2]}): {res.error}")
+                return w._replace(failed=True)
+            if raw_dir:
+                _write_txt(raw_dir, chain_id, e[0], e[2], res.data, e[3], e[1])
+            if store is not None:
+                store.add(e[0], e[1], e[2], res.data)
+            blobs.append(res.data)
+        e = w.entries[0]
+        w = w._replace(group=BlobGroup(e[0], gidx[(e[0], e[1])], blobs))
+        if cache is None:
+            return w
+        t0 = time.perf_counter()
+        key = group_cache_key(blobs)
+        with cache_lock:
+            hit = cache.get(key)
+        return w._replace(key=key, rows=hit, cached=hit is not None, seconds=time.perf_counter() - t0)
+
+    def write(w: _Work) -> _Work:
+        nonlocal broken
+        if w.failed:
+            broken = True
+            return w
+        g = w.group
+        if w.error:
+            print(f"[sn] decode failed for eth_block={g.eth_block} index={g.index}:\n{w.error}")
+            broken = True
+            return w
+        rows = w.rows
+        if cache is not None:
+            if not w.cached:
+                with cache_lock:
+                    cache.put(w.key, rows)
+            rows = _finish_raw(rows, stateful_db, False)
+        writer.add(g.eth_block, g.index, rows)
+        unflushed.extend(w.entries)
+        if not broken:
+            pending.extend(w.entries)
+        if not writer.buffered:
+            flushed()
+        if debug:
+            how = "cached" if w.cached else "decoded"
+            print(f"[sn] {how} eth_block={g.eth_block} index={g.index}: {len(rows)} row(s) in {w.seconds:.2f}s")
+        return w
+
+    pipe = Pipeline([
+        Stage("fetch", fetch, workers=fetch_workers),
+        Stage("decode", partial(_decode_work, stateful_db=stateful_db, debug=debug, raw=cache is not None),
+              workers=decode_workers or os.cpu_count() or 1, kind="process",
+              when=lambda w: not (w.failed or w.cached), initializer=_init_decode_worker),
+        Stage("write", write, ordered=True),
+    ], queue_size=queue_size)
+    t0 = time.perf_counter()
+    with BlobFetcher(workers=fetch_workers, per_host=fetch_per_host, retries=fetch_retries) as fetcher:
+        for _ in pipe.run(_Work(members[key]) for key in sorted(members)):
+            pass
+        writer.flush()
+        flushed()
+        dt = time.perf_counter() - t0
+        if ready:
+            print(f"[sn] streamed {len(fetched)} blob(s), {writer.rows} row(s) -> {len(writer.files)} table file(s) "
+                  f"under {lake} in {dt:.2f}s ({len(fetched) / dt if dt else 0:.1f} blobs/s; fetch {fetcher.stats()})")
+            for line in pipe.report():
+                print(f"[sn] stage {line}")
+            print(f"[sn] slowest stage: {pipe.bottleneck()}; write buffer max {writer.peak} row(s) "
+                  f"(flush every {writer.flush_rows})")
+    if cache is not None:
+        print(f"[sn] decode cache {cache.stats()}")
+    if store is not None:
+        print(f"[sn] blob store {store.stats()}")
+        store.close()
+    return fetched
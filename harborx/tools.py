@@ -2,11 +2,33 @@
 from __future__ import annotations
 import argparse, os, json
 
-def build_manifest(root:str="apps/web", data:str="data", include_parquet:bool=False):
+def _manifest_stats(data_dir:str, data:str):
+    """Per-file rows and min/max ranges from the statistics catalog, keyed like the manifest entries."""
+    try:
+        from harborx.catalog import Catalog, STAT_COLS
+    except ImportError:  # run as a script from harborx/
+        from catalog import Catalog, STAT_COLS
+    with Catalog(data_dir) as cat:
+        cat.refresh()
+        entries = cat.entries()
+    out = {}
+    for e in entries:
+        st = {"rows": e["rows"], "bytes": e["bytes"]}
+        for c in STAT_COLS:
+            lo, hi = e[f"{c}_min"], e[f"{c}_max"]
+            if lo is None:
+                continue
+            st[c] = ["0x" + v.hex() if isinstance(v, bytes) else v for v in (lo, hi)]
+        out[f"{data}/{e['path']}"] = st
+    return out
+
+def build_manifest(root:str="apps/web", data:str="data", include_parquet:bool=False, stats:bool=False):
     """
     Scan the web data directory and produce a simple manifest.json.
     - Always collects Arrow/IPC/Feather files into `arrow`.
     - If include_parquet=True, also collects `.parquet` into `parquet`.
+    - If stats=True, adds `stats`: {file: {rows, bytes, key/timestamp/blob_index/position: [min, max]}}
+      from data/_catalog.sqlite, so readers can skip files without fetching them.
     """
     # Lazy import to keep base install light
     import pyarrow as pa  # noqa: F401
@@ -27,6 +49,9 @@ def build_manifest(root:str="apps/web", data:str="data", include_parquet:bool=Fa
     manifest = {"arrow": sorted(arrow)}
     if include_parquet:
         manifest["parquet"] = sorted(parquet)
+    if stats:
+        listed = set(arrow) | set(parquet)
+        manifest["stats"] = {f: st for f, st in _manifest_stats(data_dir, data).items() if f in listed}
     with open(os.path.join(data_dir,"manifest.json"),"w",encoding="utf-8") as fp:
         json.dump(manifest, fp, indent=2)
     print(f"[manifest] wrote {len(arrow)} arrow file(s){' and '+str(len(parquet))+' parquet file(s)' if include_parquet else ''} at {data_dir}")
@@ -36,5 +61,6 @@ if __name__ == "__main__":
     ap.add_argument("--root", default="apps/web")
     ap.add_argument("--data", default="data")
     ap.add_argument("--include-parquet", action="store_true")
+    ap.add_argument("--stats", action="store_true", help="embed per-file min/max stats from the catalog")
     args = ap.parse_args()
-    build_manifest(root=args.root, data=args.data, include_parquet=args.include_parquet)
+    build_manifest(root=args.root, data=args.data, include_parquet=args.include_parquet, stats=args.stats)
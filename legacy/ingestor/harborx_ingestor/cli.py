@@ -1,7 +1,8 @@
 from __future__ import annotations
-import argparse, os, sys, subprocess
+import argparse, json, os, sys, subprocess
 from pathlib import Path
 from .ingest import ingest_folder
+from .scan import SCAN_CACHE_NAME, BlobIndex, select_window
 
 def make_demo(out:str, rows:int, parts:int, seed:int):
     repo  = Path(__file__).resolve().parents[4]  # repo root
@@ -22,17 +23,56 @@ def main():
     s0.add_argument("--parts", type=int, default=1)
     s0.add_argument("--seed", type=int, default=42)
 
-    s1 = sub.add_parser("ingest", help="Ingest .blob.gz folder → Parquet dataset")
+    s1 = sub.add_parser("ingest", help="Ingest .blob.gz folder → Parquet dataset (+ Arrow / SQLite in the same pass)")
     s1.add_argument("--source", required=True)
     s1.add_argument("--chain", type=int, required=True)
-    s1.add_argument("--out", required=True)
-    s1.add_argument("--row-group", type=int, default=8192)
+    s1.add_argument("--out", help="Parquet dataset root (hive-partitioned)")
+    s1.add_argument("--row-group", type=int, default=8192, help="rows per Parquet row group (and parse chunk)")
+    s1.add_argument("--file-mb", type=int, default=256, help="roll to a new Parquet file past this size")
+    s1.add_argument("--arrow-dir", help="also write one Arrow IPC file per blob here")
+    s1.add_argument("--sqlite", help="also load rows into the `state` table of this SQLite db")
+    s1.add_argument("--sqlite-mode", choices=["append","upsert"], default="append")
+    s1.add_argument("--sqlite-reset", action="store_true", help="delete the SQLite db first")
+    s1.add_argument("--queue", type=int, default=8, help="bounded batches queued per sink")
+    s1.add_argument("--workers", type=int, default=1, help="ingest blobs on N processes (Parquet/Arrow outputs)")
+    s1.add_argument("--ledger", help="blob ledger path (default: <out>/_ingest_ledger.json)")
+    s1.add_argument("--no-resume", dest="resume", action="store_false", help="re-ingest blobs already in the ledger")
+    s1.add_argument("--cluster", action="store_true",
+                    help="sort files by (key, blob_index, position) with page indexes and key/address bloom filters")
+    s1.add_argument("--no-catalog", dest="catalog", action="store_false",
+                    help="do not maintain <out>/_catalog.sqlite (skipped with a warning when harborx is not installed)")
+
+    s2 = sub.add_parser("scan", help="Index .blob.gz headers (batch_id, timestamp, rows) without decoding payloads")
+    s2.add_argument("--source", required=True)
+    s2.add_argument("--cache", help=f"header cache (default: <source>/{SCAN_CACHE_NAME}; 'none' to disable)")
+    s2.add_argument("--workers", type=int, default=16)
+    s2.add_argument("--batch-from", type=int)
+    s2.add_argument("--batch-to", type=int)
+    s2.add_argument("--ts-from", type=int)
+    s2.add_argument("--ts-to", type=int)
+    s2.add_argument("--json", action="store_true", help="print one JSON object per blob")
 
     args = ap.parse_args()
-    if args.cmd == "make-demo":
+    if args.cmd == "scan":
+        cache = None if args.cache == "none" else (args.cache or os.path.join(args.source, SCAN_CACHE_NAME))
+        idx = BlobIndex(cache, args.workers)
+        infos = select_window(idx.scan(args.source), batch_from=args.batch_from, batch_to=args.batch_to,
+                              ts_from=args.ts_from, ts_to=args.ts_to)
+        for i in infos:
+            if args.json:
+                print(json.dumps(i._asdict()))
+            else:
+                print(f"{i.path}\tbatch={i.batch_id}\tts={i.timestamp}\tn={i.n}\tcsize={i.csize}")
+        print(f"[scan] {len(infos)} blob(s), {sum(i.n for i in infos):,} rows "
+              f"(header cache: {idx.hits} hit(s), {idx.misses} read)", file=sys.stderr)
+    elif args.cmd == "make-demo":
         make_demo(args.out, args.rows, args.parts, args.seed)
     elif args.cmd == "ingest":
-        ingest_folder(args.source, args.out, args.chain, max_row_group=args.row_group)
+        ingest_folder(args.source, args.out, args.chain, max_row_group=args.row_group,
+                      arrow_dir=args.arrow_dir, sqlite_db=args.sqlite, sqlite_mode=args.sqlite_mode,
+                      sqlite_reset=args.sqlite_reset, queue_size=args.queue,
+                      max_file_bytes=args.file_mb << 20, workers=args.workers,
+                      ledger_path=args.ledger, resume=args.resume, cluster=args.cluster, catalog=args.catalog)
 
 if __name__ == "__main__":
     main()
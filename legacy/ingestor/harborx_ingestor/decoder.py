@@ -1,6 +1,11 @@
 from __future__ import annotations
-import gzip
+import gzip, os, struct, zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
 
 ADDR_T = pa.binary(20)
 HASH_T = pa.binary(32)
@@ -16,38 +21,146 @@ SCHEMA = pa.schema([
     ("timestamp", pa.uint64()),
 ])
 
-def parse_blob(path: str, chunk: int = 200_000):
+REC_LEN = 126
+HEADER_LEN = 26
+INDEX_MAGIC = b"ZKBI"
+TRAILER_LEN = 42            # empty gzip member carrying the "ZI" index locator in FEXTRA
+_INDEX_ENTRY = struct.Struct(">QIQI32s32s")
+
+class BlobHeader(NamedTuple):
+    version: int
+    flags: int
+    batch_id: int
+    timestamp: int
+    n: int
+    rec_len: int
+
+class BlockInfo(NamedTuple):
+    offset: int             # file offset of the block's gzip member
+    csize: int              # compressed size in bytes
+    row_start: int
+    rows: int
+    min_key: bytes
+    max_key: bytes
+
+# On-disk record layout (big-endian ints), viewed in place over the decompressed buffer.
+REC_DTYPE = np.dtype([
+    ("rtype", "u1"), ("pad", "u1"),
+    ("address", "V20"), ("key", "V32"), ("value", "V32"), ("tx_hash", "V32"),
+    ("blob_index", ">u4"), ("position", ">u4"),
+])
+assert REC_DTYPE.itemsize == REC_LEN
+
+_TYPE_NAMES = pa.array(["state_diff", "tx"], type=pa.string())
+
+def _fixed_binary(field: np.ndarray, typ: pa.DataType) -> pa.Array:
+    # one contiguous copy of the strided field, then wrap it as the values buffer
+    buf = np.ascontiguousarray(field).view(np.uint8)
+    return pa.FixedSizeBinaryArray.from_buffers(typ, len(field), [None, pa.py_buffer(buf)])
+
+def records_to_batch(buf, ts: int) -> pa.RecordBatch:
+    """Split a buffer of whole 126-byte records into a SCHEMA RecordBatch."""
+    rec = np.frombuffer(buf, dtype=REC_DTYPE)
+    m = len(rec)
+    return pa.record_batch([
+        pc.take(_TYPE_NAMES, pa.array((rec["rtype"] != 2).astype(np.int8))),
+        _fixed_binary(rec["address"], ADDR_T),
+        _fixed_binary(rec["key"], HASH_T),
+        _fixed_binary(rec["value"], HASH_T),
+        _fixed_binary(rec["tx_hash"], HASH_T),
+        pa.array(rec["blob_index"].astype(np.uint32)),
+        pa.array(rec["position"].astype(np.uint32)),
+        pa.array(np.full(m, ts, dtype=np.uint64)),
+    ], schema=SCHEMA)
+
+def _parse_header(raw: bytes) -> BlobHeader:
+    if raw[:4] != b"ZKBL":
+        raise ValueError("Bad magic")
+    if len(raw) < HEADER_LEN:
+        raise ValueError("Truncated header")
+    hdr = BlobHeader(*struct.unpack(">HHIQIH", raw[4:HEADER_LEN]))
+    if hdr.rec_len != REC_LEN:
+        raise ValueError(f"Unexpected rec_len {hdr.rec_len}")
+    return hdr
+
+def _read_header(gz) -> BlobHeader:
+    return _parse_header(gz.read(HEADER_LEN))
+
+def read_header(path: str) -> BlobHeader:
+    """Decode only the 26 header bytes: inflates the first few KiB of the file, never the payload."""
+    d = zlib.decompressobj(31)
+    raw = b""
+    with open(path, "rb") as f:
+        while len(raw) < HEADER_LEN and not d.eof:
+            data = d.unconsumed_tail or f.read(4096)
+            if not data:
+                break
+            raw += d.decompress(data, HEADER_LEN - len(raw))
+    return _parse_header(raw)
+
+def read_block_index(path: str) -> list:
+    """Return the BlockInfo footer index of a v2 blob."""
+    with open(path, "rb") as f:
+        f.seek(-TRAILER_LEN, os.SEEK_END)
+        tr = f.read(TRAILER_LEN)
+        if tr[:4] != b"\x1f\x8b\x08\x04" or tr[12:14] != b"ZI":
+            raise ValueError(f"{path}: missing v2 block index trailer")
+        index_off, index_len = struct.unpack(">QQ", tr[16:32])
+        f.seek(index_off)
+        raw = zlib.decompress(f.read(index_len), 31)
+    if raw[:4] != INDEX_MAGIC:
+        raise ValueError(f"{path}: bad block index magic")
+    (count,) = struct.unpack(">I", raw[4:8])
+    return [BlockInfo(*e) for e in _INDEX_ENTRY.iter_unpack(raw[8:8 + count * _INDEX_ENTRY.size])]
+
+def _decode_block(path: str, blk: BlockInfo, lo: int, hi: int, ts: int) -> pa.RecordBatch:
+    with open(path, "rb") as f:
+        f.seek(blk.offset)
+        buf = zlib.decompress(f.read(blk.csize), 31)
+    if len(buf) != blk.rows * REC_LEN:
+        raise ValueError(f"{path}: block @{blk.offset} holds {len(buf)} bytes, expected {blk.rows * REC_LEN}")
+    return records_to_batch(memoryview(buf)[lo * REC_LEN:hi * REC_LEN], ts)
+
+def _parse_blocks(path: str, hdr: BlobHeader, start: int, stop: int, chunk: int, workers: Optional[int]):
+    blocks = [b for b in read_block_index(path) if b.row_start < stop and b.row_start + b.rows > start]
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        it = iter(blocks)
+        def submit():
+            blk = next(it, None)
+            if blk is not None:
+                lo = max(start - blk.row_start, 0)
+                hi = min(stop - blk.row_start, blk.rows)
+                pending.append(ex.submit(_decode_block, path, blk, lo, hi, hdr.timestamp))
+        for _ in range(2 * workers):    # bounded read-ahead keeps memory flat
+            submit()
+        while pending:
+            batch = pending.popleft().result()
+            submit()
+            for off in range(0, batch.num_rows, chunk):
+                yield batch.slice(off, chunk)
+
+def parse_blob(path: str, chunk: int = 200_000, *, rows: Optional[Tuple[int, int]] = None,
+               workers: Optional[int] = None):
+    """
+    Yield SCHEMA RecordBatches of at most `chunk` rows.
+    - rows=(start, stop) restricts output to that half-open record range.
+    - v2 (block-indexed) blobs are decoded block-parallel on `workers` threads
+      and seek straight to the blocks covering `rows`; v1 blobs are read serially.
+    """
     with gzip.open(path, "rb") as gz:
-        if gz.read(4) != b"ZKBL":
-            raise ValueError("Bad magic")
-        gz.read(2); gz.read(2)      # version, flags
-        gz.read(4)                  # batch id
-        ts = int.from_bytes(gz.read(8), "big")
-        n  = int.from_bytes(gz.read(4), "big")
-        rec_len = int.from_bytes(gz.read(2), "big")
-        if rec_len != 126:
-            raise ValueError(f"Unexpected rec_len {rec_len}")
-        for off in range(0, n, chunk):
-            m = min(chunk, n-off)
-            typ, addr, key, val, txh, bidx, pos, ts_list = [], [], [], [], [], [], [], []
-            for _ in range(m):
-                rtype = gz.read(1)[0]; gz.read(1)  # pad
-                address = gz.read(20)
-                k = gz.read(32)
-                v = gz.read(32)
-                th = gz.read(32)
-                blob_index = int.from_bytes(gz.read(4), "big")
-                p = int.from_bytes(gz.read(4), "big")
-                typ.append("state_diff" if rtype==2 else "tx")
-                addr.append(address); key.append(k); val.append(v); txh.append(th)
-                bidx.append(blob_index); pos.append(p); ts_list.append(ts)
-            yield pa.record_batch({
-                "type": pa.array(typ, type=pa.string()),
-                "address": pa.array(addr, type=pa.binary(20)),
-                "key": pa.array(key, type=pa.binary(32)),
-                "value": pa.array(val, type=pa.binary(32)),
-                "tx_hash": pa.array(txh, type=pa.binary(32)),
-                "blob_index": pa.array(bidx, type=pa.uint32()),
-                "position": pa.array(pos, type=pa.uint32()),
-                "timestamp": pa.array(ts_list, type=pa.uint64()),
-            }, schema=SCHEMA)
+        hdr = _read_header(gz)
+        start, stop = rows if rows is not None else (0, hdr.n)
+        start, stop = max(start, 0), min(stop, hdr.n)
+        if hdr.version < 2:
+            if start:
+                gz.seek(HEADER_LEN + start * REC_LEN)
+            for off in range(start, stop, chunk):
+                m = min(chunk, stop-off)
+                buf = gz.read(m * REC_LEN)
+                if len(buf) != m * REC_LEN:
+                    raise ValueError(f"Truncated blob: expected {hdr.n} records, got {off + len(buf)//REC_LEN}")
+                yield records_to_batch(buf, hdr.timestamp)
+            return
+    yield from _parse_blocks(path, hdr, start, stop, chunk, workers)
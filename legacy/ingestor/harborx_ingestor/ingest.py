@@ -1,44 +1,191 @@
 from __future__ import annotations
-import os
-import pyarrow as pa
-import pyarrow.parquet as pq
-from datetime import datetime
+import os, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from .decoder import parse_blob
-import pyarrow as pa
-import pyarrow.compute as pc
-
-def _add_partition_columns(batch: pa.RecordBatch, chain_id: int):
-    ts_i64 = pc.cast(batch.column("timestamp"), pa.int64())
-
-    days = pc.floor(pc.divide(ts_i64, pa.scalar(86400, type=pa.int64())))
-    date_part = pc.cast(days, pa.int32()) 
-
-    chain_ids = pa.array([int(chain_id)] * batch.num_rows, type=pa.int64())
-    topic_arr = batch.column("type")
-
-    cols   = list(batch.schema.names) + ["chain_id", "date", "topic"]
-    arrays = list(batch.columns)       + [chain_ids, date_part, topic_arr]
-    return pa.RecordBatch.from_arrays(arrays, names=cols)
-
-def ingest_blob_to_dataset(blob_path: str, out_dir: str, chain_id: int, max_row_group:int=8192):
-    os.makedirs(out_dir, exist_ok=True)
-    for batch in parse_blob(blob_path, chunk=max_row_group):
-        b = _add_partition_columns(batch, chain_id)
-        table = pa.Table.from_batches([b])
-        pq.write_to_dataset(
-            table,
-            root_path=out_dir,
-            partition_cols=["chain_id","date","topic"],
-            use_dictionary=True,
-            compression="zstd",
-        )
-
-def ingest_folder(source_dir: str, out_dir: str, chain_id: int, max_row_group:int=8192):
+from .ledger import LEDGER_NAME, BlobLedger, blob_digest, output_basename
+from .scan import SCAN_CACHE_NAME, scan_blobs
+from .sinks import ArrowIPCSink, FanOut, ParquetDatasetSink, SQLiteSink
+
+def ingest_blob_to_dataset(blob_path: str, out_dir: str, chain_id: int, max_row_group:int=8192,
+                           max_file_bytes: int = 256 << 20, cluster: bool = False):
+    with FanOut([ParquetDatasetSink(out_dir, chain_id, max_row_group, max_file_bytes, cluster=cluster)]) as fan:
+        fan.ingest(blob_path, parse_blob(blob_path, chunk=max_row_group))
+
+def make_sinks(out_dir: str | None, chain_id: int, arrow_dir: str | None = None,
+               sqlite_db: str | None = None, sqlite_mode: str = "append", sqlite_reset: bool = False,
+               max_row_group: int = 8192, max_file_bytes: int = 256 << 20, per_blob: bool = False,
+               cluster: bool = False, resume: bool = True):
+    sinks = []
+    if out_dir:
+        sinks.append(ParquetDatasetSink(out_dir, chain_id, max_row_group, max_file_bytes,
+                                        per_blob=per_blob, cluster=cluster))
+    if arrow_dir:
+        sinks.append(ArrowIPCSink(arrow_dir))
+    if sqlite_db:
+        sinks.append(SQLiteSink(sqlite_db, mode=sqlite_mode, reset=sqlite_reset, resume=resume))
+    if not sinks:
+        raise SystemExit("[ingest] no output selected (need --out, --arrow-dir and/or --sqlite)")
+    return sinks
+
+def _counted(batches, counter: list):
+    for b in batches:
+        counter[0] += b.num_rows
+        yield b
+
+def _ingest_one(path: str, key: str, out_dir: str | None, chain_id: int, max_row_group: int,
+                max_file_bytes: int, arrow_dir: str | None, cluster: bool = False):
+    """Pool task: ingest one blob under a deterministic key; returns (rows, output files)."""
+    sinks = make_sinks(out_dir, chain_id, arrow_dir, max_row_group=max_row_group,
+                       max_file_bytes=max_file_bytes, per_blob=True, cluster=cluster)
+    rows = [0]
+    with FanOut(sinks) as fan:
+        ticket = fan.ingest(path, _counted(parse_blob(path, chunk=max_row_group), rows), key=key)
+    return rows[0], ticket.files
+
+def _remove_outputs(files) -> int:
+    n = 0
+    for f in files:
+        if os.path.exists(f):
+            os.remove(f); n += 1
+    return n
+
+def _remove_partial_outputs(root: str | None, keys) -> int:
+    """Delete files left by an interrupted run for blobs the ledger never committed (walks `root`)."""
+    if not root or not os.path.isdir(root) or not keys:
+        return 0
+    prefixes = tuple(f"{k}-" for k in keys)
+    n = 0
+    for base, _, files in os.walk(root):
+        for f in files:
+            if f.startswith(prefixes):
+                os.remove(os.path.join(base, f)); n += 1
+    return n
+
+def _catalog_cls():
+    """harborx.catalog.Catalog, or None with a warning: the standalone ingestor works without harborx."""
+    try:
+        from harborx.catalog import Catalog
+    except ImportError as e:
+        print(f"[ingest] warning: no statistics catalog, harborx.catalog is not importable ({e}); "
+              "install the harborx package, or pass --no-catalog to silence this")
+        return None
+    return Catalog
+
+def _update_catalogs(*roots):
+    """Bring each output root's statistics sidecar (harborx.catalog) up to date; only new files are read."""
+    Catalog = _catalog_cls()
+    if Catalog is None:
+        return
+    for root in filter(None, roots):
+        with Catalog(root) as cat:
+            cat.refresh()
+
+def ingest_folder(source_dir: str, out_dir: str | None, chain_id: int, max_row_group:int=8192, *,
+                  arrow_dir: str | None = None, sqlite_db: str | None = None,
+                  sqlite_mode: str = "append", sqlite_reset: bool = False, queue_size: int = 8,
+                  max_file_bytes: int = 256 << 20, workers: int = 1, ledger_path: str | None = None,
+                  resume: bool = True, cluster: bool = False, catalog: bool = True):
+    """
+    Parse every blob once and fan the batches out to the Parquet dataset, Arrow hot files and/or SQLite.
+
+    Blobs are identified by content hash. Each finished blob is committed to a ledger
+    (default <out>/_ingest_ledger.json) and skipped on the next run; its Parquet files are
+    named blob-<hash16>-<n>.parquet, so leftovers of an interrupted blob are removed and
+    rewritten rather than duplicated: only the output of blobs an interrupted run left
+    pending is searched for, and blobs re-ingested with resume=False drop the files their
+    ledger entry lists. SQLite commits a blob's rows together with its key, so a crash
+    before the ledger commit does not append it twice. A blob is committed to the ledger
+    once every sink has ended it, while the next blob is already being parsed. workers > 1
+    ingests blobs on a process pool; a blob that fails there does not stop the others,
+    which are committed, and the failures are raised together at the end.
+    cluster=True writes key-clustered Parquet files (see RollingDatasetWriter).
+    Per-file statistics are kept in <out>/_catalog.sqlite (and <arrow_dir>/_catalog.sqlite)
+    for harborx.catalog; catalog=False skips them, and so does a missing harborx package
+    (with a warning, checked before any blob is read).
+    """
+    if catalog and (out_dir or arrow_dir) and _catalog_cls() is None:
+        catalog = False
     blobs = [p for p in sorted(os.listdir(source_dir)) if p.endswith(".blob.gz")]
     if not blobs:
         raise SystemExit(f"No .blob.gz found in {source_dir}")
-    for i, name in enumerate(blobs, 1):
-        path = os.path.join(source_dir, name)
-        print(f"[ingest] ({i}/{len(blobs)}) {path}")
-        ingest_blob_to_dataset(path, out_dir, chain_id, max_row_group=max_row_group)
-    print(f"[ingest] DONE → {out_dir}")
+    if workers > 1 and sqlite_db:
+        raise SystemExit("[ingest] --sqlite has a single writer; use --workers 1")
+    if sqlite_reset and resume:
+        print("[ingest] --sqlite-reset: ignoring the ledger, re-ingesting every blob")
+        resume = False
+
+    ledger_root = out_dir or arrow_dir or os.path.dirname(os.path.abspath(sqlite_db))
+    ledger = BlobLedger(ledger_path or os.path.join(ledger_root, LEDGER_NAME))
+    paths = [os.path.join(source_dir, name) for name in blobs]
+    with ThreadPoolExecutor(max_workers=min(8, len(paths))) as ex:
+        digests = list(ex.map(blob_digest, paths))
+    todo = [(p, d) for p, d in zip(paths, digests) if not (resume and ledger.done(d))]
+    if len(todo) < len(paths):
+        print(f"[ingest] skipping {len(paths) - len(todo)} blob(s) already in {ledger.path}")
+    if not todo:
+        print("[ingest] nothing to do"); return
+    # plan from headers only: row counts drive the summary and the pool's largest-first order
+    rows_of = {i.path: i.n for i in scan_blobs([p for p, _ in todo], os.path.join(ledger_root, SCAN_CACHE_NAME))}
+    n_of = lambda p: rows_of[os.path.abspath(p)]
+    print(f"[ingest] planned {len(todo)} blob(s), {sum(n_of(p) for p, _ in todo):,} rows")
+    removed = _remove_outputs(f for _, d in todo if ledger.done(d) for f in ledger.entry(d)["files"])
+    removed += _remove_partial_outputs(out_dir, {output_basename(d) for d in ledger.pending()})
+    if removed:
+        print(f"[ingest] removed {removed} file(s) left by an interrupted or earlier run")
+    ledger.start(d for _, d in todo)
+
+    t0 = time.time(); total = 0
+    if workers > 1:
+        todo.sort(key=lambda t: -n_of(t[0]))
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futs = {ex.submit(_ingest_one, p, output_basename(d), out_dir, chain_id, max_row_group,
+                              max_file_bytes, arrow_dir, cluster): (p, d) for p, d in todo}
+            for i, fut in enumerate(as_completed(futs), 1):
+                p, d = futs[fut]
+                try:
+                    rows, files = fut.result()
+                except Exception as e:
+                    failed.append((p, e))
+                    print(f"[ingest] ({i}/{len(todo)}) {p} failed: {e!r}")
+                    continue
+                ledger.commit(d, os.path.basename(p), rows, files)
+                total += rows
+                print(f"[ingest] ({i}/{len(todo)}) {p} rows={rows:,}")
+        if catalog:
+            _update_catalogs(out_dir, arrow_dir)
+        print(f"[ingest] DONE {total:,} rows in {time.time()-t0:.2f}s on {workers} worker(s)"
+              + (f"; {len(failed)} blob(s) failed" if failed else ""))
+        if failed:
+            raise RuntimeError(f"{len(failed)} blob(s) failed: " + ", ".join(f"{p}: {e!r}" for p, e in failed)) \
+                from failed[0][1]
+        return
+
+    sinks = make_sinks(out_dir, chain_id, arrow_dir, sqlite_db, sqlite_mode, sqlite_reset,
+                       max_row_group, max_file_bytes, per_blob=True, cluster=cluster, resume=resume)
+    prev = None                             # (ticket, digest, path, rows) of the blob the sinks may still be writing
+
+    def commit(ticket, d, path, rows):
+        nonlocal total
+        ledger.commit(d, os.path.basename(path), rows[0], fan.wait(ticket).files)
+        total += rows[0]
+
+    try:
+        with FanOut(sinks, queue_size=queue_size) as fan:
+            for i, (path, d) in enumerate(todo, 1):
+                print(f"[ingest] ({i}/{len(todo)}) {path}")
+                rows = [0]
+                ticket = fan.ingest(path, _counted(parse_blob(path, chunk=max_row_group), rows), key=output_basename(d))
+                if prev is not None:
+                    commit(*prev)
+                prev = (ticket, d, path, rows)
+            if prev is not None:
+                commit(*prev)
+                prev = None
+    finally:
+        if prev is not None and prev[0].done() and prev[0].ok:
+            commit(*prev)                   # ended cleanly before a later blob failed
+    if catalog:
+        _update_catalogs(out_dir, arrow_dir)
+    busy = ", ".join(f"{k}={v:.2f}s" for k, v in fan.timings().items())
+    print(f"[ingest] DONE {total:,} rows in {time.time()-t0:.2f}s (sink busy: {busy}) → {', '.join(s.name for s in sinks)}")
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import hashlib, json, os, time
+from typing import Any, Dict, Iterable
+
+LEDGER_NAME = "_ingest_ledger.json"
+
+def blob_digest(path: str) -> str:
+    """sha256 of the blob file's bytes; identifies a blob independent of its name."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def output_basename(digest: str) -> str:
+    """Deterministic file prefix for everything written for one blob."""
+    return f"blob-{digest[:16]}"
+
+class BlobLedger:
+    """
+    Checkpoint of ingested blobs, keyed by content hash:
+      {"blobs": {sha256: {"name": ..., "rows": ..., "files": [...], "ingested_at": ...}},
+       "pending": {sha256: started_at}}
+    Blobs are start()ed before a run touches them and leave "pending" on commit, so
+    what remains pending at the next run is exactly what an interrupted run left behind.
+    Every commit rewrites the file via fsync'd temp file + os.replace, so a crash
+    leaves either the previous or the new ledger, never a torn one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Any] = {"blobs": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+            self.data.setdefault("blobs", {})
+        self.data.setdefault("pending", {})
+
+    def done(self, digest: str) -> bool:
+        return digest in self.data["blobs"]
+
+    def entry(self, digest: str):
+        return self.data["blobs"].get(digest)
+
+    def pending(self) -> list:
+        return sorted(self.data["pending"])
+
+    def start(self, digests: Iterable[str]):
+        now = int(time.time())
+        self.data["pending"].update((d, now) for d in digests)
+        self._save()
+
+    def commit(self, digest: str, name: str, rows: int, files: Iterable[str]):
+        self.data["pending"].pop(digest, None)
+        self.data["blobs"][digest] = {
+            "name": name, "rows": int(rows), "files": sorted(files), "ingested_at": int(time.time()),
+        }
+        self._save()
+
+    def forget(self, digest: str):
+        if self.data["blobs"].pop(digest, None) is not None:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
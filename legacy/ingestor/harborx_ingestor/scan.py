@@ -0,0 +1,88 @@
+from __future__ import annotations
+import json, os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from .decoder import read_header
+
+SCAN_CACHE_NAME = "_blob_index.json"
+
+class BlobInfo(NamedTuple):
+    path: str
+    batch_id: int
+    timestamp: int
+    n: int
+    rec_len: int
+    version: int
+    csize: int              # compressed size on disk
+    mtime_ns: int
+
+def _info(path: str, st: os.stat_result) -> BlobInfo:
+    h = read_header(path)
+    return BlobInfo(path, h.batch_id, h.timestamp, h.n, h.rec_len, h.version, st.st_size, st.st_mtime_ns)
+
+def _blob_paths(source) -> List[str]:
+    if isinstance(source, str):
+        return [os.path.join(source, n) for n in sorted(os.listdir(source)) if n.endswith(".blob.gz")]
+    return list(source)
+
+class BlobIndex:
+    """
+    Header-only index of .blob.gz files: (path, batch_id, timestamp, n, rec_len, compressed size).
+
+    Headers are read on a thread pool (each read inflates only the first few KiB of a file).
+    With `cache_path`, entries are persisted and reused while a file's (size, mtime) is
+    unchanged, so rescanning an unchanged folder does no decompression at all.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, workers: int = 16):
+        self.cache_path, self.workers = cache_path, max(1, workers)
+        self._cache: Dict[str, BlobInfo] = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self._cache = {p: BlobInfo(**e) for p, e in json.load(f).get("blobs", {}).items()}
+            except (ValueError, TypeError):
+                self._cache = {}    # unreadable or old-format cache: rebuild it
+        self.hits = self.misses = 0
+
+    def scan(self, source) -> List[BlobInfo]:
+        """Index a folder (every *.blob.gz) or an iterable of paths; returns BlobInfo in path order."""
+        paths = [os.path.abspath(p) for p in _blob_paths(source)]
+        out: Dict[str, BlobInfo] = {}
+        stale = []
+        for p in paths:
+            st = os.stat(p)
+            hit = self._cache.get(p)
+            if hit is not None and hit.csize == st.st_size and hit.mtime_ns == st.st_mtime_ns:
+                out[p] = hit
+            else:
+                stale.append((p, st))
+        self.hits += len(out)
+        self.misses += len(stale)
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(stale))) as ex:
+                for info in ex.map(lambda a: _info(*a), stale):
+                    out[info.path] = info
+            self._cache.update((p, out[p]) for p, _ in stale)
+            self._save()
+        return [out[p] for p in paths]
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"blobs": {p: i._asdict() for p, i in self._cache.items()}}, f)
+        os.replace(tmp, self.cache_path)
+
+def scan_blobs(source, cache_path: Optional[str] = None, workers: int = 16) -> List[BlobInfo]:
+    """One-shot BlobIndex(cache_path, workers).scan(source)."""
+    return BlobIndex(cache_path, workers).scan(source)
+
+def select_window(infos: Iterable[BlobInfo], *, batch_from: Optional[int] = None, batch_to: Optional[int] = None,
+                  ts_from: Optional[int] = None, ts_to: Optional[int] = None) -> List[BlobInfo]:
+    """Blobs whose batch_id / timestamp fall in the inclusive bounds (None = open)."""
+    def ok(v, lo, hi):
+        return (lo is None or v >= lo) and (hi is None or v <= hi)
+    return [i for i in infos if ok(i.batch_id, batch_from, batch_to) and ok(i.timestamp, ts_from, ts_to)]
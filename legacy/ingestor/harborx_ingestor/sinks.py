@@ -0,0 +1,337 @@
+from __future__ import annotations
+import os, queue, sqlite3, threading, time
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+from .writer import RollingDatasetWriter
+
+# A sink receives the RecordBatches of one blob at a time:
+#   begin(blob_path, key) -> write(batch)* -> end()   (repeated per blob), then close(),
+# or abort() once any call has failed or the feeding side raised (e.g. a truncated blob):
+# it drops whatever the sink has not committed. close() never commits a blob left without end().
+# `key` is an optional stable per-blob name (e.g. ledger.output_basename) for deterministic outputs.
+# After end(), `blob_files` lists the files that blob committed. Every call on a sink happens
+# on that sink's own worker thread; FanOut.ingest returns a BlobTicket that completes once
+# every sink has ended the blob, so the producer can parse ahead while sinks still write.
+
+PARTITION_COLS = ("chain_id", "date", "topic")
+CLUSTER_COLS = ("key", "blob_index", "position")
+BLOOM_COLS = ("key", "address")
+
+def _add_partition_columns(batch: pa.RecordBatch, chain_id: int):
+    ts_i64 = pc.cast(batch.column("timestamp"), pa.int64())
+
+    days = pc.floor(pc.divide(ts_i64, pa.scalar(86400, type=pa.int64())))
+    date_part = pc.cast(days, pa.int32())
+
+    chain_ids = pa.array([int(chain_id)] * batch.num_rows, type=pa.int64())
+    topic_arr = batch.column("type")
+
+    cols   = list(batch.schema.names) + ["chain_id", "date", "topic"]
+    arrays = list(batch.columns)       + [chain_ids, date_part, topic_arr]
+    return pa.RecordBatch.from_arrays(arrays, names=cols)
+
+class ParquetDatasetSink:
+    """
+    Hive-partitioned (chain_id/date/topic) Parquet dataset written through RollingDatasetWriter.
+    per_blob=True commits each blob's files at end() under the blob key, so a blob is
+    either fully on disk or can be found and removed by name. cluster=True writes the
+    key-clustered layout (sorted by key, blob_index, position; page index; bloom filters).
+    """
+    name = "parquet"
+
+    def __init__(self, out_dir: str, chain_id: int, row_group_rows: int = 131_072,
+                 max_file_bytes: int = 256 << 20, per_blob: bool = False, cluster: bool = False):
+        self.out_dir, self.chain_id, self.per_blob = out_dir, chain_id, per_blob
+        self._opts = dict(row_group_rows=row_group_rows, max_file_bytes=max_file_bytes)
+        if cluster:
+            self._opts.update(cluster_by=CLUSTER_COLS, bloom_filter_cols=BLOOM_COLS)
+        self.writer = None if per_blob else RollingDatasetWriter(out_dir, PARTITION_COLS, **self._opts)
+        self.files: list = []
+        self.blob_files: list = []
+        os.makedirs(out_dir, exist_ok=True)
+
+    def begin(self, blob_path: str, key: str | None = None):
+        self.blob_files = []
+        if self.per_blob:
+            self.writer = RollingDatasetWriter(self.out_dir, PARTITION_COLS, basename=key, **self._opts)
+
+    def write(self, batch: pa.RecordBatch):
+        self.writer.write(_add_partition_columns(batch, self.chain_id))
+
+    def end(self):
+        if self.per_blob:
+            self.blob_files = self.writer.close()
+            self.files.extend(self.blob_files)
+            self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self.files.extend(self.writer.close())
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+
+class ArrowIPCSink:
+    """One Arrow IPC file per blob (blob_000001.blob.gz -> <out_dir>/blob_000001.arrow), committed atomically."""
+    name = "arrow"
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.out_path = self._tmp = self._sink = self._writer = None
+        self.blob_files: list = []
+        os.makedirs(out_dir, exist_ok=True)
+
+    def begin(self, blob_path: str, key: str | None = None):
+        self.blob_files = []
+        self.out_path = os.path.join(self.out_dir, Path(blob_path).name.replace(".blob.gz", ".arrow"))
+        self._tmp = self.out_path + ".tmp"
+
+    def write(self, batch: pa.RecordBatch):
+        if self._writer is None:
+            self._sink = pa.OSFile(self._tmp, "wb")
+            self._writer = ipc.RecordBatchFileWriter(self._sink, batch.schema)
+        self._writer.write_batch(batch)
+
+    def end(self):
+        if self._writer is not None:
+            self._writer.close(); self._sink.close()
+            os.replace(self._tmp, self.out_path)
+            self.blob_files = [self.out_path]
+        self._writer = self._sink = None
+
+    def close(self):
+        self.abort()                        # only a blob begun without end() is still open
+
+    def abort(self):
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+        finally:
+            self._writer = self._sink = None
+            if self._tmp and os.path.exists(self._tmp):
+                os.remove(self._tmp)
+
+class SQLiteSink:
+    """
+    `state` table rows, same layout as bench/blob_to_sqlite.py (append or LWW upsert on key).
+    A blob's key is recorded in `_ingested_blobs` in the same transaction as its rows, so
+    with resume=True a blob already committed here is skipped, never appended twice.
+    """
+    name = "sqlite"
+
+    UPSERT_SQL = """INSERT INTO state(type,address,key,value,tx_hash,blob_index,position,timestamp)
+                    VALUES (?,?,?,?,?,?,?,?)
+                    ON CONFLICT(key) DO UPDATE SET
+                       type=excluded.type,
+                       address=excluded.address,
+                       value=excluded.value,
+                       tx_hash=excluded.tx_hash,
+                       blob_index=excluded.blob_index,
+                       position=excluded.position,
+                       timestamp=excluded.timestamp
+                    WHERE excluded.timestamp > state.timestamp OR
+                          (excluded.timestamp = state.timestamp AND
+                            (excluded.blob_index > state.blob_index OR
+                             (excluded.blob_index = state.blob_index AND excluded.position > state.position)));"""
+
+    def __init__(self, db_path: str, mode: str = "append", reset: bool = False, resume: bool = True):
+        if mode not in ("append", "upsert"):
+            raise ValueError(f"Unknown sqlite mode {mode!r}")
+        self.db_path, self.mode, self.reset, self.resume = db_path, mode, reset, resume
+        self._con = None
+        self._key = None
+        self._skip = False
+        self.blob_files: list = []          # rows live in the database, not in per-blob files
+
+    def _connect(self):
+        if self.reset and os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        con = sqlite3.connect(self.db_path)
+        # WAL: a blob's transaction is all or nothing, and readers may stay connected meanwhile
+        # (exclusive locking mode would make any open reader fail the writer with "locked")
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute("PRAGMA temp_store=MEMORY;")
+        con.execute("PRAGMA cache_size=-64000;")
+        con.execute("""CREATE TABLE IF NOT EXISTS state(
+            type TEXT,
+            address BLOB,
+            key BLOB,
+            value BLOB,
+            tx_hash BLOB,
+            blob_index INTEGER,
+            position INTEGER,
+            timestamp INTEGER
+        )""")
+        con.execute("CREATE TABLE IF NOT EXISTS _ingested_blobs(key TEXT PRIMARY KEY, rows INTEGER)")
+        if self.mode == "upsert":
+            con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_state_key ON state(key)")
+        return con
+
+    def begin(self, blob_path: str, key: str | None = None):
+        if self._con is None:
+            self._con = self._connect()
+        self._key, self._rows = key, 0
+        self._skip = bool(key and self.resume and self._con.execute(
+            "SELECT 1 FROM _ingested_blobs WHERE key=?", (key,)).fetchone())
+        if self._skip:
+            print(f"[ingest] sqlite: {key} already committed, not appended again")
+
+    def write(self, batch: pa.RecordBatch):
+        if self._skip:
+            return
+        self._rows += batch.num_rows
+        sql = "INSERT INTO state VALUES (?,?,?,?,?,?,?,?)" if self.mode == "append" else self.UPSERT_SQL
+        cols = [batch.column(n).to_pylist() for n in
+                ("type","address","key","value","tx_hash","blob_index","position","timestamp")]
+        self._con.executemany(sql, zip(*cols))
+
+    def end(self):
+        if self._key and not self._skip:
+            self._con.execute("INSERT OR REPLACE INTO _ingested_blobs VALUES (?, ?)", (self._key, self._rows))
+        self._con.commit()
+
+    def close(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def abort(self):
+        if self._con is not None:
+            self._con.rollback()
+        self.close()
+
+_STOP = object()
+_ABORT = object()                           # the producer failed: abort instead of close
+
+class BlobTicket:
+    """One blob across every sink: done once each has ended it; files are what they committed."""
+
+    def __init__(self, sinks: int):
+        self.files: list = []
+        self.ok = True
+        self._left, self._lock, self._done = sinks, threading.Lock(), threading.Event()
+
+    def _arrive(self, files, ok: bool):
+        with self._lock:
+            self.files += files
+            self.ok = self.ok and ok
+            self._left -= 1
+            if not self._left:
+                self._done.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+class SinkWorker(threading.Thread):
+    """Drains one sink's bounded queue on its own thread; a slow sink only blocks once its queue is full."""
+
+    def __init__(self, sink, maxsize: int = 8):
+        super().__init__(name=f"sink-{sink.name}", daemon=True)
+        self.sink = sink
+        self.q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.busy_s = 0.0
+
+    def run(self):
+        while True:
+            item = self.q.get()
+            try:
+                if item is _ABORT:
+                    self._abort()
+                    return
+                if item is _STOP:
+                    if self.error is None:
+                        self.sink.close()
+                    return
+                op, args = item
+                if op == "_arrive":         # always answered, so a waiter never hangs on a failed sink
+                    args[0]._arrive(list(self.sink.blob_files) if self.error is None else [], self.error is None)
+                elif self.error is None:
+                    t0 = time.perf_counter()
+                    getattr(self.sink, op)(*args)
+                    self.busy_s += time.perf_counter() - t0
+            except BaseException as e:
+                self.error = e
+            finally:
+                if item is _STOP and self.error is not None:
+                    self._abort()
+                self.q.task_done()
+
+    def _abort(self):
+        """Drop the failed sink's uncommitted outputs (.tmp files, open transaction)."""
+        try:
+            self.sink.abort()
+        except Exception as e:
+            print(f"[ingest] {self.sink.name}: abort after failure also failed: {e!r}")
+
+    def put(self, op: str, *args):
+        self.raise_error()
+        self.q.put((op, args))
+
+    def raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"sink {self.sink.name} failed: {self.error!r}") from self.error
+
+class FanOut:
+    """Feed every batch of a parse to several sinks; use as a context manager."""
+
+    def __init__(self, sinks, queue_size: int = 8):
+        if not sinks:
+            raise ValueError("FanOut needs at least one sink")
+        self.workers = [SinkWorker(s, queue_size) for s in sinks]
+        for w in self.workers:
+            w.start()
+
+    def ingest(self, blob_path: str, batches, key: str | None = None) -> BlobTicket:
+        """Queue one blob to every sink; returns without waiting for the sinks to finish it."""
+        ticket = BlobTicket(len(self.workers))
+        for w in self.workers:
+            w.put("begin", blob_path, key)
+        for batch in batches:
+            for w in self.workers:
+                w.put("write", batch)
+        for w in self.workers:
+            w.put("end")
+            w.put("_arrive", ticket)
+        return ticket
+
+    def wait(self, ticket: BlobTicket) -> BlobTicket:
+        """Block until every sink has ended the ticket's blob; raises if one of them failed."""
+        ticket._done.wait()
+        if not ticket.ok:
+            for w in self.workers:
+                w.raise_error()
+        return ticket
+
+    def flush(self):
+        """Block until every sink has drained its queue."""
+        for w in self.workers:
+            w.q.join()
+            w.raise_error()
+
+    def close(self, abort: bool = False):
+        """Stop every worker: sinks close (commit), or with abort=True drop what is uncommitted."""
+        for w in self.workers:
+            w.q.put(_ABORT if abort else _STOP)
+        for w in self.workers:
+            w.join()
+        if not abort:
+            for w in self.workers:
+                w.raise_error()
+
+    def timings(self):
+        return {w.sink.name: w.busy_s for w in self.workers}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(abort=exc_type is not None)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+import inspect, os, uuid
+from typing import Dict, Optional, Sequence, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# bloom_filter_options arrived in newer pyarrow releases; without it files are still sorted and page-indexed
+_HAS_BLOOM = "bloom_filter_options" in inspect.signature(pq.ParquetWriter.__init__).parameters
+
+class _PartitionFile:
+    """
+    One open Parquet file of a partition, written as `<final>.tmp` and renamed on commit.
+    With `cluster_by`, rows are held until commit and written sorted by those columns.
+    """
+
+    def __init__(self, path: str, schema: pa.Schema, cluster_by: Sequence[str] = (), **pq_opts):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path, self.tmp = path, path + ".tmp"
+        self.schema, self.cluster_by, self.pq_opts = schema, list(cluster_by), pq_opts
+        self.sink = pa.OSFile(self.tmp, "wb")
+        self.writer = None if self.cluster_by else pq.ParquetWriter(self.sink, schema, **pq_opts)
+        self.pending: list = []
+        self.pending_rows = 0
+        self.pending_bytes = 0
+        self.rows = 0
+
+    def append(self, table: pa.Table, row_group_rows: int):
+        self.pending.append(table)
+        self.pending_rows += table.num_rows
+        self.pending_bytes += table.nbytes
+        if not self.cluster_by and self.pending_rows >= row_group_rows:
+            self.flush(row_group_rows, partial=False)
+
+    def flush(self, row_group_rows: int, partial: bool = True):
+        """Write full row groups from the buffer (and the remainder too when `partial`)."""
+        if not self.pending_rows:
+            return
+        buf = pa.concat_tables(self.pending)
+        full = (buf.num_rows // row_group_rows) * row_group_rows
+        n = buf.num_rows if partial else full
+        if n:
+            self.writer.write_table(buf.slice(0, n), row_group_size=row_group_rows)
+            self.rows += n
+        rest = buf.slice(n)
+        self.pending = [rest] if rest.num_rows else []
+        self.pending_rows = rest.num_rows
+        self.pending_bytes = rest.nbytes
+
+    def bytes_written(self) -> int:
+        # clustered files are sized by their buffered (uncompressed) bytes until the sorted write
+        return self.pending_bytes if self.cluster_by else self.sink.tell()
+
+    def _write_clustered(self, row_group_rows: int):
+        buf = pa.concat_tables(self.pending) if self.pending else self.schema.empty_table()
+        buf = buf.sort_by([(c, "ascending") for c in self.cluster_by])
+        opts = dict(self.pq_opts)
+        opts["sorting_columns"] = [pq.SortingColumn(buf.schema.get_field_index(c)) for c in self.cluster_by]
+        self.writer = pq.ParquetWriter(self.sink, self.schema, **opts)
+        self.writer.write_table(buf, row_group_size=row_group_rows)
+        self.rows += buf.num_rows
+        self.pending, self.pending_rows, self.pending_bytes = [], 0, 0
+
+    def commit(self, row_group_rows: int) -> str:
+        if self.cluster_by:
+            self._write_clustered(row_group_rows)
+        else:
+            self.flush(row_group_rows)
+        self.writer.close()
+        self.sink.close()
+        os.replace(self.tmp, self.path)
+        return self.path
+
+    def abort(self):
+        try:
+            if self.writer is not None:
+                self.writer.close()
+            self.sink.close()
+        finally:
+            if os.path.exists(self.tmp):
+                os.remove(self.tmp)
+
+class RollingDatasetWriter:
+    """
+    Hive-partitioned Parquet writer that keeps one open ParquetWriter per partition.
+
+    Rows are buffered per partition until `row_group_rows` are available, then
+    written as one row group; a file is committed (atomic rename from `.tmp`)
+    and a new one started once it reaches `max_file_bytes`. Partition columns
+    live in the directory names only, as with pq.write_to_dataset.
+
+    Clustered layout: `cluster_by` sorts every file by those columns (buffering up to
+    `max_file_bytes` uncompressed per partition), records them as sorting_columns, and
+    writes page indexes plus bloom filters on `bloom_filter_cols`, so DuckDB can skip
+    row groups and pages on point and range predicates.
+    """
+
+    def __init__(self, root: str, partition_cols: Sequence[str] = ("chain_id", "date", "topic"), *,
+                 row_group_rows: int = 131_072, max_file_bytes: int = 256 << 20,
+                 basename: Optional[str] = None, compression: str = "zstd", use_dictionary: bool = True,
+                 cluster_by: Sequence[str] = (), bloom_filter_cols: Sequence[str] = (),
+                 write_page_index: Optional[bool] = None):
+        self.root = root
+        self.partition_cols = list(partition_cols)
+        self.row_group_rows = max(1, int(row_group_rows))
+        self.max_file_bytes = int(max_file_bytes)
+        self.basename = basename or uuid.uuid4().hex
+        self.cluster_by = list(cluster_by)
+        self.pq_opts = dict(compression=compression, use_dictionary=use_dictionary, write_statistics=True)
+        if write_page_index is None:
+            write_page_index = bool(self.cluster_by)
+        if write_page_index:
+            self.pq_opts["write_page_index"] = True
+        if bloom_filter_cols and _HAS_BLOOM:
+            # bloom filters are per column chunk, i.e. per row group
+            self.pq_opts["bloom_filter_options"] = {
+                c: {"ndv": self.row_group_rows, "fpp": 0.01} for c in bloom_filter_cols}
+        self._open: Dict[Tuple, _PartitionFile] = {}
+        self._seq: Dict[Tuple, int] = {}
+        self.committed: list = []
+
+    def _partition_dir(self, key: Tuple) -> str:
+        return os.path.join(self.root, *(f"{c}={v}" for c, v in zip(self.partition_cols, key)))
+
+    def _split(self, table: pa.Table):
+        if table.num_rows == 0:
+            return
+        keys = table.select(self.partition_cols).group_by(self.partition_cols).aggregate([])
+        data_cols = [c for c in table.column_names if c not in self.partition_cols]
+        if keys.num_rows == 1:
+            yield tuple(keys.column(c)[0].as_py() for c in self.partition_cols), table.select(data_cols)
+            return
+        for row in keys.to_pylist():
+            mask = None
+            for c in self.partition_cols:
+                m = pc.equal(table.column(c), pa.scalar(row[c], type=table.schema.field(c).type))
+                mask = m if mask is None else pc.and_(mask, m)
+            yield tuple(row[c] for c in self.partition_cols), table.filter(mask).select(data_cols)
+
+    def write(self, data):
+        table = pa.Table.from_batches([data]) if isinstance(data, pa.RecordBatch) else data
+        for key, part in self._split(table):
+            f = self._open.get(key)
+            if f is None:
+                seq = self._seq.get(key, 0)
+                self._seq[key] = seq + 1
+                path = os.path.join(self._partition_dir(key), f"{self.basename}-{seq}.parquet")
+                f = self._open[key] = _PartitionFile(path, part.schema, self.cluster_by, **self.pq_opts)
+            f.append(part, self.row_group_rows)
+            if f.bytes_written() >= self.max_file_bytes:
+                self.committed.append(f.commit(self.row_group_rows))
+                del self._open[key]
+
+    def close(self) -> list:
+        """Commit every open file; returns all files committed by this writer."""
+        for key in list(self._open):
+            self.committed.append(self._open.pop(key).commit(self.row_group_rows))
+        return self.committed
+
+    def abort(self):
+        """Drop uncommitted files (their .tmp) without touching committed ones."""
+        for key in list(self._open):
+            self._open.pop(key).abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
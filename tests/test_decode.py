@@ -1,5 +1,5 @@
-import pathlib, subprocess, sys
-from poc_e2e_blob_sql.packages.ingestor.harborx_ingestor.decoder import parse_blob
+import gzip, pathlib, struct, subprocess, sys
+from harborx_ingestor.decoder import parse_blob, SCHEMA
 
 def test_parse_blob_roundtrip(tmp_path):
     repo = pathlib.Path(__file__).resolve().parents[1]
@@ -10,3 +10,57 @@ def test_parse_blob_roundtrip(tmp_path):
     batches = list(parse_blob(str(blob), chunk=128))
     assert sum(b.num_rows for b in batches) == 500
     assert batches[0].schema.names[:5] == ["type","address","key","value","tx_hash"]
+
+def test_parse_blob_fields(tmp_path):
+    blob = tmp_path / "blob_000001.blob.gz"
+    with gzip.open(blob, "wb") as gz:
+        gz.write(b"ZKBL" + struct.pack(">HHIQIH", 1, 0, 1, 1_700_000_000, 2, 126))
+        gz.write(bytes([2, 0]) + b"\x01"*20 + b"\x02"*32 + b"\x03"*32 + b"\x04"*32 + struct.pack(">II", 7, 0))
+        gz.write(bytes([1, 0]) + b"\x05"*20 + b"\x06"*32 + b"\x07"*32 + b"\x08"*32 + struct.pack(">II", 7, 70000))
+    (batch,) = list(parse_blob(str(blob)))
+    assert batch.schema == SCHEMA
+    rows = batch.to_pylist()
+    assert [r["type"] for r in rows] == ["state_diff", "tx"]
+    assert rows[1]["address"] == b"\x05"*20 and rows[1]["tx_hash"] == b"\x08"*32
+    assert [r["position"] for r in rows] == [0, 70000]
+    assert {r["timestamp"] for r in rows} == {1_700_000_000}
+
+def test_parse_blob_v2_blocks(tmp_path):
+    import pyarrow as pa
+    from harborx_ingestor.decoder import read_block_index, read_header
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    gen = repo / "bench" / "gen_blob.py"
+    for fmt in ("v1", "v2"):
+        subprocess.check_call([sys.executable, str(gen), "--out", str(tmp_path/fmt/'blob'), "--rows", "1000", "--parts", "1",
+                               "--keyspace", "400", "--seed", "5", "--format", fmt, "--block-rows", "300"])
+    v1, v2 = (str(tmp_path/fmt/"blob_000001.blob.gz") for fmt in ("v1", "v2"))
+    assert read_header(v2).version == 2 and read_header(v2).n == 1000
+    blocks = read_block_index(v2)
+    assert [(b.row_start, b.rows) for b in blocks] == [(0, 300), (300, 300), (600, 300), (900, 100)]
+    assert all(b.min_key <= b.max_key for b in blocks)
+    cols = ["type", "address", "key", "blob_index", "position"]   # value/tx_hash are random per file
+    t1 = pa.Table.from_batches(parse_blob(v1, chunk=128)).select(cols)
+    t2 = pa.Table.from_batches(parse_blob(v2, chunk=128, workers=3)).select(cols)
+    assert t1.equals(t2)
+    part = pa.Table.from_batches(parse_blob(v2, rows=(250, 610)))
+    assert part["position"].to_pylist() == list(range(250, 610))
+    assert pa.Table.from_batches(parse_blob(v1, rows=(250, 610)))["position"].to_pylist() == list(range(250, 610))
+
+def test_blob_index_reads_headers_and_caches(tmp_path):
+    import os
+    from harborx_ingestor.scan import BlobIndex, select_window
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    src = tmp_path / "blobs"; src.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(src/'blob'), "--rows", "300", "--parts", "3", "--seed", "9"])
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(src/'v2'), "--rows", "300", "--parts", "1", "--seed", "9",
+                           "--format", "v2", "--block-rows", "100"])
+    cache = str(tmp_path / "idx.json")
+    infos = BlobIndex(cache).scan(str(src))
+    assert [(i.batch_id, i.n, i.rec_len, i.version) for i in infos] == [(1, 300, 126, 1), (2, 300, 126, 1), (3, 300, 126, 1), (1, 300, 126, 2)]
+    assert all(i.csize == os.path.getsize(i.path) for i in infos)
+    again = BlobIndex(cache)
+    assert again.scan(str(src)) == infos and (again.hits, again.misses) == (4, 0)
+    os.utime(infos[0].path, ns=(0, 0))
+    again.scan(str(src))
+    assert again.misses == 1
+    assert [i.batch_id for i in select_window(infos, batch_from=2, batch_to=3)] == [2, 3]
@@ -11,3 +11,38 @@ def test_duckdb_reads_parquet(tmp_path):
     con.execute(f"CREATE VIEW state AS SELECT * FROM read_parquet('{out}/**/*.parquet');")
     cnt = con.execute('SELECT COUNT(*) FROM state').fetchone()[0]
     assert cnt > 0
+
+def test_catalog_prunes_files(tmp_path):
+    import pyarrow.parquet as pq
+    from harborx.catalog import Catalog
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / 'blobs'; out = tmp_path / 'parquet'
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/'bench'/'gen_blob.py'), '--out', str(blobs/'blob'), '--rows', '1000', '--parts', '3', '--seed', '5'])
+    subprocess.check_call([sys.executable, '-m', 'harborx_ingestor.cli', 'ingest', '--source', str(blobs), '--chain', '167001', '--out', str(out), '--row-group', '256'],
+                          cwd=str(repo))
+    assert (out / '_catalog.sqlite').exists()
+    with Catalog(str(out)) as cat:
+        assert len(cat.entries()) == len(list(out.rglob('*.parquet')))
+        assert cat.refresh() == (0, 0)
+        hits = cat.files(blob_index=2)
+        assert hits and all(pq.read_table(f).column('blob_index').to_pylist() == [2] * pq.ParquetFile(f).metadata.num_rows for f in hits)
+        probe = pq.read_table(hits[0]).column('key')[0].as_py()
+        assert hits[0] in cat.files(key=probe) and hits[0] in cat.files(key='0x' + probe.hex())
+        assert cat.files(blob_index=(4, None)) == []
+        assert cat.files(topic='state_diff', chain_id=167001) == sorted(str(p) for p in out.rglob('*.parquet'))
+        assert cat.files(topic='tx') == []
+    from harborx.catalog import files_matching
+    import shutil
+    shutil.copyfile(hits[0], out / 'top.parquet')
+    assert files_matching(str(out), recursive=False) == [str(out / 'top.parquet')]
+    bare = tmp_path / 'bare'
+    subprocess.check_call([sys.executable, '-m', 'harborx_ingestor.cli', 'ingest', '--source', str(blobs), '--chain', '167001',
+                           '--out', str(bare), '--no-catalog'], cwd=str(repo))
+    assert list(bare.rglob('*.parquet')) and not (bare / '_catalog.sqlite').exists()
+    standalone = tmp_path / 'standalone'          # only the legacy ingestor importable: warn, no catalog
+    env = {**__import__('os').environ, 'PYTHONPATH': str(repo / 'legacy' / 'ingestor')}
+    r = subprocess.run([sys.executable, '-m', 'harborx_ingestor.cli', 'ingest', '--source', str(blobs), '--chain', '167001',
+                        '--out', str(standalone)], cwd=str(tmp_path), env=env, capture_output=True, text=True)
+    assert r.returncode == 0 and 'no statistics catalog' in r.stdout
+    assert list(standalone.rglob('*.parquet')) and not (standalone / '_catalog.sqlite').exists()
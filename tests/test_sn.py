@@ -0,0 +1,619 @@
+import os
+import random
+import pytest
+from harborx.ntt import FR_MOD, GENERATOR, NTTEngine, bit_reverse_permutation
+
+def _textbook_ntt(a, inverse=False, mod=FR_MOD):
+    n = len(a); bits = (n - 1).bit_length()
+    a = [a[int(format(i, f"0{bits}b")[::-1], 2)] for i in range(n)]
+    root = pow(GENERATOR, (mod - 1) // n, mod)
+    m = 2
+    while m <= n:
+        step = pow(root, n // m, mod)
+        if inverse: step = pow(step, -1, mod)
+        for k in range(0, n, m):
+            w = 1
+            for j in range(m // 2):
+                u, t = a[k + j], a[k + j + m // 2] * w % mod
+                a[k + j], a[k + j + m // 2] = (u + t) % mod, (u - t) % mod
+                w = w * step % mod
+        m <<= 1
+    if inverse:
+        a = [x * pow(n, -1, mod) % mod for x in a]
+    return a
+
+def test_ntt_engine_matches_textbook():
+    rng = random.Random(5)
+    assert bit_reverse_permutation(8) == [0, 4, 2, 6, 1, 5, 3, 7]
+    for n in (2, 16, 256, 4096):
+        eng = NTTEngine(n)
+        blobs = [[rng.randrange(FR_MOD) for _ in range(n)] for _ in range(3)]
+        for inverse in (False, True):
+            expect = [_textbook_ntt(b, inverse) for b in blobs]
+            assert eng.transform_many(blobs, inverse=inverse) == expect
+        assert eng.inverse(eng.forward(blobs[0])) == blobs[0]
+
+def test_decode_blob_groups_ordered_with_errors(tmp_path):
+    from harborx import sn_pydecoder as sn
+    bad = tmp_path / "short.bin"; bad.write_bytes(b"\x00" * 10)
+    groups = [sn.BlobGroup(eb, i, [str(bad)]) for eb, i in ((9, 1), (3, 0), (9, 0), (5, 2), (5, 0))]
+    got = list(sn.decode_blob_groups(groups, "", workers=2))
+    assert [(r.group.eth_block, r.group.index) for r in got] == [(3, 0), (5, 0), (5, 2), (9, 0), (9, 1)]
+    assert all(r.error and not r.rows for r in got)
+
+def test_decode_bin_files_to_json_groups(tmp_path, monkeypatch):
+    import json
+    from harborx import sn_pydecoder as sn
+    monkeypatch.setattr(sn, "decode_blob_bins_to_kv",
+                        lambda blobs, db, debug=False: [{"addr": str(len(b)), "key": "1", "value": "2"} for b in blobs])
+    a, b = tmp_path / "a.bin", tmp_path / "b.bin"
+    a.write_bytes(b"x" * 3); b.write_bytes(b"y" * 5)
+    out = sn.decode_bin_files_to_json([sn.BlobGroup(7, 1, [str(a)]), sn.BlobGroup(7, 0, [str(a), str(b)])], "",
+                                      str(tmp_path / "out" / "rows.jsonl"), workers=1)
+    rows = [json.loads(l) for l in open(out)]
+    assert [(r["eth_block"], r["group"], r["addr"]) for r in rows] == [(7, 0, "3"), (7, 0, "5"), (7, 1, "3")]
+    with pytest.raises(ValueError, match="force_ifft"):
+        sn.decode_bin_files_to_json([[str(a)]], "", str(tmp_path / "out" / "x.jsonl"), force_ifft=True)
+
+def test_stateless_header_scan_checks_structure_and_remembers(monkeypatch):
+    from harborx import sn_pydecoder as sn
+    rng = random.Random(1)
+    hdr = sum(v << (20 * i) for i, v in enumerate([0, 10, 2, 0, 0, 0, 0, 3, 5]))
+    felts = [rng.randrange(FR_MOD) for _ in range(4096)]
+    felts[777] = hdr
+    calls = []
+    def fake_decompress(stream):
+        calls.append(type(stream).__name__)
+        if stream[0] != hdr: raise ValueError("not a header")
+        return list(stream[1:9])
+    monkeypatch.setattr(sn, "_official_decompress", fake_decompress)
+    monkeypatch.setattr(sn, "_HEADER_OFFSETS", {})
+    out, off = sn._try_stateless_decompress_scan(felts)
+    assert off == 777 and out == felts[778:786]
+    assert calls == ["_FeltView"], "only the structurally valid offset should be tried, on a view"
+    felts2 = [rng.randrange(FR_MOD) for _ in range(4096)]
+    felts2[777] = hdr; felts2[100] = sum(v << (20 * i) for i, v in enumerate([0, 3, 3, 0, 0, 0, 0, 0, 0]))
+    calls.clear()
+    assert sn._try_stateless_decompress_scan(felts2)[1] == 777
+    assert len(calls) == 1, "the remembered offset is tried first"
+
+def test_stateful_index_map_bulk_and_cache(tmp_path):
+    import sqlite3
+    from harborx import sn_pydecoder as sn
+    from harborx.sn_pydecoder import StatefulIndexMap, _flatten_parsed
+    db = tmp_path / "idx.sqlite"
+    cx = sqlite3.connect(db)
+    cx.execute("CREATE TABLE idxmap (idx INTEGER PRIMARY KEY, val TEXT)")
+    cx.executemany("INSERT INTO idxmap VALUES (?,?)", [(i, str(10**30 + i)) for i in range(2000)])
+    cx.commit(); cx.close()
+    with StatefulIndexMap(str(db), cache_size=1500) as m:
+        got = m.get_many(list(range(1990, 2010)) * 2)
+        assert got[1995] == 10**30 + 1995 and got[2005] is None
+        assert m.queries == 1
+        assert m.get(1995) == 10**30 + 1995 and m.queries == 1 and m.hits == 1
+        m.get_many(range(1000))
+        assert m.queries == 3 and len(m._cache) <= 1500
+    big = 1 << 200   # a real felt: too wide to be an index, never queried
+    rows = _flatten_parsed({"contracts": [{"address": 1500, "storage": [[5, 6], {"key": 200, "value": 7}, [big, 8]]}]},
+                           StatefulIndexMap(str(db)))
+    a = str(10**30 + 1500)
+    assert [(r["addr"], r["key"], r["value"]) for r in rows] == [(a, "5", "6"), (a, str(10**30 + 200), "7"), (a, str(big), "8")]
+    bad = tmp_path / "empty.sqlite"
+    sqlite3.connect(bad).close()
+    with StatefulIndexMap(str(bad)) as m:
+        assert m.get(300) is None and not m._cache, "a failed lookup is not cached"
+        cx = sqlite3.connect(bad)
+        cx.execute("CREATE TABLE idxmap (idx INTEGER PRIMARY KEY, val TEXT)")
+        cx.execute("INSERT INTO idxmap VALUES (300, '42')"); cx.commit(); cx.close()
+        assert m.get(300) == 42
+        assert m.get(301) is None and 301 not in m._cache, "misses are not cached"
+
+    late = tmp_path / "late.sqlite"                  # a follower started before the db existed
+    assert sn._resolver_for(str(late)).get(400) is None
+    cx = sqlite3.connect(late)
+    cx.execute("CREATE TABLE idxmap (idx INTEGER PRIMARY KEY, val TEXT)")
+    cx.execute("INSERT INTO idxmap VALUES (400, '7')"); cx.commit()
+    assert sn._resolver_for(str(late)).get(400) == 7
+    cx.execute("INSERT INTO idxmap VALUES (401, '8')"); cx.commit(); cx.close()
+    assert sn._resolver_for(str(late)).get(401) == 8, "rebuilt once the db changes"
+
+def test_decode_to_arrow_matches_json_rows(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq, pyarrow.ipc as ipc
+    from harborx import sn_pydecoder as sn
+    parsed = {"contracts": [
+        {"address": 11, "class_hash": 2**250 + 3, "storage": [[1, 2], {"key": 3, "value": FR_MOD - 1}]},
+        {"address": 12, "nonce": 7, "storage": [[4, 0]]},
+        {"address": 13, "storage": []}]}
+    monkeypatch.setattr(sn, "_decode_state_diff", lambda blobs, **kw: parsed)
+    rows = sn.decode_blob_bins_to_kv([b""], "")
+    batch = sn.decode_blob_bins_to_arrow([b""], "")
+    assert batch.schema == sn.kv_schema() and batch.num_rows == len(rows) == 3
+    as_int = lambda b: None if b is None else str(int.from_bytes(b, "big"))
+    back = [{k: as_int(v) for k, v in r.items() if v is not None} for r in batch.to_pylist()]
+    assert back == rows
+    assert sn._entries_to_batch([]).num_rows == 0
+
+    a = tmp_path / "a.bin"; a.write_bytes(b"x")
+    groups = [sn.BlobGroup(9, 1, [str(a)]), sn.BlobGroup(4, 0, [str(a)])]
+    tbl = pq.read_table(sn.decode_bin_files_to_arrow(groups, "", str(tmp_path / "o" / "kv.parquet"), workers=1))
+    assert tbl.schema == sn.kv_schema(tagged=True)
+    assert tbl.column("eth_block").to_pylist() == [4] * 3 + [9] * 3
+    with ipc.open_file(sn.decode_bin_files_to_arrow(groups, "", str(tmp_path / "kv.arrow"), workers=1)) as r:
+        assert r.read_all().equals(tbl)
+
+    def boom(batch, eth_block, index):
+        raise OSError("disk full")
+    monkeypatch.setattr(sn, "_tag_batch", boom)
+    for name in ("bad.parquet", "bad.arrow"):
+        with pytest.raises(OSError):
+            sn.decode_bin_files_to_arrow(groups, "", str(tmp_path / name), workers=1)
+        assert not (tmp_path / name).exists() and not (tmp_path / (name + ".tmp")).exists()
+
+def test_decode_cache_skips_known_groups_and_evicts(tmp_path, monkeypatch):
+    from harborx import sn_pydecoder as sn
+    from harborx.sn_cache import DecodeCache
+    calls = []
+    def fake(blobs, **kw):
+        calls.append(blobs)
+        return {"contracts": [{"address": len(b), "nonce": 1, "storage": [[i, i + 1] for i in range(50)]} for b in blobs]}
+    monkeypatch.setattr(sn, "_decode_state_diff", fake)
+    groups = [sn.BlobGroup(eb, 0, [bytes([eb]) * (eb + 1)]) for eb in range(4)]
+    cache = DecodeCache(str(tmp_path / "c"))
+    first = list(sn.decode_blob_groups(groups, "", workers=1, cache=cache))
+    assert len(calls) == 4 and (cache.hits, cache.misses, cache.stores) == (0, 4, 4)
+    again = list(sn.decode_blob_groups(groups + [sn.BlobGroup(9, 0, [b"new"])], "", workers=1, cache=cache))
+    assert len(calls) == 5 and cache.hits == 4 and [r.cached for r in again] == [True] * 4 + [False]
+    assert [r.rows for r in again[:4]] == [r.rows for r in first]
+    assert first[1].rows == sn.decode_blob_bins_to_kv([bytes([1]) * 2], "")
+    key = sn.group_cache_key(groups[0].blobs)
+    monkeypatch.setattr(sn, "DECODER_VERSION", sn.DECODER_VERSION + 1)
+    assert sn.group_cache_key(groups[0].blobs) != key, "a new decoder version must miss"
+    small = DecodeCache(str(tmp_path / "c"), max_bytes=cache.nbytes // 2)
+    assert small.evict() > 0 and small.nbytes <= small.max_bytes
+
+def test_blobs_to_evals_matches_per_word(monkeypatch):
+    import pytest
+    from harborx import sn_pydecoder as sn
+    rng = random.Random(16)
+    words = [rng.randrange(1 << 256) for _ in range(3 * 4096)]
+    words[:4] = [FR_MOD - 1, FR_MOD, FR_MOD + 1, (1 << 256) - 1]
+    blobs = [b"".join(w.to_bytes(32, "big") for w in words[i:i + 4096]) for i in range(0, len(words), 4096)]
+    rev = bit_reverse_permutation(4096)
+    for np_mod in (sn.np, None):
+        monkeypatch.setattr(sn, "np", np_mod)
+        for endian in ("BE", "LE"):
+            expect = [sn._blob_to_evals_32B_words(b, endian=endian) for b in blobs]
+            assert sn.blobs_to_evals(blobs, endian=endian) == expect
+            assert sn.blobs_to_evals(blobs, endian=endian, bitrev=True) == [[e[r] for r in rev] for e in expect]
+        with pytest.raises(ValueError):
+            sn.blobs_to_evals([b"\0" * 10])
+
+def test_sn_bench_reports_stage_percentiles(tmp_path, monkeypatch, capsys):
+    import json
+    from harborx import sn_pydecoder as sn, sn_bench
+    monkeypatch.setattr(sn, "fr_coeffs_to_cairo_felts", lambda coeffs: [x for c in coeffs for x in c[:8]])
+    monkeypatch.setattr(sn, "_try_stateless_decompress_scan", lambda felts, **kw: (felts, 0))
+    monkeypatch.setattr(sn, "extract_state_diff", lambda u, debug=False: ({"contracts": [{"address": 1, "storage": [[2, 3]]}]}, 0, len(u)))
+    paths = []
+    for i, size in enumerate((131072, 131072, 5)):
+        p = tmp_path / f"b{i}.bin"; p.write_bytes(bytes([i]) * size); paths.append(str(p))
+    man = {"entries": [{"eth_block": 7, "blobs": [{"path": paths[0]}, {"path": paths[1]}]},
+                       {"eth_block": 7, "blobs": [{"path": paths[2]}]}]}
+    (tmp_path / sn_bench.MANIFEST_NAME).write_text(json.dumps(man))
+    groups = sn_bench.load_corpus(str(tmp_path))
+    assert [(g.eth_block, g.index, len(g.blobs)) for g in groups] == [(7, 0, 2), (7, 1, 1)]
+    prof = sn.DecodeProfile()
+    assert sn.decode_blob_bins_to_kv([open(p, "rb").read() for p in paths[:2]], "", profile=prof) == \
+        [{"addr": "1", "key": "2", "value": "3"}]
+    assert set(prof.seconds) == set(sn.DecodeProfile.STAGES) and prof.counts["felts"] == 16
+
+    sn_bench.main(["--corpus", str(tmp_path), "--repeat", "2", "--alloc", "--out", str(tmp_path / "r.json")])
+    rep = json.loads(capsys.readouterr().out)
+    assert rep == json.loads((tmp_path / "r.json").read_text())
+    assert (rep["decodes"], rep["blobs"], rep["rows"], rep["errors"]) == (4, 4, 2, 2)
+    ifft = rep["stages"]["ifft"]
+    assert ifft["n"] == 2 and ifft["p50"] <= ifft["p95"] and ifft["alloc_peak_p95"] > 0
+    assert rep["stages"]["evals"]["n"] == 4 and rep["blobs_per_s"] > 0
+
+def _blob_server(delay=0.0, fail_first=(), listing=None):
+    """
+    Local HTTP stand-in: GET /blob/<n> -> 128 KiB of byte n; paths in fail_first answer 503
+    once. With `listing` (Blobscan-style items), GET /blobs pages it like the Blobscan API.
+    """
+    import json, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlsplit
+    state = {"inflight": 0, "max_inflight": 0, "hits": {}}
+    lock = threading.Lock()
+    class H(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a): pass
+        def do_GET(self):
+            with lock:
+                state["inflight"] += 1
+                state["max_inflight"] = max(state["max_inflight"], state["inflight"])
+                state["hits"][self.path] = state["hits"].get(self.path, 0) + 1
+                first = state["hits"][self.path] == 1
+            try:
+                time.sleep(delay)
+                url = urlsplit(self.path)
+                if url.path == "/blobs" and listing is not None:
+                    q = {k: int(v[0]) for k, v in parse_qs(url.query).items() if k in ("p", "ps", "startBlock", "endBlock")}
+                    rows = sorted((r for r in listing if q.get("startBlock", 0) <= r["blockNumber"] <= q.get("endBlock", 1 << 62)),
+                                  key=lambda r: (r["blockNumber"], r["txHash"], r["index"]))
+                    body = json.dumps({"items": rows[(q["p"] - 1) * q["ps"]: q["p"] * q["ps"]]}).encode()
+                    self.send_response(200); self.send_header("Content-Length", str(len(body))); self.end_headers()
+                    self.wfile.write(body); return
+                if not self.path.startswith("/blob/"):
+                    self.send_response(404); self.send_header("Content-Length", "0"); self.end_headers(); return
+                if self.path in fail_first and first:
+                    self.send_response(503); self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0"); self.end_headers(); return
+                body = bytes([int(self.path.rsplit("/", 1)[1]) % 256]) * 131072
+                self.send_response(200); self.send_header("Content-Length", str(len(body))); self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with lock:
+                    state["inflight"] -= 1
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), H)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, state
+
+def test_blob_fetcher_concurrent_limits_and_retries(tmp_path):
+    from harborx.fetch import BlobFetcher, FetchJob
+    srv, state = _blob_server(delay=0.02, fail_first={"/blob/3"})
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    try:
+        jobs = [FetchJob(f"{base}/blob/{i}", str(tmp_path / "raw" / f"{i}.bin")) for i in range(12)]
+        jobs.append(FetchJob(f"{base}/missing", str(tmp_path / "raw" / "missing.bin")))
+        with BlobFetcher(workers=8, per_host=3, retries=2, backoff=0.01) as f:
+            res = f.fetch_all(jobs)
+        assert [r.job for r in res] == jobs
+        assert all(r.ok and r.nbytes == 131072 for r in res[:12])
+        assert open(jobs[5].dest, "rb").read() == b"\x05" * 131072
+        assert res[3].attempts == 2 and f.retried == 1
+        assert not res[12].ok and res[12].attempts == 1 and "404" in res[12].error
+        assert not (tmp_path / "raw" / "missing.bin").exists() and not list((tmp_path / "raw").glob("*.part"))
+        assert 2 <= state["max_inflight"] <= 3
+    finally:
+        srv.shutdown()
+
+def test_sn_follow_cursor_only_fetches_new_complete_groups(tmp_path, monkeypatch):
+    from harborx import blobscan
+    srv, state = _blob_server()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    listing = []
+    def add(eb, tx, idx):
+        listing.append({"blockNumber": eb, "txHash": tx, "index": idx, "timestamp": 1700000000,
+                        "storageUrl": f"{base}/blob/{len(listing)}"})
+    def fake_fetch(page, page_size, start_block=0, end_block=0, debug=False, sort="desc"):
+        rows = sorted((r for r in listing if r["blockNumber"] >= start_block), key=lambda r: (r["blockNumber"], r["txHash"], r["index"]))
+        return rows[(page - 1) * page_size: page * page_size]
+    monkeypatch.setattr(blobscan, "fetch_starknet_blobs", fake_fetch)
+    try:
+        for eb, tx, idx in ((10, "a", 0), (10, "a", 1), (11, "b", 0), (12, "c", 1)):
+            add(eb, tx, idx)
+        out = str(tmp_path / "raw")
+        cur = blobscan.FollowCursor(str(tmp_path / "cursor.json"), start_block=10)
+        kw = dict(page_size=2, fetch_workers=4, download_only=True)
+        assert blobscan.sn_follow_once(cur, out, **kw) == (3, blobscan.CAUGHT_UP)   # c is missing blob 0
+        assert (cur.eth_block, cur.done) == (11, {("b", 0)})
+        held, caught_up = blobscan.poll_new_entries(cur, page_size=1, max_pages=1)
+        assert held == [] and not caught_up, "a block cut off by the page limit waits"
+
+        add(12, "c", 0); add(13, "d", 0)
+        assert blobscan.sn_follow_once(cur, out, **kw) == (3, blobscan.CAUGHT_UP)
+        assert sorted(state["hits"].values()) == [1] * 6, "nothing downloaded twice"
+        assert blobscan.sn_follow_once(cur, out, **kw) == (0, blobscan.CAUGHT_UP)
+        again = blobscan.FollowCursor(str(tmp_path / "cursor.json"))
+        assert (again.eth_block, again.done) == (13, {("d", 0)})
+    finally:
+        srv.shutdown()
+
+def test_sn_follow_backs_off_on_failure_and_grows_the_page_budget(tmp_path, monkeypatch):
+    from harborx import blobscan
+    steps = [(0, blobscan.FAILED), (0, blobscan.FAILED), (0, blobscan.FAILED), (2, blobscan.MORE),
+             (0, blobscan.MORE), (0, blobscan.MORE), (1, blobscan.CAUGHT_UP), (0, blobscan.CAUGHT_UP)]
+    pages, sleeps = [], []
+    def fake_once(cursor, out_dir, chain_id, page_size, max_pages, end_block, **kw):
+        pages.append(max_pages)
+        return steps[len(pages) - 1]
+    monkeypatch.setattr(blobscan, "sn_follow_once", fake_once)
+    monkeypatch.setattr(blobscan.time, "sleep", sleeps.append)
+    blobscan.sn_follow(str(tmp_path), max_pages=2, poll_min=10, poll_max=30, max_polls=len(steps),
+                       cursor_path=str(tmp_path / "c.json"))
+    assert sleeps == [10, 20, 30, 10], "failures back off; more pages never sleep"
+    assert pages == [2, 2, 2, 2, 2, 4, 8, 2], "a step stuck in one block doubles its pages"
+
+def test_backfill_shards_resume_and_merge_in_block_order(tmp_path, monkeypatch, capsys):
+    import pyarrow.parquet as pq
+    from harborx import backfill, blobscan, sn_pydecoder as sn
+    listing = []
+    srv, state = _blob_server(listing=listing)
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    for eb in range(100, 130, 3):
+        for idx in (0, 1):
+            listing.append({"blockNumber": eb, "txHash": f"0x{eb:x}", "index": idx, "timestamp": 1700000000,
+                            "storageUrl": f"{base}/blob/{len(listing)}"})
+    monkeypatch.setattr(blobscan, "BLOSCAN_API", f"{base}/blobs")
+    parsed = {"contracts": [{"address": 1, "storage": [[2, 3]]}]}
+    monkeypatch.setattr(sn, "_decode_state_diff", lambda blobs, **kw: parsed)
+    out, lake = str(tmp_path / "bf"), str(tmp_path / "lake")
+    kw = dict(shard_blocks=10, workers=3, lake=lake, page_size=3, pages_per_step=1,
+              py_decoder=True, decode_workers=1, stream=True, fetch_workers=2)
+    try:
+        # an earlier run stopped inside the second shard, after block 112
+        cur = blobscan.FollowCursor(str(tmp_path / "bf" / backfill.STATE_DIR / "shard-110-119.json"), start_block=110)
+        cur.advance([(112, "0x70", 0), (112, "0x70", 1)])
+        cur.save()
+        st = backfill.Backfill(out, 100, 129, **kw).run()
+        assert (st["shards"], st["merged"], st["failed"]) == (3, 3, [])
+        assert st["blobs"] == 20 - 2 and st["covered"] == st["blocks"] == 30
+        merged = [l.split()[3] for l in capsys.readouterr().out.splitlines() if "merged shard" in l]
+        assert merged == ["100-109", "110-119", "120-129"]
+        srcs = pq.read_table(os.path.join(lake, "storage_diffs")).column("src").to_pylist()
+        assert sorted(int(s.split("-")[0]) for s in srcs) == [b for b in range(100, 130, 3) if b != 112]
+        assert not any(h in ("/blob/8", "/blob/9") for h in state["hits"]), "blocks before the checkpoint skipped"
+
+        hits = dict(state["hits"])
+        assert backfill.Backfill(out, 100, 129, **kw).run()["blobs"] == 0
+        assert state["hits"] == hits, "a finished backfill lists and fetches nothing"
+        with pytest.raises(ValueError):
+            backfill.Backfill(out, 100, 139, **kw)
+        with pytest.raises(ValueError, match="py_format"):
+            backfill.Backfill(str(tmp_path / "bf2"), 100, 129, **{**kw, "stream": False, "py_format": "parquet"})
+    finally:
+        srv.shutdown()
+
+def test_stream_pipeline_matches_json_ingest_without_spooling(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+    from harborx import blobscan, sn_pydecoder as sn
+    srv, state = _blob_server()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    listing = [{"blockNumber": eb, "txHash": tx, "index": idx, "timestamp": 1700000000, "storageUrl": f"{base}/blob/{n}"}
+               for n, (eb, tx, idx) in enumerate(((7, "b", 0), (7, "a", 0), (7, "a", 1), (9, "c", 0), (9, "d", 1)))]
+    monkeypatch.setattr(blobscan, "fetch_starknet_blobs", lambda *a, **kw: listing)
+    monkeypatch.setattr(sn, "_decode_state_diff", lambda blobs, **kw: {"contracts": [
+        {"address": blobs[0][0] + 1, "nonce": len(blobs), "class_hash": 2**250 + blobs[0][0],
+         "storage": [[len(blobs), blobs[-1][0]], [2**200, 0]]}]})
+    kw = dict(py_decoder=True, decode_workers=1, decode_cache="off")
+    try:
+        streamed = tmp_path / "s" / "lake" / "state_diff"
+        blobscan.sn_pipeline(str(tmp_path / "s" / "raw"), stream=str(streamed), **kw)
+        assert not (tmp_path / "s" / "raw").exists() and not (tmp_path / "s" / "decoder_manifest.json").exists()
+        assert (streamed.parent / "manifest.json").exists()
+
+        blobscan.sn_pipeline(str(tmp_path / "j" / "raw"), **kw)
+        ingested = tmp_path / "j" / "lake" / "state_diff"
+        assert blobscan.run_ingest(str(tmp_path / "j" / "decoder_cache"), str(ingested)) == 0
+        for t in ("storage_diffs", "deployed_or_replaced", "nonces"):
+            key = lambda r: (r["src"], *sorted(r.items()))
+            got = sorted(pq.read_table(str(streamed / t)).to_pylist(), key=key)
+            want = sorted(pq.read_table(str(ingested / t)).to_pylist(), key=key)
+            assert got == want and {r["src"] for r in got} == {"7-0.json", "7-1.json", "9-0.json"}
+
+        hits = sum(state["hits"].values())
+        blobscan.sn_pipeline(str(tmp_path / "k" / "raw"), stream=str(tmp_path / "k" / "lake"), keep_raw=True, **kw)
+        assert sum(state["hits"].values()) - hits == 4, "the incomplete group (d) is not fetched"
+        assert len([f for _, _, fs in os.walk(tmp_path / "k" / "raw") for f in fs if f.endswith(".txt")]) == 4
+
+        def bad_a(blobs, **kw):
+            if len(blobs) == 2:
+                raise ValueError("corrupt group")
+            return {"contracts": []}
+        monkeypatch.setattr(sn, "_decode_state_diff", bad_a)
+        got = blobscan.stream_items([blobscan._api_entry(it) for it in listing], str(tmp_path / "f" / "raw"),
+                                    str(tmp_path / "f" / "lake"), decode_workers=1, decode_cache="off")
+        assert sorted((e[0], e[1]) for e in got) == [(7, "b"), (9, "c")], "a failed group is not reported as done"
+    finally:
+        srv.shutdown()
+
+def test_stream_write_stage_buffers_at_most_flush_rows(tmp_path, monkeypatch, capsys):
+    import pyarrow.parquet as pq
+    from harborx import blobscan, sn_pydecoder as sn
+    srv, _ = _blob_server()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    entries = [(eb, f"0x{eb}", 0, 1700000000, f"{base}/blob/{eb}") for eb in range(1, 11)]
+    monkeypatch.setattr(sn, "_decode_state_diff", lambda blobs, **kw: {"contracts": [
+        {"address": blobs[0][0] + 1, "storage": [[k, 1] for k in range(3)]}]})
+    storage = tmp_path / "lake" / "storage_diffs"
+    flushes = []
+    on_flush = lambda done: flushes.append(([e[0] for e in done], len(os.listdir(storage))))
+    try:
+        got = blobscan.stream_items(entries, str(tmp_path / "raw"), str(tmp_path / "lake"), decode_workers=1,
+                                    decode_cache="off", queue_size=1, flush_rows=4, on_flush=on_flush)
+        assert flushes == [([2 * i + 1, 2 * i + 2], i + 1) for i in range(5)], "reported once on disk"
+        flushes.clear()
+        gap = entries[:4] + [entries[4][:4] + (f"{base}/missing",)] + entries[5:]
+        blobscan.stream_items(gap, str(tmp_path / "raw2"), str(tmp_path / "lake2"), decode_workers=1,
+                              decode_cache="off", queue_size=1, flush_rows=4, fetch_retries=0,
+                              on_flush=lambda done: flushes.append([e[0] for e in done]))
+        assert flushes == [[1, 2], [3, 4]], "nothing past a failed group is reported"
+    finally:
+        srv.shutdown()
+    assert len(got) == 10
+    out = capsys.readouterr().out
+    peak = int(out.split("write buffer max ")[1].split()[0])
+    assert 4 <= peak < 4 + 3, "never more than flush_rows plus one group's rows held"
+    files = os.listdir(tmp_path / "lake" / "storage_diffs")
+    assert len(files) == 5 and pq.read_table(str(tmp_path / "lake" / "storage_diffs")).num_rows == 30
+
+def test_lake_writer_flushes_every_flush_rows(tmp_path):
+    import pyarrow.parquet as pq
+    from harborx.sn_stream import LakeWriter
+    lake = tmp_path / "lake" / "state_diff"
+    w = LakeWriter(str(lake), flush_rows=3)
+    rows = lambda n: [{"addr": "1", "key": str(k), "value": "2"} for k in range(n)]
+    assert w.add(7, 0, rows(2)) == [] and w.buffered == 2 and not lake.exists()
+    first = w.add(8, 0, rows(2))
+    assert first and w.buffered == 0 and all(os.path.exists(f) for f in first), "written before flush()"
+    assert os.path.basename(first[0]).startswith("sn-7-8-")
+    w.add(9, 0, rows(1))
+    assert w.buffered == 1 and len(w.flush()) == 1 and len(w.files) == len(first) + 1
+    assert pq.read_table(str(lake / "storage_diffs")).num_rows == 5
+
+def test_external_decoder_shards_run_concurrently_and_merge(tmp_path):
+    import json, sqlite3, stat, sys, time
+    from harborx import blobscan
+    stub = tmp_path / "starknet-scrape"
+    stub.write_text(f"""#!{sys.executable}
+import json, os, sqlite3, sys, time
+a = sys.argv
+cfg = dict(l.replace('"', '').split(' = ', 1) for l in open(a[a.index('--config-file') + 1]).read().splitlines() if ' = ' in l)
+entries = json.load(open(a[a.index('--manifest') + 1]))['entries']
+if 'db_file' in cfg:
+    cx = sqlite3.connect(cfg['db_file'])
+    cx.execute('CREATE TABLE IF NOT EXISTS seen (eth_block INTEGER PRIMARY KEY)')
+    cx.executemany('INSERT OR IGNORE INTO seen VALUES (?)', [(e['eth_block'],) for e in entries])
+    cx.commit(); cx.close()
+time.sleep(0.5)
+for e in entries:
+    name = '%d-%s.json' % (e['eth_block'], os.path.basename(e['blobs'][0]['path']))
+    json.dump({{'storage_diffs': [{{'address': hex(e['eth_block']), 'storage_entries': [{{'key': '0x1', 'value': hex(len(e['blobs']))}}]}}]}},
+              open(os.path.join(cfg['cache_dir'], name), 'w'))
+""")
+    stub.chmod(stub.stat().st_mode | stat.S_IXUSR)
+    items = []
+    for n, (eb, tx, idx) in enumerate(((1, "a", 0), (2, "b", 0), (2, "b", 1), (3, "c", 0), (3, "d", 0), (4, "e", 0), (5, "f", 0))):
+        p = tmp_path / "raw" / f"{n}.txt"; p.parent.mkdir(exist_ok=True); p.write_bytes(b"\0")
+        items.append((eb, tx, idx, str(p), 1700000000))
+    cfg = tmp_path / "decoder.toml"
+    base_db = tmp_path / "one" / "db.sqlite"
+    (tmp_path / "one").mkdir()
+    cfg.write_text(f'rpc_url = "http://127.0.0.1:8545"\ncache_dir = "{tmp_path / "one"}"\ndb_file = "{base_db}"\n')
+    seen = lambda db: [b for (b,) in sqlite3.connect(db).execute("SELECT eth_block FROM seen ORDER BY eth_block")]
+
+    def run(cache, shards, config=cfg):
+        t0 = time.perf_counter()
+        outs = blobscan.decode_items(items, str(tmp_path / "raw"), decoder_path=str(stub), decoder_config=str(config),
+                                     decoder_cache=str(tmp_path / cache), decoder_shards=shards)
+        return {os.path.basename(o): json.load(open(o)) for o in outs}, time.perf_counter() - t0
+
+    one, _ = run("one", 1)
+    assert seen(base_db) == [1, 2, 3, 4, 5], "a single shard uses the configured db_file"
+    base_db.unlink()
+    many, dt = run("many", 3)
+    assert many == one and len(one) == 6
+    assert dt < 1.2, "shards run concurrently"
+    assert seen(base_db) == [1, 2, 3, 4, 5], "shard dbs are merged back into the configured one"
+    works = sorted((tmp_path / "many" / blobscan.SHARD_DIR).iterdir())
+    assert [seen(w / "decoder.sqlite") for w in works] == [[1, 2], [3], [4, 5]]
+    run("many", 3)
+    assert [seen(w / "decoder.sqlite") for w in works] == [[1, 2, 3, 4, 5]] * 3, "re-seeded from the merged db"
+    plain = tmp_path / "plain.toml"
+    plain.write_text('rpc_url = "http://127.0.0.1:8545"\n')
+    run("plain", 1, plain)
+    assert "db_file" not in (tmp_path / "plain" / blobscan.SHARD_DIR / "shard-0" / "decoder.toml").read_text()
+    assert not [f for w in works for f in (w / "cache").glob("*.json")], "outputs moved out of the shards"
+    shards = [json.load(open(w / "decoder_manifest.json"))["entries"] for w in works]
+    assert [e["eth_block"] for s in shards for e in s] == [1, 2, 3, 3, 4, 5]
+    assert blobscan.split_manifest([{"blobs": [0]}] * 2, 5) == [[{"blobs": [0]}]] * 2
+
+def test_blob_store_dedupes_compresses_and_skips_known_blobs(tmp_path, monkeypatch):
+    import json
+    from harborx import blobscan, sn_pydecoder as sn
+    from harborx.blob_store import BlobStore
+    blob = bytes(range(256)) * 16 + b"\0" * (131072 - 4096)
+    with BlobStore(str(tmp_path / "store")) as st:
+        h = st.add(5, "0xaa", 0, blob)
+        assert st.add(6, "0xbb", 1, blob) == h and (st.stored, st.deduped) == (1, 1)
+        assert os.path.getsize(st.path(h)) < 8192 and sn._load_blob(st.path(h)) == blob
+        assert st.lookup(6, "0xbb", 1) == h and st.lookup(6, "0xbb", 0) is None
+
+    srv, state = _blob_server()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    listing = [{"blockNumber": 7, "txHash": tx, "index": idx, "timestamp": 1700000000, "storageUrl": f"{base}/blob/{n}"}
+               for n, (tx, idx) in enumerate((("a", 0), ("a", 1), ("b", 0)))]
+    monkeypatch.setattr(blobscan, "fetch_starknet_blobs", lambda *a, **kw: listing)
+    seen = []
+    monkeypatch.setattr(sn, "_decode_state_diff", lambda blobs, **kw: seen.append([b[0] for b in blobs]) or {"contracts": []})
+    kw = dict(blob_store=str(tmp_path / "store"), py_decoder=True, decode_workers=1, decode_cache="off")
+    try:
+        blobscan.sn_pipeline(str(tmp_path / "a" / "raw"), **kw)
+        blobscan.sn_pipeline(str(tmp_path / "b" / "raw"), **kw)
+        blobscan.sn_pipeline(str(tmp_path / "c" / "raw"), stream=str(tmp_path / "lake"), **kw)
+        assert sorted(state["hits"].values()) == [1, 1, 1], "fetched once, then served from the store"
+        assert seen[:4] == [[0, 1], [2]] * 2
+        assert sorted(seen[4:]) == [[0, 1], [2]], "the stream decodes groups in fetch-completion order"
+        assert not (tmp_path / "a" / "raw").exists()
+        paths = [b["path"] for e in json.load(open(tmp_path / "b" / "decoder_manifest.json"))["entries"] for b in e["blobs"]]
+        assert all(p.startswith(str(tmp_path / "store")) for p in paths)
+    finally:
+        srv.shutdown()
+
+def test_output_ledger_feeds_ingest_only_new_outputs(tmp_path, capfd):
+    import json
+    from harborx import blobscan
+    from harborx.output_ledger import OutputLedger, consumer_key, sha1_file
+    dc, lake = tmp_path / "dc", tmp_path / "lake" / "state_diff"
+    dc.mkdir()
+    def write(name, value):
+        (dc / name).write_text(json.dumps({"nonces": [{"contract_address": "0x1", "nonce": hex(value)}]}))
+        return str(dc / name)
+    with OutputLedger(str(dc)) as ledger:
+        ledger.record([write("5-0.json", 1), write("6-0.json", 2)])
+    assert blobscan.run_ingest(str(dc), str(lake)) == 0          # first run: one full scan
+    assert "changed=2, total=2" in capfd.readouterr().out
+
+    write("stray.json", 3)                                        # not recorded: a scan would pick it up
+    with OutputLedger(str(dc)) as ledger:
+        ledger.record([write("7-0.json", 4)])
+        assert [o.name for o in ledger.record([write("5-0.json", 1)])] == ["5-0.json"]
+        assert [o.name for o in ledger.pending(consumer_key(str(lake)))] == ["7-0.json"], "unchanged rewrite is not new"
+    assert blobscan.run_ingest(str(dc), str(lake)) == 0
+    out = capfd.readouterr().out
+    assert "processing 7-0.json" in out and "stray" not in out and "1 new output(s)" in out
+
+    with OutputLedger(str(dc)) as ledger:
+        ledger.record([write("5-0.json", 9)])
+    assert blobscan.run_ingest(str(dc), str(lake)) == 0
+    out = capfd.readouterr().out
+    assert "processing 5-0.json" in out and "6-0.json" not in out
+    assert len(list((lake / "nonces").glob("*.parquet"))) == 4
+    with OutputLedger(str(dc)) as ledger:
+        assert ledger.pending(consumer_key(str(lake))) == []
+    latest = {n: sha1_file(str(dc / n)) for n in ("5-0.json", "6-0.json", "7-0.json")}
+    processed = json.loads((lake / "_processed.json").read_text())["files"]
+    assert {n: processed[n]["sha1"] for n in latest} == latest, "the fast path keeps the JSON ledger in step"
+    assert all(processed[n]["written"] for n in latest)
+
+def test_pipeline_overlaps_stages_in_order_with_back_pressure():
+    import threading, time
+    import pytest
+    from harborx.pipeline import Pipeline, Stage
+    live, peak, lock = [0], [0], threading.Lock()
+    def source(n):
+        for i in range(n):
+            with lock:
+                live[0] += 1
+                peak[0] = max(peak[0], live[0])
+            yield i
+    def io(x):
+        time.sleep(0.02 * random.random())
+        return x
+    def cpu(x):
+        time.sleep(0.01)
+        return -x
+    pipe = Pipeline([Stage("fetch", io, workers=4), Stage("decode", cpu, workers=2, when=lambda x: x % 10),
+                     Stage("write", io, ordered=True)], queue_size=2)
+    got = []
+    for x in pipe.run(source(60)):
+        got.append(x)
+        with lock:
+            live[0] -= 1
+    assert got == [x if x % 10 == 0 else -x for x in range(60)]
+    assert peak[0] <= pipe.window == 2 * 3 + 4 + 2 + 1
+    st = {s["stage"]: s for s in pipe.stats()}
+    assert st["decode"]["items"] == 60 and st["decode"]["skipped"] == 6
+    assert all(s["queue_max"] <= 2 for s in st.values())
+    # write (one thread, ~10 ms/item) bounds the run; serial phases would take the sum of all three
+    serial = sum(s["busy"] for s in st.values())
+    assert pipe.bottleneck() == "write" and pipe.wall < 0.8 * serial
+    assert len(pipe.report()) == 3 and pipe.report()[1].startswith("decode: 60 item(s)")
+
+    def boom(x):
+        if x == 7:
+            raise ValueError("bad item")
+        return x
+    with pytest.raises(ValueError, match="bad item"):
+        list(Pipeline([Stage("a", io, workers=2), Stage("b", boom, workers=3)]).run(range(1000)))
@@ -13,3 +13,188 @@ def test_ingest_writes_parquet(tmp_path):
     cols = pf.schema_arrow.names
     for c in ["timestamp","blob_index","position","tx_hash","chain_id","date","topic"]:
         assert c in cols
+
+def test_ingest_single_pass_multi_sink(tmp_path):
+    import sqlite3, pyarrow.ipc as ipc
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / "blobs"; out = tmp_path / "parquet"; hot = tmp_path / "hot"; db = tmp_path / "state.db"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "1500", "--parts", "2", "--seed", "4"])
+    subprocess.check_call([sys.executable, "-m", "harborx_ingestor.cli", "ingest", "--source", str(blobs), "--chain", "167001",
+                           "--out", str(out), "--arrow-dir", str(hot), "--sqlite", str(db), "--row-group", "512", "--queue", "2"])
+    assert sorted(p.name for p in hot.glob("*.arrow")) == ["blob_000001.arrow", "blob_000002.arrow"]
+    assert sum(ipc.open_file(str(p)).read_all().num_rows for p in hot.glob("*.arrow")) == 3000
+    assert sum(pq.ParquetFile(str(p)).metadata.num_rows for p in out.rglob("*.parquet")) == 3000
+    assert sqlite3.connect(str(db)).execute("SELECT COUNT(*) FROM state").fetchone()[0] == 3000
+
+def test_rolling_writer_rolls_and_commits(tmp_path):
+    import os
+    import pyarrow as pa
+    from harborx_ingestor.writer import RollingDatasetWriter
+    out = tmp_path / "ds"
+    n = 4000
+    tbl = pa.table({"k": pa.array(range(n), pa.int64()), "v": pa.array([os.urandom(32) for _ in range(n)], pa.binary(32)),
+                    "topic": pa.array(["a", "b"] * (n // 2))})
+    with RollingDatasetWriter(str(out), ["topic"], row_group_rows=500, max_file_bytes=8_000, basename="t") as w:
+        for off in range(0, n, 900):
+            w.write(tbl.slice(off, 900))
+        assert list(out.rglob("*.tmp")), "open files should still be pending"
+    assert not list(out.rglob("*.tmp"))
+    files = sorted(out.rglob("*.parquet"))
+    assert {f.parent.name for f in files} == {"topic=a", "topic=b"}
+    assert len(files) > 2, "expected files to roll at the byte threshold"
+    assert all(pq.ParquetFile(str(f)).metadata.row_group(0).num_rows <= 500 for f in files)
+    assert sum(pq.ParquetFile(str(f)).metadata.num_rows for f in files) == n
+    assert "topic" not in pq.ParquetFile(str(files[0])).schema_arrow.names
+
+def test_ingest_resumes_from_ledger(tmp_path):
+    import json
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / "blobs"; out = tmp_path / "parquet"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "800", "--parts", "3", "--seed", "6"])
+    ingest = [sys.executable, "-m", "harborx_ingestor.cli", "ingest", "--source", str(blobs), "--chain", "167001",
+              "--out", str(out), "--row-group", "256", "--workers", "2"]
+    subprocess.check_call(ingest)
+    rows = lambda: sum(pq.ParquetFile(str(p)).metadata.num_rows for p in out.rglob("*.parquet"))
+    assert rows() == 2400
+    ledger_path = out / "_ingest_ledger.json"
+    ledger = json.loads(ledger_path.read_text())
+    assert len(ledger["blobs"]) == 3 and ledger["pending"] == {}
+    # simulate a crash after one blob wrote its files but before its ledger commit
+    digest = sorted(ledger["blobs"])[0]
+    del ledger["blobs"][digest]
+    ledger["pending"][digest] = 0
+    ledger_path.write_text(json.dumps(ledger))
+    stray = out / "chain_id=167001" / f"blob-{digest[:16]}-99.parquet.tmp"
+    stray.write_bytes(b"partial")
+    subprocess.check_call(ingest[:-2] + ["--sqlite", str(tmp_path / "state.db")])
+    assert rows() == 2400 and not stray.exists()
+    ledger = json.loads(ledger_path.read_text())
+    assert len(ledger["blobs"]) == 3 and ledger["pending"] == {}
+
+def test_sqlite_append_commits_blob_key_with_rows(tmp_path):
+    import json, sqlite3
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / "blobs"; db = tmp_path / "state.db"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "500", "--parts", "2", "--seed", "3"])
+    ingest = [sys.executable, "-m", "harborx_ingestor.cli", "ingest", "--source", str(blobs), "--chain", "167001",
+              "--sqlite", str(db)]
+    subprocess.check_call(ingest)
+    count = lambda: sqlite3.connect(str(db)).execute("SELECT COUNT(*) FROM state").fetchone()[0]
+    assert count() == 1000
+    # crash between the SQLite commit and the ledger commit: the blob is re-run, not re-appended
+    ledger_path = tmp_path / "_ingest_ledger.json"
+    ledger = json.loads(ledger_path.read_text())
+    ledger["pending"] = {d: 0 for d in ledger["blobs"]}
+    ledger["blobs"] = {}
+    ledger_path.write_text(json.dumps(ledger))
+    subprocess.check_call(ingest)
+    assert count() == 1000 and len(json.loads(ledger_path.read_text())["blobs"]) == 2
+    subprocess.check_call(ingest + ["--no-resume"])
+    assert count() == 2000, "--no-resume re-appends on purpose"
+
+def test_ingest_cluster_sorts_by_key(tmp_path):
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / "blobs"; out = tmp_path / "parquet"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "3000", "--parts", "1", "--seed", "8"])
+    subprocess.check_call([sys.executable, "-m", "harborx_ingestor.cli", "ingest", "--source", str(blobs), "--chain", "167001",
+                           "--out", str(out), "--row-group", "512", "--cluster"])
+    files = list(out.rglob("*.parquet"))
+    assert sum(pq.ParquetFile(str(f)).metadata.num_rows for f in files) == 3000
+    for f in files:
+        pf = pq.ParquetFile(str(f))
+        keys = pf.read(columns=["key"]).column("key").to_pylist()
+        assert keys == sorted(keys)
+        rg = pf.metadata.row_group(0)
+        assert [c.column_index for c in rg.sorting_columns][:1] == [pf.schema_arrow.get_field_index("key")]
+        assert rg.column(pf.schema_arrow.get_field_index("key")).statistics.has_min_max
+
+def test_failed_sink_is_aborted_without_tmp_outputs(tmp_path):
+    import pyarrow as pa, pytest
+    from harborx_ingestor.sinks import ArrowIPCSink, FanOut, ParquetDatasetSink
+    class Flaky:
+        def write(self, batch):
+            if self.seen:
+                raise OSError("disk full")
+            self.seen = True
+            super().write(batch)
+    class FlakyArrow(Flaky, ArrowIPCSink):
+        seen = False
+    class FlakyParquet(Flaky, ParquetDatasetSink):
+        seen = False
+    batch = pa.record_batch({"timestamp": pa.array([86400, 2 * 86400], pa.int64()), "type": pa.array(["s", "n"]),
+                             "key": pa.array([b"a", b"b"])})
+    sinks = [FlakyArrow(str(tmp_path / "hot")), FlakyParquet(str(tmp_path / "pq"), 1, row_group_rows=1)]
+    with pytest.raises(RuntimeError, match="disk full"):
+        with FanOut(sinks) as fan:
+            fan.ingest(str(tmp_path / "blob_000001.blob.gz"), [batch, batch])
+    assert not list(tmp_path.rglob("*.tmp")) and not list(tmp_path.rglob("*.arrow"))
+
+def test_truncated_blob_commits_nothing(tmp_path):
+    import gzip, sqlite3, pytest
+    from harborx_ingestor.ingest import ingest_blob_to_dataset, ingest_folder
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / "blobs"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "3000", "--parts", "1", "--seed", "3"])
+    blob = next(blobs.glob("*.blob.gz"))
+    raw = gzip.decompress(blob.read_bytes())
+    blob.write_bytes(gzip.compress(raw[:len(raw) * 2 // 3]))      # the header still promises 3000 records
+    with pytest.raises(ValueError, match="Truncated"):
+        ingest_blob_to_dataset(str(blob), str(tmp_path / "ds"), 1, 512)
+    with pytest.raises(ValueError, match="Truncated"):
+        ingest_folder(str(blobs), str(tmp_path / "pq"), 1, 512, arrow_dir=str(tmp_path / "hot"),
+                      sqlite_db=str(tmp_path / "state.sqlite"), catalog=False)
+    assert not [f for f in tmp_path.rglob("*") if f.suffix in (".parquet", ".arrow", ".tmp")]
+    con = sqlite3.connect(str(tmp_path / "state.sqlite"))
+    assert con.execute("SELECT count(*) FROM state").fetchone() == (0,)
+    con.close()
+
+def test_ingest_commits_finished_blobs_when_a_later_one_fails(tmp_path):
+    import gzip, json, os, pytest
+    from harborx_ingestor.ingest import ingest_folder
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    blobs = tmp_path / "blobs"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "900", "--parts", "3", "--seed", "4"])
+    last = sorted(blobs.glob("*.blob.gz"))[-1]
+    raw = gzip.decompress(last.read_bytes())
+    last.write_bytes(gzip.compress(raw[:len(raw) // 2]))
+    for out, kw, err in (("serial", {"arrow_dir": str(tmp_path / "hot")}, ValueError), ("pool", {"workers": 2}, RuntimeError)):
+        with pytest.raises(err, match="Truncated"):
+            ingest_folder(str(blobs), str(tmp_path / out), 1, 128, catalog=False, **kw)
+        ledger = json.loads((tmp_path / out / "_ingest_ledger.json").read_text())
+        assert sorted(e["name"] for e in ledger["blobs"].values()) == ["blob_000001.blob.gz", "blob_000002.blob.gz"]
+        files = [f for e in ledger["blobs"].values() for f in e["files"]]
+        assert files and all(os.path.exists(f) for f in files)
+        assert sum(pq.ParquetFile(f).metadata.num_rows for f in files if f.endswith(".parquet")) == 1800
+    assert sorted(os.listdir(tmp_path / "hot")) == ["blob_000001.arrow", "blob_000002.arrow"]
+
+def test_blob_to_arrow_many_pool_and_shared_memory(tmp_path, monkeypatch):
+    import os, pyarrow.ipc as ipc
+    repo = pathlib.Path(__file__).resolve().parents[1]
+    monkeypatch.syspath_prepend(str(repo / "bench"))
+    import blob_to_arrow_many as many
+    blobs = tmp_path / "blobs"; hot = tmp_path / "hot"
+    blobs.mkdir()
+    subprocess.check_call([sys.executable, str(repo/"bench"/"gen_blob.py"), "--out", str(blobs/'blob'), "--rows", "3000", "--parts", "3", "--seed", "5"])
+    paths = sorted(str(p) for p in blobs.glob("*.blob.gz"))
+    res = many.convert_many(paths, str(hot), 2, 700)
+    assert all(ok for _, _, ok, _, _ in res) and len(res) == 3
+    files = {p: ipc.open_file(str(many.out_for(p, hot))).read_all() for p in paths}
+    shm_dir = pathlib.Path("/dev/shm")
+    before = set(os.listdir(shm_dir)) if shm_dir.is_dir() else set()
+    for row_bytes in (many.ROW_BYTES, 1):      # 1: every segment is too small and gets reallocated
+        monkeypatch.setattr(many, "ROW_BYTES", row_bytes)
+        monkeypatch.setattr(many, "STREAM_BYTES", many.STREAM_BYTES if row_bytes > 1 else 0)
+        with many.load_many(paths + [str(blobs / "missing.blob.gz")], 2, 700) as st:
+            assert list(st.failed) == [str(blobs / "missing.blob.gz")]
+            assert {p: t.equals(files[p]) for p, t in st.tables.items()} == {p: True for p in paths}
+    if shm_dir.is_dir():
+        assert set(os.listdir(shm_dir)) <= before, "segments are unlinked once attached or freed"
+    r = subprocess.run([sys.executable, str(repo/"bench"/"blob_to_arrow_many.py"), "--pattern", str(blobs/"*.blob.gz"),
+                        "--to-shm", "--skip-exists"], capture_output=True, text=True)
+    assert r.returncode == 2 and "--skip-exists" in r.stderr
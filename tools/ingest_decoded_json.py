@@ -5,7 +5,22 @@ from pathlib import Path
 from typing import Dict, Any, Iterable, List
 import pandas as pd
 
+# the decoder output ledger needs the harborx package on the path (harborx run_ingest
+# provides it); without it every run is the full scan with the JSON ledger
+try:
+    from harborx.output_ledger import OutputLedger, consumer_key
+except ImportError:
+    OutputLedger = None
+
 TABLES = ("storage_diffs","declared_classes","deployed_or_replaced","nonces")
+SRC_SUFFIXES = (".json", ".txt")
+# --cluster: sort order and bloom-filter columns per table (point lookups by address/key)
+CLUSTER_KEYS = {
+    "storage_diffs": ("address", "key"),
+    "deployed_or_replaced": ("address",),
+    "nonces": ("contract_address",),
+    "declared_classes": ("class_hash",),
+}
 
 def read_json_candidates(p: Path):
     txt = p.read_text(encoding="utf-8").strip()
@@ -84,11 +99,21 @@ def extract_frames(objs: Iterable[Dict[str, Any]], src_name: str):
         return df
     return {name: df_for(name) for name in TABLES}
 
-def safe_write_parquet(df: pd.DataFrame, out_dir: Path, out_name: str):
-    import pyarrow as pa, pyarrow.parquet as pq
+def safe_write_parquet(df: pd.DataFrame, out_dir: Path, out_name: str, cluster_by=()):
+    import inspect, pyarrow as pa, pyarrow.parquet as pq
     out_dir.mkdir(parents=True, exist_ok=True)
-    pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
-                   out_dir/out_name, compression="zstd", use_dictionary=True)
+    tbl = pa.Table.from_pandas(df, preserve_index=False)
+    opts = dict(compression="zstd", use_dictionary=True)
+    cluster_by = [c for c in cluster_by if c in tbl.column_names]
+    if cluster_by:
+        tbl = tbl.sort_by([(c, "ascending") for c in cluster_by])
+        opts.update(write_statistics=True, write_page_index=True,
+                    sorting_columns=[pq.SortingColumn(tbl.schema.get_field_index(c)) for c in cluster_by])
+        if "bloom_filter_options" in inspect.signature(pq.ParquetWriter.__init__).parameters:
+            opts["bloom_filter_options"] = {c: {"ndv": max(1, tbl.num_rows), "fpp": 0.01} for c in cluster_by}
+    tmp = out_dir/(out_name + ".tmp")
+    pq.write_table(tbl, tmp, **opts)
+    tmp.replace(out_dir/out_name)
 
 def sha1sum(p: Path) -> str:
     import hashlib
@@ -119,62 +144,102 @@ def build_tables_json(out_root: Path, rel_prefix: str = "data/local/state_diff")
         tables[t] = files
     return tables
 
+def ingest_file(p: Path, digest: str, out: Path, args) -> bool:
+    print(f"[ingest] processing {p.name} …")
+    objs = list(read_json_candidates(p))
+    frames = extract_frames(objs, p.name)
+    wrote_any = False
+    for t, df in frames.items():
+        if df is None or df.empty:
+            continue
+        out_dir = out / t
+        cluster_by = CLUSTER_KEYS.get(t, ()) if args.cluster else ()
+        if cluster_by and args.split_rows:
+            # sort the whole table first so the split files cover disjoint key ranges
+            df = df.sort_values(list(cluster_by), kind="stable", ignore_index=True)
+        if args.split_rows and len(df) > args.split_rows:
+            k = 0
+            for i in range(0, len(df), args.split_rows):
+                part = df.iloc[i:i+args.split_rows].copy()
+                out_name = f"{p.stem}-{digest[:8]}-{k:03d}.parquet"
+                safe_write_parquet(part, out_dir, out_name, cluster_by)
+                print(f"  → {out_dir/out_name} rows={len(part)}")
+                k += 1
+        else:
+            out_name = f"{p.stem}-{digest[:8]}.parquet"
+            safe_write_parquet(df, out_dir, out_name, cluster_by)
+            print(f"  → {out_dir/out_name} rows={len(df)}")
+        wrote_any = True
+    return wrote_any
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--src", default=".cache", help="folder with decoded JSON")
     ap.add_argument("--out", default="apps/web/data/local/state_diff", help="output root")
     ap.add_argument("--ledger", default="apps/web/data/local/state_diff/_processed.json")
     ap.add_argument("--force", action="store_true", help="reprocess all")
+    ap.add_argument("--split-rows", type=int, default=0, help="split tables into files of at most N rows (0 = one file)")
+    ap.add_argument("--cluster", action="store_true",
+                    help="sort by address/key and write page indexes + bloom filters for point lookups")
     args = ap.parse_args()
 
     src, out, ledger_path = Path(args.src), Path(args.out), Path(args.ledger)
-    files = sorted(list(src.glob("*.json")) + list(src.glob("*.JSON"))
-             + list(src.glob("*.txt"))  + list(src.glob("*.TXT")))
-    if not files:
-        print(f"[ingest] no json files in {src}"); return
-
-    ledger = load_ledger(ledger_path)
-    processed = ledger.get("files", {})
-    changed = 0
-
-    for p in files:
-        digest = sha1sum(p)
-        rec = processed.get(p.name)
-        if (not args.force) and rec and rec.get("sha1")==digest:
-            continue
-        print(f"[ingest] processing {p.name} …")
-        objs = list(read_json_candidates(p))
-        frames = extract_frames(objs, p.name)
-        wrote_any = False
-        for t, df in frames.items():
-            if df is None or df.empty:
+    # decoder output ledger (harborx.output_ledger): after a consumer's first run, only the
+    # outputs recorded since its last run are read; nothing is listed or re-hashed. The
+    # JSON ledger (--ledger) is updated on this path too, so the two never drift.
+    outputs = OutputLedger(str(src)) if OutputLedger and not args.force and OutputLedger.exists(str(src)) else None
+    consumer = consumer_key(str(out)) if outputs else None
+    if outputs and outputs.mark_of(consumer):
+        todo = outputs.pending(consumer, SRC_SUFFIXES)
+        ledger = load_ledger(ledger_path) if todo else {}
+        processed = ledger.get("files", {})
+        try:
+            for o in todo:
+                p = src / o.name
+                if p.exists():
+                    processed[o.name] = {"sha1": o.sha1, "written": ingest_file(p, o.sha1, out, args)}
+                else:
+                    print(f"[ingest] {o.name} is gone, skipped")
+                outputs.mark(consumer, o.seq)
+        finally:
+            if todo:
+                ledger["files"] = processed
+                save_ledger(ledger_path, ledger)
+        print(f"[ingest] {len(todo)} new output(s) from the decoder output ledger")
+        if not todo: return
+        changed, total = len(todo), len(todo)
+    else:
+        last_seq = outputs.last_seq() if outputs else 0
+        files = sorted(list(src.glob("*.json")) + list(src.glob("*.JSON"))
+                 + list(src.glob("*.txt"))  + list(src.glob("*.TXT")))
+        if not files:
+            print(f"[ingest] no json files in {src}"); return
+
+        ledger = load_ledger(ledger_path)
+        processed = ledger.get("files", {})
+        changed = 0
+
+        for p in files:
+            digest = sha1sum(p)
+            rec = processed.get(p.name)
+            if (not args.force) and rec and rec.get("sha1")==digest:
                 continue
-            out_dir = out / t
-            if args.split_rows and len(df) > args.split_rows:
-                k = 0
-                for i in range(0, len(df), args.split_rows):
-                    part = df.iloc[i:i+args.split_rows].copy()
-                    out_name = f"{p.stem}-{digest[:8]}-{k:03d}.parquet"
-                    safe_write_parquet(part, out_dir, out_name)
-                    print(f"  → {out_dir/out_name} rows={len(part)}")
-                    k += 1
-            else:
-                out_name = f"{p.stem}-{digest[:8]}.parquet"
-                safe_write_parquet(df, out_dir, out_name)
-                print(f"  → {out_dir/out_name} rows={len(df)}")
-
-        processed[p.name] = {"sha1": digest, "written": wrote_any}
-        changed += 1
-
-    ledger["files"] = processed
-    save_ledger(ledger_path, ledger)
+            wrote_any = ingest_file(p, digest, out, args)
+            processed[p.name] = {"sha1": digest, "written": wrote_any}
+            changed += 1
+
+        ledger["files"] = processed
+        save_ledger(ledger_path, ledger)
+        if outputs and last_seq:
+            outputs.mark(consumer, last_seq)
+        total = len(files)
 
     tables = build_tables_json(out)
 
     primary_manifest = (out.parent / "manifest.json")  # apps/web/data/local/manifest.json
     write_primary_manifest(out, primary_manifest, primary="storage_diffs")
 
-    print(f"[ingest] done. changed={changed}, total={len(files)}")
+    print(f"[ingest] done. changed={changed}, total={total}")
 
 if __name__ == "__main__":
     main()